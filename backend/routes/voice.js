@@ -266,25 +266,22 @@ router.post(
         });
       }
 
-      // Convert file to base64
-      const base64Audio = req.file.buffer.toString('base64');
-
-      // Call ML service
+      // Call ML service with the audio bytes as the body (no base64 / JSON encoding)
       try {
         logger.info(`Calling ML service at ${ML_SERVICE_URL}/api/voice/deepfake/detect`);
-        logger.info(`Audio data size: ${base64Audio.length} characters (${(base64Audio.length * 3 / 4 / 1024).toFixed(2)} KB)`);
+        logger.info(`Audio data size: ${(req.file.buffer.length / 1024).toFixed(2)} KB`);
         
         const response = await axios.post(
           `${ML_SERVICE_URL}/api/voice/deepfake/detect`,
-          {
-            audio: base64Audio,
-            format: 'base64',
-          },
+          req.file.buffer,
           {
             headers: {
-              'Content-Type': 'application/json',
+              'Content-Type': req.file.mimetype && req.file.mimetype.startsWith('audio/')
+                ? req.file.mimetype
+                : 'application/octet-stream',
             },
             timeout: 120000, // 2 minutes for audio processing
+            maxBodyLength: Infinity,
           }
         );
 
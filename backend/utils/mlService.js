@@ -6,6 +6,14 @@ const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://localhost:8000';
 // Enable ML service by default (for hackathon demo)
 const ML_SERVICE_ENABLED = process.env.ML_SERVICE_ENABLED !== 'false';
 
+/**
+ * JSON for a request header: non-ASCII characters escaped, as header values must be ASCII
+ * @param {Object} value
+ * @returns {string}
+ */
+const toHeaderJson = (value) =>
+  JSON.stringify(value).replace(/[\u007f-\uffff]/g, (c) => `\\u${c.charCodeAt(0).toString(16).padStart(4, '0')}`);
+
 /**
  * Analyze image for forgery and extract OCR text
  * @param {string} filePath - Path to the image file
@@ -93,31 +101,26 @@ export const analyzeImage = async (filePathOrData) => {
   }
 
   try {
-    // Read file and convert to base64
+    // Send the file bytes as the body (no base64 / JSON encoding)
     const imageBuffer = readFileSync(filePath);
-    const base64Image = imageBuffer.toString('base64');
-
-    // Prepare request payload
-    const payload = {
-      image: base64Image,
-      format: 'base64',
+    const headers = {
+      'Content-Type': 'application/octet-stream',
     };
 
     // Add manual data if provided
     if (manualData) {
-      payload.manualData = manualData;
+      headers['X-Manual-Data'] = toHeaderJson(manualData);
       logger.info('Sending manual data to ML service');
     }
 
     // Call ML service
     const response = await axios.post(
       `${ML_SERVICE_URL}/api/forensics/analyze`,
-      payload,
+      imageBuffer,
       {
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers,
         timeout: 30000, // 30 second timeout
+        maxBodyLength: Infinity,
       }
     );
 
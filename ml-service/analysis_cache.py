@@ -0,0 +1,204 @@
+"""
+Analysis Result Cache
+Content-hash keyed cache for OCR and forensics results, so resubmitted evidence is not re-analyzed.
+Entries live in a bounded in-memory LRU tier and, optionally, an on-disk tier that survives restarts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from service_config import (
+    ANALYSIS_CACHE_DIR,
+    ANALYSIS_CACHE_ENABLED,
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when analysis code changes in a way that makes previously cached results invalid
+CACHE_VERSION = 1
+
+
+def content_digest(data: bytes) -> str:
+    """SHA-256 of the decoded file bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _json_default(value):
+    # numpy scalars (np.float64, np.bool_, ...) and tuples from the detectors
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def config_fingerprint(*parts) -> str:
+    """
+    Short stable hash of the settings a cached result depends on
+    Any change to these parts (thresholds, sensitivity, OCR settings) produces a different fingerprint
+    """
+    payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=_json_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    Two-tier result cache: in-memory LRU with TTL in front of an optional JSON-file directory
+    Values are stored serialized, so callers always get an independent copy they may mutate
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600.0, disk_dir: str = ""):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._memory: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+        if disk_dir:
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Analysis cache directory unavailable ({disk_dir}): {e}. Using memory only.")
+                self.disk_dir = ""
+
+    def _disk_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.disk_dir, namespace, key[:2], f"{key}.json")
+
+    def _check_fingerprint(self, namespace: str, fingerprint: str):
+        # Caller holds the lock. A new fingerprint (e.g. sensitivity changed) drops the namespace's memory tier;
+        # stale disk entries are discarded lazily when read.
+        previous = self._fingerprints.get(namespace)
+        if previous == fingerprint:
+            return
+        self._fingerprints[namespace] = fingerprint
+        if previous is None:
+            return
+        stale = [k for k in self._memory if k[0] == namespace]
+        for k in stale:
+            del self._memory[k]
+        self._stats['invalidations'] += 1
+        logger.info(f"Analysis cache '{namespace}' invalidated ({len(stale)} entries): configuration changed")
+
+    def _remember(self, entry_key: tuple, expires: float, payload: str):
+        # Caller holds the lock
+        self._memory[entry_key] = (expires, payload)
+        self._memory.move_to_end(entry_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, namespace: str, key: str, fingerprint: str) -> Optional[Any]:
+        """
+        Look up a cached value
+        Returns: the value, or None on a miss (absent, expired or computed under another configuration)
+        """
+        entry_key = (namespace, key)
+        now = time.time()
+        with self._lock:
+            self._check_fingerprint(namespace, fingerprint)
+            entry = self._memory.get(entry_key)
+            if entry is not None:
+                expires, payload = entry
+                if expires > now:
+                    self._memory.move_to_end(entry_key)
+                    self._stats['hits'] += 1
+                    return json.loads(payload)
+                del self._memory[entry_key]
+
+        if self.disk_dir:
+            path = self._disk_path(namespace, key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                if record.get('fingerprint') == fingerprint and record.get('expires', 0) > now:
+                    payload = json.dumps(record['value'])
+                    with self._lock:
+                        self._remember(entry_key, record['expires'], payload)
+                        self._stats['disk_hits'] += 1
+                    return record['value']
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                logger.debug(f"Analysis cache disk read failed for {key}: {e}")
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, namespace: str, key: str, fingerprint: str, value: Any):
+        """Store a JSON-serializable value (numpy scalars are converted)"""
+        try:
+            payload = json.dumps(value, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Analysis cache: value for '{namespace}' is not serializable: {e}")
+            return
+
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._check_fingerprint(namespace, fingerprint)
+            self._remember((namespace, key), expires, payload)
+            self._stats['stores'] += 1
+
+        if self.disk_dir:
+            path = self._disk_path(namespace, key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write-then-rename so concurrent readers never see a partial file
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(f'{{"fingerprint": {json.dumps(fingerprint)}, "expires": {expires}, "value": {payload}}}')
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Analysis cache disk write failed for {key}: {e}")
+
+    def clear(self):
+        """Drop the memory tier (the disk tier expires on its own)"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+            return {
+                'enabled': True,
+                'entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk': bool(self.disk_dir),
+                **self._stats,
+                'hit_rate': round((self._stats['hits'] + self._stats['disk_hits']) / lookups, 3) if lookups else 0.0,
+            }
+
+
+class _DisabledCache:
+    """Stand-in used when ANALYSIS_CACHE_ENABLED is off"""
+
+    def get(self, namespace: str, key: str, fingerprint: str) -> Optional[Any]:
+        return None
+
+    def put(self, namespace: str, key: str, fingerprint: str, value: Any):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self) -> dict:
+        return {'enabled': False}
+
+
+analysis_cache = (
+    AnalysisCache(ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_DIR)
+    if ANALYSIS_CACHE_ENABLED else _DisabledCache()
+)
@@ -0,0 +1,85 @@
+"""
+ImageContext Benchmark
+Runs the image detectors of one request (OCR gray plane, improved + legacy forgery analysis,
+rule-based deepfake analysis) with the shared per-request ImageContext and without memoization,
+and reports the CPU time saved and how often each derived plane was computed.
+
+Usage (from ml-service/):
+    python benchmarks/bench_image_context.py [--repeat 5] [--sizes 720x1600,1080x2400]
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import cv2  # noqa: E402
+import main  # noqa: E402
+from image_context import ImageContext  # noqa: E402
+from improved_forgery_detection import analyze_forgery_improved  # noqa: E402
+
+# Rule-based methods only - the CNN would dominate the timings
+main._load_tensorflow = lambda: False
+
+
+def make_screenshot(width: int, height: int) -> bytes:
+    """Synthetic payment-app style screenshot, JPEG encoded"""
+    rng = np.random.default_rng(width * height)
+    img = np.full((height, width, 3), 245, np.uint8)
+    cv2.rectangle(img, (0, 0), (width, height // 8), (40, 90, 200), -1)
+    for i, line in enumerate(["Paid to merchant@okaxis", "Rs 1,250.00", "UTR 412345678901", "17 Oct 2026, 10:42 am"]):
+        cv2.putText(img, line, (width // 12, height // 4 + i * height // 12), cv2.FONT_HERSHEY_SIMPLEX,
+                    width / 700, (25, 25, 25), 2)
+    photo = cv2.GaussianBlur((rng.random((height // 5, width // 2, 3)) * 255).astype(np.uint8), (7, 7), 0)
+    img[height // 2:height // 2 + photo.shape[0], width // 4:width // 4 + photo.shape[1]] = photo
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, 'JPEG', quality=88)
+    return buf.getvalue()
+
+
+def run_request(data: bytes, memoize: bool):
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    ctx = ImageContext(image, memoize=memoize)
+
+    start = time.process_time()
+    _ = ctx.gray  # OCR input plane
+    analyze_forgery_improved(image, ctx)
+    main._legacy_analyze_forgery(image, ctx)
+    main.detect_deepfake_image(image, ctx=ctx)
+    return time.process_time() - start, ctx
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', default='720x1600,1080x2400')
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'memoized':>10} {'baseline':>10} {'saved':>8}")
+    for size in args.sizes.split(','):
+        width, height = (int(v) for v in size.split('x'))
+        data = make_screenshot(width, height)
+        run_request(data, True)  # warm-up
+
+        shared = min(run_request(data, True)[0] for _ in range(args.repeat))
+        baseline = min(run_request(data, False)[0] for _ in range(args.repeat))
+        print(f"{size:>10} {shared * 1000:>8.1f}ms {baseline * 1000:>8.1f}ms {(1 - shared / baseline) * 100:>7.1f}%")
+
+        _, shared_ctx = run_request(data, True)
+        _, baseline_ctx = run_request(data, False)
+        for name, entry in sorted(baseline_ctx.stats().items()):
+            memo_entry = shared_ctx.stats().get(name, {'computed': 0, 'seconds': 0.0})
+            print(f"{'':>10}   {name:<28} computed {memo_entry['computed']}x vs {entry['computed']}x "
+                  f"({memo_entry['seconds'] * 1000:.1f}ms vs {entry['seconds'] * 1000:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main_cli()
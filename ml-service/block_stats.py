@@ -0,0 +1,73 @@
+"""
+Vectorized Block and Region Statistics
+Per-tile mean / variance / std maps and per-channel histograms computed in one pass over
+reshaped block views of the pixel array, instead of slicing tiles in Python loops.
+Tile sums of values and squares are accumulated in float64 with einsum (no full-size temporaries).
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def tile_count(length: int, tile: int, stop: Optional[int] = None) -> int:
+    """
+    Number of tiles along one axis
+    stop=None: every tile that fits; otherwise tiles starting at 0, tile, 2*tile, ... below stop
+    (what `range(0, stop, tile)` visits)
+    """
+    if tile <= 0:
+        return 0
+    if stop is None:
+        return max(0, length // tile)
+    return min(len(range(0, max(0, stop), tile)), max(0, length // tile))
+
+
+def block_view(array: np.ndarray, tile_h: int, tile_w: int, rows: int, cols: int) -> np.ndarray:
+    """
+    Non-overlapping tiles of the top-left rows x cols grid as a (rows, tile_h, cols, tile_w, ...) view
+    (no copy for C-contiguous input)
+    """
+    cropped = array[:rows * tile_h, :cols * tile_w]
+    return cropped.reshape(rows, tile_h, cols, tile_w, *array.shape[2:])
+
+
+def block_stats(array: np.ndarray, tile: int, rows: Optional[int] = None, cols: Optional[int] = None,
+                tile_w: Optional[int] = None) -> dict:
+    """
+    Mean, variance and std of every tile (over all pixels and channels of the tile)
+    rows/cols: tiles per axis (default: every full tile in the image)
+    Returns: dict with 'mean', 'var', 'std' maps of shape (rows, cols) and the tile/grid geometry
+    """
+    tile_h = tile
+    tile_w = tile_w or tile
+    height, width = array.shape[:2]
+    rows = tile_count(height, tile_h) if rows is None else rows
+    cols = tile_count(width, tile_w) if cols is None else cols
+
+    if rows <= 0 or cols <= 0:
+        empty = np.zeros((max(rows, 0), max(cols, 0)))
+        return {'mean': empty, 'var': empty, 'std': empty, 'tile': (tile_h, tile_w), 'grid': (max(rows, 0), max(cols, 0))}
+
+    blocks = block_view(array, tile_h, tile_w, rows, cols)
+    # Reduce the within-tile axes (and channels): 'abcd' / 'abcde' -> 'ac'
+    subscripts = 'abcde'[:blocks.ndim]
+    count = blocks[0, :, 0].size
+    sums = np.einsum(f'{subscripts}->ac', blocks, dtype=np.float64)
+    squares = np.einsum(f'{subscripts},{subscripts}->ac', blocks, blocks, dtype=np.float64)
+    mean = sums / count
+    var = np.maximum(squares / count - mean * mean, 0.0)
+    return {'mean': mean, 'var': var, 'std': np.sqrt(var), 'tile': (tile_h, tile_w), 'grid': (rows, cols)}
+
+
+def channel_histograms(array: np.ndarray, bins: int = 256) -> np.ndarray:
+    """
+    Per-channel value histograms of an integer image (same counts as np.histogram with unit bins)
+    Returns: array of shape (channels, bins)
+    """
+    if array.ndim == 2:
+        array = array[:, :, None]
+    return np.stack([
+        np.bincount(array[:, :, c].ravel(), minlength=bins)[:bins]
+        for c in range(array.shape[2])
+    ])
@@ -0,0 +1,53 @@
+"""
+Error Level Analysis Engine
+JPEG re-compression in memory (cv2.imencode/imdecode) - no temporary files.
+One call produces the difference map and its statistics for any number of quality levels.
+"""
+
+from typing import Dict, Iterable
+
+import numpy as np
+
+from metrics import timed
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# Quality the ELA thresholds in the detectors are calibrated for
+ELA_QUALITY = 90
+
+
+def recompress_jpeg(image: np.ndarray, quality: int = ELA_QUALITY) -> np.ndarray:
+    """Encode to JPEG at the given quality and decode again (gray in, gray out)"""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError(f"JPEG encoding failed at quality {quality}")
+    flags = cv2.IMREAD_GRAYSCALE if image.ndim == 2 else cv2.IMREAD_COLOR
+    return cv2.imdecode(buffer, flags)
+
+
+@timed('ela')
+def run_ela(gray: np.ndarray, qualities: Iterable[int] = (ELA_QUALITY,)) -> Dict[int, dict]:
+    """
+    Error level analysis of a gray plane at one or more JPEG qualities
+    Returns: {quality: {'diff': float32 |original - recompressed| map (heatmap source), 'mean', 'std', 'max'}}
+    """
+    reference = gray.astype(np.float32)
+    results = {}
+    for quality in qualities:
+        diff = np.abs(reference - recompress_jpeg(gray, quality).astype(np.float32))
+        results[quality] = {
+            'diff': diff,
+            'mean': float(np.mean(diff)),
+            'std': float(np.std(diff)),
+            'max': float(diff.max()) if diff.size else 0.0,
+        }
+    return results
+
+
+def ela_diff(gray: np.ndarray, quality: int = ELA_QUALITY) -> np.ndarray:
+    """Difference map only (float32)"""
+    return run_ela(gray, (quality,))[quality]['diff']
@@ -0,0 +1,280 @@
+"""
+Analysis Execution Layer
+CPU-bound analysis (OCR, forensics, CNN, video decoding, librosa) runs on one worker pool per workload
+instead of on the asyncio event loop, so /health and light requests stay responsive during bursts.
+Each pool admits at most workers + queue_size requests; beyond that requests are refused immediately
+(503 or 429 with a Retry-After estimate) instead of piling up behind the running ones.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from metrics import Histogram
+from service_config import (
+    EXEC_IMAGE_QUEUE,
+    EXEC_IMAGE_WORKERS,
+    EXEC_OVERLOAD_STATUS,
+    EXEC_VIDEO_QUEUE,
+    EXEC_VIDEO_WORKERS,
+    EXEC_VOICE_MODE,
+    EXEC_VOICE_QUEUE,
+    EXEC_VOICE_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+MODES = ('thread', 'process')
+
+# Retry-After bounds in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+# Longest pause of a queued call (batch item, job) that found its pool full
+QUEUED_RETRY_SECONDS = 1.0
+
+POOL_WAIT_SECONDS = Histogram('ml_pool_wait_seconds', 'Time analyses waited in a pool queue', ('pool',))
+POOL_RUN_SECONDS = Histogram('ml_pool_run_seconds', 'Time analyses ran on a pool worker', ('pool',))
+
+
+class ServiceOverloaded(HTTPException):
+    """A workload pool is full; FastAPI answers with the status and a Retry-After header"""
+
+    def __init__(self, workload: str, retry_after: int):
+        super().__init__(
+            status_code=EXEC_OVERLOAD_STATUS,
+            detail=f"Service busy: too many {workload} analyses in progress. Retry in {retry_after} s",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.workload = workload
+        self.retry_after = retry_after
+
+
+class _PortableError(Exception):
+    """Picklable stand-in for an exception raised in a worker process (HTTPException cannot be unpickled)"""
+
+    def __init__(self, message: str, status_code: int = None, detail=None, headers: dict = None):
+        super().__init__(message, status_code, detail, headers)
+        self.message = message
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+    def restore(self) -> Exception:
+        if self.status_code is not None:
+            return HTTPException(status_code=self.status_code, detail=self.detail, headers=self.headers)
+        return RuntimeError(self.message)
+
+
+def _timed_call(fn, args, kwargs):
+    # Runs in the worker thread: wall-clock start time travels back with the result
+    return time.time(), fn(*args, **kwargs)
+
+
+def _timed_call_portable(fn, args, kwargs):
+    # Runs in a worker process: an unpicklable exception would break the whole pool
+    try:
+        return _timed_call(fn, args, kwargs)
+    except HTTPException as e:
+        raise _PortableError(str(e.detail), e.status_code, e.detail, e.headers) from None
+    except Exception as e:
+        raise _PortableError(f"{type(e).__name__}: {e}") from None
+
+
+class WorkloadPool:
+    """
+    Bounded worker pool for one kind of analysis
+    mode 'process' needs picklable functions, arguments and results, and keeps no state between
+    calls in the service process (caches, loaded models); use it only for stateless workloads.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int, mode: str = 'thread'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown execution mode for {name}: {mode} (expected one of {', '.join(MODES)})")
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.mode = mode
+        self._executor = self._new_executor()
+        self._lock = threading.Lock()
+        self._admitted = 0  # Queued + running
+        self._stats = {'completed': 0, 'errors': 0, 'cancelled': 0, 'rejected': 0,
+                       'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'run_seconds': 0.0}
+
+    def _new_executor(self):
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-worker")
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _retry_after(self) -> int:
+        # Caller holds the lock: time until a slot frees up if the current backlog drains at the average run time
+        if not self._stats['completed']:
+            return MIN_RETRY_AFTER
+        average = self._stats['run_seconds'] / self._stats['completed']
+        backlog = self._admitted - self.workers + 1
+        return int(min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(round(average * backlog / self.workers, 1)))))
+
+    def _reject(self):
+        # Caller holds the lock
+        self._stats['rejected'] += 1
+        retry_after = self._retry_after()
+        logger.warning(f"{self.name} pool full ({self._admitted}/{self.capacity}); rejecting, retry after {retry_after} s")
+        raise ServiceOverloaded(self.name, retry_after)
+
+    def check(self):
+        """Refuse early (before reading an upload) when the pool is already full; admits nothing"""
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self._reject()
+
+    async def run(self, fn, *args, on_admitted: Optional[Callable[[], None]] = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the pool and await its result; raises ServiceOverloaded when full
+        on_admitted: called once the call is queued on the pool (cancelling the await no longer stops it)
+        """
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self._reject()
+            self._admitted += 1
+        executor = self._executor
+        try:
+            call = _timed_call_portable if self.mode == 'process' else _timed_call
+            future = executor.submit(call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._admitted -= 1
+            raise
+        if on_admitted is not None:
+            on_admitted()
+        # Accounted when the work really ends: a disconnected client cancels the await, not a running task
+        future.add_done_callback(functools.partial(self._done, time.time()))
+        try:
+            _, result = await asyncio.wrap_future(future)
+        except _PortableError as e:
+            raise e.restore() from None
+        except BrokenProcessPool:
+            # A worker process died (crash, OOM kill): later requests get a fresh pool
+            with self._lock:
+                if self._executor is executor:
+                    logger.error(f"{self.name} worker process died; restarting the pool")
+                    self._executor = self._new_executor()
+            raise
+        return result
+
+    def _done(self, enqueued: float, future):
+        finished = time.time()
+        started = None
+        with self._lock:
+            self._admitted -= 1
+            if future.cancelled():
+                # Dropped from the queue before it started
+                self._stats['cancelled'] += 1
+            elif future.exception() is not None:
+                self._stats['errors'] += 1
+            else:
+                started = future.result()[0]
+                wait = max(0.0, started - enqueued)
+                self._stats['completed'] += 1
+                self._stats['wait_seconds'] += wait
+                self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], wait)
+                self._stats['run_seconds'] += finished - started
+        if started is not None:
+            POOL_WAIT_SECONDS.observe(wait, self.name)
+            POOL_RUN_SECONDS.observe(finished - started, self.name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self._stats['completed']
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self._admitted,
+                'queued': max(0, self._admitted - self.workers),
+                'completed': completed,
+                'errors': self._stats['errors'],
+                'cancelled': self._stats['cancelled'],
+                'rejected': self._stats['rejected'],
+                'avg_wait_seconds': round(self._stats['wait_seconds'] / completed, 3) if completed else 0.0,
+                'max_wait_seconds': round(self._stats['max_wait_seconds'], 3),
+                'avg_run_seconds': round(self._stats['run_seconds'] / completed, 3) if completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AnalysisExecutor:
+    """The workload pools of the service: image (forensics, deepfake images, explanations), video, voice"""
+
+    def __init__(self):
+        voice_mode = EXEC_VOICE_MODE if EXEC_VOICE_MODE in MODES else 'thread'
+        if voice_mode != EXEC_VOICE_MODE:
+            logger.warning(f"Unknown EXEC_VOICE_MODE {EXEC_VOICE_MODE!r}, using threads")
+        self.pools = {
+            'image': WorkloadPool('image', EXEC_IMAGE_WORKERS, EXEC_IMAGE_QUEUE),
+            'video': WorkloadPool('video', EXEC_VIDEO_WORKERS, EXEC_VIDEO_QUEUE),
+            'voice': WorkloadPool('voice', EXEC_VOICE_WORKERS, EXEC_VOICE_QUEUE, voice_mode),
+        }
+
+    def check(self, workload: str):
+        self.pools[workload].check()
+
+    async def run(self, workload: str, fn, *args, **kwargs):
+        return await self.pools[workload].run(fn, *args, **kwargs)
+
+    async def run_queued(self, workload: str, fn, *args, on_admitted: Optional[Callable[[], None]] = None,
+                         **kwargs):
+        """Like run, but waits (retrying after Retry-After) while the pool is full instead of failing"""
+        pool = self.pools[workload]
+        while True:
+            try:
+                return await pool.run(fn, *args, on_admitted=on_admitted, **kwargs)
+            except ServiceOverloaded as e:
+                await asyncio.sleep(min(e.retry_after, QUEUED_RETRY_SECONDS))
+
+    async def run_unordered(self, workload: str, fn, arg_lists: list, concurrency: int = 0):
+        """
+        Run fn(*args) for every args in arg_lists on a pool, at most concurrency at a time (0 = the pool's
+        worker count), and yield (index, result, exception) as each call finishes - completion order.
+        A full pool delays the remaining calls (retried after Retry-After) instead of failing them;
+        closing the generator (client gone) cancels the calls that have not started.
+        """
+        pool = self.pools[workload]
+        semaphore = asyncio.Semaphore(concurrency or pool.workers)
+
+        async def call(index: int, args: tuple):
+            async with semaphore:
+                try:
+                    return index, await self.run_queued(workload, fn, *args), None
+                except Exception as e:
+                    return index, None, e
+
+        tasks = [asyncio.ensure_future(call(index, args)) for index, args in enumerate(arg_lists)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+analysis_executor = AnalysisExecutor()
@@ -0,0 +1,113 @@
+"""
+Explanation Store
+Keeps the intermediates of recent deepfake analyses (pixels, ELA map, most suspicious video frames)
+under an analysis ID, so heatmaps are only rendered when a client asks for them
+(GET /api/deepfake/{id}/explain). In-memory, bounded by entry count and bytes, entries expire after a TTL.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from service_config import (
+    EXPLAIN_STORE_MAX_BYTES,
+    EXPLAIN_STORE_MAX_ENTRIES,
+    EXPLAIN_STORE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _record_bytes(value) -> int:
+    """Approximate memory held by a record (numpy arrays dominate)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_record_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_record_bytes(v) for v in value)
+    return 0
+
+
+class ExplanationStore:
+    """
+    LRU of analysis records with TTL and a byte budget
+    Records are dicts; lazily computed entries (e.g. the Grad-CAM map) are added through update(),
+    which recounts the record against the byte budget.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 2 ** 20, ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._records: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'stored': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def put(self, record: dict) -> str:
+        """Store a record and return its new analysis ID"""
+        analysis_id = uuid.uuid4().hex
+        size = _record_bytes(record)
+        with self._lock:
+            self._records[analysis_id] = (time.time() + self.ttl, size, record)
+            self._bytes += size
+            self._stats['stored'] += 1
+            self._evict()
+        return analysis_id
+
+    def _evict(self):
+        # Caller holds the lock: expired records first, then least recently used over the budgets
+        now = time.time()
+        for analysis_id in [k for k, (expires, _, _) in self._records.items() if expires <= now]:
+            self._bytes -= self._records.pop(analysis_id)[1]
+        while self._records and (len(self._records) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size, _) = self._records.popitem(last=False)
+            self._bytes -= size
+            self._stats['evictions'] += 1
+
+    def update(self, analysis_id: str, key: str, value) -> bool:
+        """Set record[key] on a stored record and recount its size; False if it is no longer stored"""
+        with self._lock:
+            entry = self._records.get(analysis_id)
+            if entry is None:
+                return False
+            expires, size, record = entry
+            record[key] = value
+            new_size = _record_bytes(record)
+            self._records[analysis_id] = (expires, new_size, record)
+            self._bytes += new_size - size
+            self._evict()
+        return True
+
+    def get(self, analysis_id: str) -> Optional[dict]:
+        """The record, or None if unknown, evicted or expired"""
+        with self._lock:
+            entry = self._records.get(analysis_id)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._bytes -= self._records.pop(analysis_id)[1]
+                self._stats['misses'] += 1
+                return None
+            self._records.move_to_end(analysis_id)
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._records),
+                'max_entries': self.max_entries,
+                'megabytes': round(self._bytes / 2 ** 20, 1),
+                'max_megabytes': round(self.max_bytes / 2 ** 20, 1),
+                'ttl_seconds': self.ttl,
+                **self._stats,
+            }
+
+
+explanation_store = ExplanationStore(EXPLAIN_STORE_MAX_ENTRIES, EXPLAIN_STORE_MAX_BYTES, EXPLAIN_STORE_TTL)
@@ -0,0 +1,266 @@
+"""
+Face Detection Service
+Haar cascade classifiers loaded once per thread (a CascadeClassifier must not be shared between threads),
+detection on a downscaled copy with the boxes mapped back to full resolution, and one detection per
+image or frame shared by every face-based detector through ImageContext.faces.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from metrics import observe_stage
+from service_config import (
+    FACE_DETECT_MAX_SIDE,
+    FACE_TRACK_KEYFRAME_INTERVAL,
+    FACE_TRACK_MIN_CONFIDENCE,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# Haar cascades left the main OpenCV package in 5.x (opencv-python 4.x still ships them)
+CASCADE_AVAILABLE = CV2_AVAILABLE and hasattr(cv2, 'CascadeClassifier')
+
+FRONTAL_FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+
+# detectMultiScale settings the face heuristics are calibrated for
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 4
+
+_local = threading.local()
+# Why the cascade cannot be loaded (set by check_cascade), None while it works
+_cascade_error = None
+_stats_lock = threading.Lock()
+_stats = {'cascade_loads': 0, 'detections': 0, 'seconds': 0.0, 'tracked_frames': 0, 'tracking_seconds': 0.0}
+
+# Corner features tracked inside the face box, and how many must survive to trust the track
+TRACK_MAX_POINTS = 60
+TRACK_MIN_POINTS = 8
+# Forward-backward LK error (pixels of the working copy) above which a point is dropped
+TRACK_MAX_FB_ERROR = 1.0
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=3,
+                 criteria=(3, 20, 0.03))  # cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT
+
+
+def get_cascade(name: str = FRONTAL_FACE_CASCADE) -> 'cv2.CascadeClassifier':
+    """This thread's classifier for a bundled OpenCV cascade, loaded from XML on first use"""
+    cascades = getattr(_local, 'cascades', None)
+    if cascades is None:
+        cascades = _local.cascades = {}
+    cascade = cascades.get(name)
+    if cascade is None:
+        if not CASCADE_AVAILABLE:
+            raise RuntimeError("OpenCV Haar cascades not available (install opencv-python 4.x)")
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + name)
+        if cascade.empty():
+            raise RuntimeError(f"Could not load face cascade {name}")
+        cascades[name] = cascade
+        with _stats_lock:
+            _stats['cascade_loads'] += 1
+    return cascade
+
+
+def check_cascade() -> Optional[str]:
+    """
+    Load the frontal face cascade once (at startup) and log when face detection is unavailable
+    Returns: None when it loads, else the reason (also reported by face_detection_stats)
+    """
+    global _cascade_error
+    try:
+        get_cascade()
+        _cascade_error = None
+    except RuntimeError as e:
+        _cascade_error = str(e)
+        logger.warning(f"Face detection unavailable: {e}. Face checks find no faces and video face "
+                       f"tracking is off")
+    return _cascade_error
+
+
+def _downscale(gray: np.ndarray, max_side: int) -> tuple:
+    """(copy downscaled to max_side with INTER_AREA, scale factor); the image itself when small enough"""
+    height, width = gray.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return gray, 1.0
+    scale = max_side / max(height, width)
+    small = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def _to_full(boxes: np.ndarray, scale: float, shape: tuple) -> np.ndarray:
+    """Float (x, y, w, h) boxes of a downscaled copy as int boxes of the full-resolution image"""
+    height, width = shape[:2]
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if scale != 1.0 and len(boxes):
+        boxes = boxes / scale
+    # Keep the boxes inside the frame
+    boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+    boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return np.round(boxes).astype(np.int32)
+
+
+def _detect_small(small: np.ndarray) -> np.ndarray:
+    start = time.perf_counter()
+    faces = get_cascade().detectMultiScale(small, SCALE_FACTOR, MIN_NEIGHBORS)
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        _stats['detections'] += 1
+        _stats['seconds'] += elapsed
+    observe_stage('face_detection', elapsed)
+    return np.asarray(faces, dtype=np.float64).reshape(-1, 4)
+
+
+def detect_faces(gray: np.ndarray, max_side: int = None) -> np.ndarray:
+    """
+    Frontal faces in a gray image
+    max_side: detect on a copy downscaled to this longest side (None = FACE_DETECT_MAX_SIDE, 0 = full resolution)
+    Returns: int array of (x, y, w, h) boxes in full-resolution coordinates, shape (N, 4)
+    """
+    small, scale = _downscale(gray, FACE_DETECT_MAX_SIDE if max_side is None else max_side)
+    return _to_full(_detect_small(small), scale, gray.shape)
+
+
+def largest_face(faces: np.ndarray):
+    """(x, y, w, h) of the largest box, or None"""
+    if faces is None or len(faces) == 0:
+        return None
+    return tuple(int(v) for v in max(faces, key=lambda f: f[2] * f[3]))
+
+
+class FaceTracker:
+    """
+    Largest face of a frame sequence without a cascade pass per frame
+    Haar detection runs on keyframes (every keyframe_interval frames, and whenever the track is lost);
+    in between, corner features inside the box are followed with pyramidal Lucas-Kanade optical flow
+    and the box is moved and scaled by their median motion. A forward-backward check drops unreliable
+    points; the share of points that survive is the tracking confidence, and the next frame is
+    re-detected when it falls below min_confidence.
+    Not thread-safe: use one tracker per frame sequence.
+    """
+
+    def __init__(self, keyframe_interval: int = FACE_TRACK_KEYFRAME_INTERVAL,
+                 min_confidence: float = FACE_TRACK_MIN_CONFIDENCE, max_side: int = None):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.min_confidence = min_confidence
+        self.max_side = FACE_DETECT_MAX_SIDE if max_side is None else max_side
+        self.frames = 0
+        self.keyframes = 0
+        self.redetections = 0
+        self._prev = None      # Previous working copy
+        self._points = None    # (N, 1, 2) float32 features in the previous working copy
+        self._box = None       # (x, y, w, h) float box in working-copy coordinates
+        self._since_keyframe = 0
+
+    def update(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Face boxes of the next frame (gray, same size as the previous ones)
+        Returns: int array of (x, y, w, h) boxes in full-resolution coordinates, shape (N, 4) -
+                 every detected face on keyframes, the tracked face in between
+        """
+        small, scale = _downscale(gray, self.max_side)
+        self.frames += 1
+        boxes = None
+        if self._box is not None and self._since_keyframe < self.keyframe_interval:
+            start = time.perf_counter()
+            tracked = self._track(small)
+            elapsed = time.perf_counter() - start
+            with _stats_lock:
+                _stats['tracked_frames'] += 1
+                _stats['tracking_seconds'] += elapsed
+            observe_stage('face_tracking', elapsed)
+            if tracked is not None:
+                boxes = np.asarray([tracked])
+                self._since_keyframe += 1
+            else:
+                self.redetections += 1
+        if boxes is None:
+            boxes = _detect_small(small)
+            self.keyframes += 1
+            self._since_keyframe = 0
+            self._start(small, boxes)
+        self._prev = small
+        return _to_full(boxes, scale, gray.shape)
+
+    def _start(self, small: np.ndarray, boxes: np.ndarray):
+        """Pick up features inside the largest detected box (no track if there is none or it is flat)"""
+        self._box, self._points = None, None
+        face = largest_face(boxes)
+        if face is None:
+            return
+        x, y, w, h = face
+        mask = np.zeros(small.shape[:2], dtype=np.uint8)
+        mask[y:y + h, x:x + w] = 255
+        points = cv2.goodFeaturesToTrack(small, TRACK_MAX_POINTS, 0.01, 3, mask=mask)
+        if points is not None and len(points) >= TRACK_MIN_POINTS:
+            self._box, self._points = np.asarray(face, dtype=np.float64), points
+
+    def _track(self, small: np.ndarray):
+        """Box moved into this frame, or None (and the track dropped) when confidence is too low"""
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev, small, self._points, None, **LK_PARAMS)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(small, self._prev, points, None, **LK_PARAMS)
+        error = np.linalg.norm((back - self._points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < TRACK_MAX_FB_ERROR)
+        confidence = good.mean() if len(good) else 0.0
+        if good.sum() < TRACK_MIN_POINTS or confidence < self.min_confidence:
+            self._box, self._points = None, None
+            return None
+
+        old, new = self._points.reshape(-1, 2)[good], points.reshape(-1, 2)[good]
+        # Scale: median change of the spread around the centroid; shift: median motion of the centre
+        old_spread = np.linalg.norm(old - np.median(old, axis=0), axis=1)
+        new_spread = np.linalg.norm(new - np.median(new, axis=0), axis=1)
+        valid = old_spread > 1e-3
+        ratio = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+        x, y, w, h = self._box
+        cx, cy = np.array([x + w / 2, y + h / 2]) + np.median(new - old, axis=0)
+        w, h = w * ratio, h * ratio
+        height, width = small.shape[:2]
+        if cx < 0 or cy < 0 or cx >= width or cy >= height or w < 1 or h < 1:
+            # Face left the frame
+            self._box, self._points = None, None
+            return None
+        self._box = np.array([cx - w / 2, cy - h / 2, w, h])
+        self._points = new.reshape(-1, 1, 2).astype(np.float32)
+        return self._box
+
+    def stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'tracked': self.frames - self.keyframes,
+            'redetections': self.redetections,
+        }
+
+
+def track_faces(grays: List[np.ndarray], keyframe_interval: int = FACE_TRACK_KEYFRAME_INTERVAL) -> tuple:
+    """
+    Face boxes of consecutive gray frames, detected on keyframes and tracked in between (FaceTracker)
+    Returns: (list of (N, 4) box arrays, one per frame, tracker stats)
+    """
+    tracker = FaceTracker(keyframe_interval)
+    return [tracker.update(gray) for gray in grays], tracker.stats()
+
+
+def face_detection_stats() -> dict:
+    with _stats_lock:
+        return {
+            'available': CASCADE_AVAILABLE and _cascade_error is None,
+            'error': _cascade_error,
+            'max_side': FACE_DETECT_MAX_SIDE,
+            'cascade_loads': _stats['cascade_loads'],
+            'detections': _stats['detections'],
+            'seconds': round(_stats['seconds'], 3),
+            'tracked_frames': _stats['tracked_frames'],
+            'tracking_seconds': round(_stats['tracking_seconds'], 3),
+        }
@@ -73,10 +73,35 @@ THRESHOLDS = {
 
 SENSITIVITY_LEVEL = REQUESTED_SENSITIVITY if REQUESTED_SENSITIVITY in THRESHOLDS else 'balanced'
 
+# ========== SCALE CALIBRATION ==========
+
+# Global statistics of large images are computed on a size-bounded proxy (ANALYSIS_PROXY_MAX_PIXELS).
+# Thresholds whose statistic depends on resolution are rescaled: threshold * scale ** exponent,
+# scale = proxy side / original side. Exponents measured by INTER_AREA downscaling of 8-12 MP photos
+# and phone screenshots; ELA thresholds are not listed because ELA always runs at full resolution.
+THRESHOLD_SCALE_EXPONENTS = {
+    'frequency_variance_ratio': 1.0,  # FFT magnitude var/mean grows ~linearly with image side (0.7-1.3)
+    'noise_std_high': 0.0,  # Regional noise spread: within +-0.1
+    'noise_std_moderate': 0.0,
+    'sharp_edge_high': 0.0,  # Sharp edge ratio: within +-0.1
+    'sharp_edge_moderate': 0.0,
+    'low_variance_threshold': 0.0,  # Global std: ~0.05
+}
+
+def scale_threshold(key, value, scale=1.0):
+    """Threshold for a statistic computed at `scale` of the original resolution"""
+    exponent = THRESHOLD_SCALE_EXPONENTS.get(key, 0.0)
+    if scale >= 1.0 or not exponent:
+        return value
+    return value * scale ** exponent
+
 # Get current thresholds based on sensitivity level
-def get_thresholds():
-    """Get current detection thresholds based on sensitivity level"""
-    return THRESHOLDS.get(SENSITIVITY_LEVEL, THRESHOLDS['balanced'])
+def get_thresholds(scale=1.0):
+    """Get current detection thresholds based on sensitivity level (calibrated for the analysis scale)"""
+    thresholds = THRESHOLDS.get(SENSITIVITY_LEVEL, THRESHOLDS['balanced'])
+    if scale >= 1.0:
+        return thresholds
+    return {key: scale_threshold(key, value, scale) for key, value in thresholds.items()}
 
 # ========== SCREENSHOT DETECTION CONFIG ==========
 
@@ -143,6 +168,16 @@ def get_recommendation():
     """Get recommendation for current sensitivity level"""
     return RECOMMENDATIONS.get(SENSITIVITY_LEVEL, RECOMMENDATIONS['balanced'])
 
+def get_active_config():
+    """Snapshot of the settings forensics results depend on (cached results are invalidated when it changes)"""
+    return {
+        'sensitivity': SENSITIVITY_LEVEL,
+        'thresholds': get_thresholds(),
+        'screenshot_features': SCREENSHOT_FEATURES,
+        'screenshot_adjustments': GENUINE_SCREENSHOT_ADJUSTMENTS,
+        'scale_exponents': THRESHOLD_SCALE_EXPONENTS,
+    }
+
 def print_current_config():
     """Print current configuration"""
     print(f"\n{'='*60}")
@@ -0,0 +1,104 @@
+"""
+Grad-CAM Explainer
+Builds the gradient model of a Keras classifier once and returns the class probability and the
+Grad-CAM heatmap of every image in a batch from a single taped forward pass (no separate predict call).
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+# Last expansion conv of MobileNetV2 (7x7 at 224x224 input)
+GRADCAM_LAYER = 'block_16_expand'
+
+
+def _last_spatial_layer(model):
+    """Deepest layer with a 4D (N, H, W, C) output, or None"""
+    for layer in model.layers[::-1]:
+        try:
+            if len(layer.output.shape) == 4:
+                return layer
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+class GradCamExplainer:
+    """
+    Cached Grad-CAM for one classifier with a sigmoid output (probability of being fake)
+    Works on flat models and on models that wrap their backbone as a nested model
+    (the classifier built in main.build_deepfake_cnn_model): the conv layer is then taken from the
+    backbone and the top-level layers after it are applied in order.
+    """
+
+    def __init__(self, model, layer_name: str = GRADCAM_LAYER):
+        import tensorflow as tf
+        from tensorflow import keras
+
+        self.features, self.head, self.layer_name = self._split(keras, model, layer_name)
+        input_shape = tuple(model.inputs[0].shape[1:])
+        features, head = self.features, self.head
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, *input_shape), dtype=tf.float32)])
+        def explain_fn(images):
+            with tf.GradientTape() as tape:
+                conv_outputs, outputs = features(images, training=False)
+                for layer in head:
+                    outputs = layer(outputs, training=False)
+                probabilities = outputs[:, 0]
+            grads = tape.gradient(probabilities, conv_outputs)
+            # Per-image channel weights: gradients pooled over the spatial axes
+            weights = tf.reduce_mean(grads, axis=(1, 2))
+            heatmaps = tf.nn.relu(tf.einsum('nhwc,nc->nhw', conv_outputs, weights))
+            peaks = tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True)
+            return probabilities, tf.math.divide_no_nan(heatmaps, peaks)
+
+        self._explain_fn = explain_fn
+
+    @staticmethod
+    def _split(keras, model, layer_name: str) -> Tuple[object, list, str]:
+        """(model returning [conv output, features output], top-level layers still to apply, conv layer name)"""
+        try:
+            conv = model.get_layer(layer_name)
+            return keras.Model(model.inputs, [conv.output, model.output]), [], conv.name
+        except ValueError:
+            pass
+        for index, layer in enumerate(model.layers):
+            if isinstance(layer, keras.Model):
+                try:
+                    conv = layer.get_layer(layer_name)
+                except ValueError:
+                    conv = _last_spatial_layer(layer)
+                if conv is not None:
+                    backbone = keras.Model(layer.inputs, [conv.output, layer.output])
+                    return backbone, list(model.layers[index + 1:]), conv.name
+        conv = _last_spatial_layer(model)
+        if conv is None:
+            raise ValueError("Model has no convolutional layer for Grad-CAM")
+        return keras.Model(model.inputs, [conv.output, model.output]), [], conv.name
+
+    def explain(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probabilities and Grad-CAM heatmaps for a preprocessed float32 batch
+        Returns: (probabilities of shape (N,), float32 heatmaps in [0, 1] at conv resolution, shape (N, h, w))
+        """
+        probabilities, heatmaps = self._explain_fn(np.ascontiguousarray(batch, dtype=np.float32))
+        return probabilities.numpy(), heatmaps.numpy().astype(np.float32)
+
+
+def heatmap_to_image(heatmap: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Resize a [0, 1] float32 heatmap to (height, width) in float32 and scale to uint8 (0-255)"""
+    height, width = size
+    resized = cv2.resize(heatmap.astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR)
+    return (np.clip(resized, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def heatmaps_to_images(heatmaps: np.ndarray, images: List[np.ndarray]) -> List[np.ndarray]:
+    """Heatmaps resized to the sizes of their source images"""
+    return [heatmap_to_image(heatmap, image.shape[:2]) for heatmap, image in zip(heatmaps, images)]
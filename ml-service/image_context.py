@@ -0,0 +1,254 @@
+"""
+Shared Per-Request Image Context
+Decodes an image once and lazily computes (and memoizes) the derived planes the detectors need:
+pixel array, BGR view, gray planes, float32 copy, FFT features, ELA difference map, face boxes, EXIF, screenshot class,
+and a size-bounded proxy context for global statistics of large images.
+The request handler creates one context per decoded image and passes it to every detector (ctx argument).
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+from PIL import Image
+from block_stats import block_stats, channel_histograms
+from ela import ELA_QUALITY, run_ela
+from face_detection import detect_faces
+from spectral import spectrum_features
+from service_config import ANALYSIS_PROXY_MAX_PIXELS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    from fraud_detection_config import SCREENSHOT_FEATURES
+except ImportError:
+    SCREENSHOT_FEATURES = {
+        'common_aspect_ratios': [16/9, 9/16, 19.5/9, 20/9, 18.5/9, 4/3, 3/4, 21/9, 18/9],
+        'ratio_tolerance': 0.03,
+    }
+
+
+class ImageContext:
+    """
+    Lazily derived, memoized views of one decoded image
+    Every plane is computed on first access and reused by all later consumers in the request.
+    memoize=False recomputes on every access (used by the benchmarks as the baseline).
+    max_pixels bounds the proxy used for global statistics (None = ANALYSIS_PROXY_MAX_PIXELS, 0 = no proxy).
+    """
+
+    def __init__(self, image: Image.Image, memoize: bool = True, max_pixels: Optional[int] = None):
+        self.image = image
+        self.width, self.height = image.size
+        self.memoize = memoize
+        self.max_pixels = ANALYSIS_PROXY_MAX_PIXELS if max_pixels is None else max_pixels
+        self._memo = {}
+        # Per-plane compute count and seconds, to show what the sharing saved
+        self.computed = {}
+        self.compute_time = {}
+
+    def derive(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """Memoize an arbitrary derived value under key"""
+        if self.memoize and key in self._memo:
+            return self._memo[key]
+        start = time.perf_counter()
+        value = compute()
+        name = key if isinstance(key, str) else ':'.join(str(k) for k in key)
+        self.computed[name] = self.computed.get(name, 0) + 1
+        self.compute_time[name] = self.compute_time.get(name, 0.0) + time.perf_counter() - start
+        if self.memoize:
+            self._memo[key] = value
+        return value
+
+    # ----- pixel planes -----
+
+    @property
+    def array(self) -> np.ndarray:
+        """Pixel array in the image's own mode (RGB for analysis requests)"""
+        return self.derive('array', lambda: np.array(self.image))
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """OpenCV channel order (unchanged for non-colour images)"""
+        def compute():
+            arr = self.array
+            if len(arr.shape) == 3:
+                return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+            return arr.copy()
+        return self.derive('bgr', compute)
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Luma (OpenCV BT.601 weights), uint8 - the plane OCR and ELA run on"""
+        def compute():
+            arr = self.array
+            if len(arr.shape) != 3:
+                return arr
+            if CV2_AVAILABLE:
+                return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+            return np.round(arr[:, :, :3] @ np.array([0.299, 0.587, 0.114])).astype(np.uint8)
+        return self.derive('gray', compute)
+
+    @property
+    def swapped_gray(self) -> np.ndarray:
+        """
+        Gray plane with red/blue weights exchanged: what the deepfake detectors get
+        by running an RGB-to-gray conversion on the BGR array
+        """
+        def compute():
+            arr = self.array
+            if len(arr.shape) != 3:
+                return arr
+            return cv2.cvtColor(self.bgr, cv2.COLOR_RGB2GRAY)
+        return self.derive('swapped_gray', compute)
+
+    @property
+    def mean_gray(self) -> np.ndarray:
+        """Unweighted channel mean, float64 - the plane the forgery heuristics use"""
+        def compute():
+            arr = self.array
+            return np.mean(arr, axis=2) if len(arr.shape) == 3 else arr.astype(np.float64)
+        return self.derive('mean_gray', compute)
+
+    @property
+    def mean_gray_u8(self) -> np.ndarray:
+        return self.derive('mean_gray_u8', lambda: self.mean_gray.astype(np.uint8))
+
+    @property
+    def float32(self) -> np.ndarray:
+        return self.derive('float32', lambda: self.array.astype(np.float32))
+
+    # ----- analysis proxy -----
+
+    @property
+    def scale(self) -> float:
+        """Linear scale of the proxy relative to the original (1.0 = global stats at full resolution)"""
+        pixels = self.width * self.height
+        if not self.max_pixels or pixels <= self.max_pixels or not CV2_AVAILABLE:
+            return 1.0
+        return (self.max_pixels / pixels) ** 0.5
+
+    def _proxy_size(self) -> tuple:
+        scale = self.scale
+        if scale >= 1.0:
+            return self.width, self.height
+        return max(1, round(self.width * scale)), max(1, round(self.height * scale))
+
+    @property
+    def proxy(self) -> 'ImageContext':
+        """
+        Context of the downscaled (INTER_AREA) image for global statistics; self when no downscaling is needed
+        Localized checks (ELA, faces, metadata, OCR) must keep using the full-resolution context.
+        """
+        if self.scale >= 1.0:
+            return self
+
+        def compute():
+            small = cv2.resize(self.array, self._proxy_size(), interpolation=cv2.INTER_AREA)
+            return ImageContext(Image.fromarray(small), memoize=self.memoize, max_pixels=0)
+        return self.derive('proxy', compute)
+
+    @property
+    def working_size(self) -> dict:
+        """Resolution global statistics run at (scale = proxy side / original side), for the response"""
+        width, height = self._proxy_size()
+        return {
+            'width': width,
+            'height': height,
+            'scale': round(width / self.width, 4) if self.width else 1.0,
+            'original': {'width': self.width, 'height': self.height},
+        }
+
+    # ----- analyses -----
+
+    def spectrum(self, plane: str = 'mean_gray') -> dict:
+        """Frequency-domain features of a gray plane (see spectral.spectrum_features)"""
+        return self.derive(('spectrum', plane), lambda: spectrum_features(getattr(self, plane)))
+
+    def block_stats(self, tile: int, rows: Optional[int] = None, cols: Optional[int] = None) -> dict:
+        """Per-tile mean/var/std maps of the pixel array (see block_stats.block_stats)"""
+        return self.derive(('block_stats', tile, rows, cols), lambda: block_stats(self.array, tile, rows, cols))
+
+    @property
+    def histograms(self) -> np.ndarray:
+        """Per-channel 256-bin histograms, shape (channels, 256)"""
+        return self.derive('histograms', lambda: channel_histograms(self.array))
+
+    def ela(self, plane: str = 'gray', qualities: Iterable[int] = (ELA_QUALITY,)) -> Dict[int, dict]:
+        """
+        Error level analysis of a gray plane, in memory
+        Qualities not analyzed yet are computed together in one pass.
+        Returns: {quality: {'diff', 'mean', 'std', 'max'}}
+        """
+        qualities = tuple(qualities)
+        missing = [q for q in qualities if ('ela', plane, q) not in self._memo]
+        computed = self.derive(('ela', plane, *missing), lambda: run_ela(getattr(self, plane), missing)) if missing else {}
+        if self.memoize:
+            for quality, result in computed.items():
+                self._memo[('ela', plane, quality)] = result
+        return {q: computed[q] if q in computed else self._memo[('ela', plane, q)] for q in qualities}
+
+    def ela_diff(self, plane: str = 'gray', quality: int = ELA_QUALITY) -> np.ndarray:
+        """Absolute difference (float32) between a gray plane and its JPEG re-compression"""
+        return self.ela(plane, (quality,))[quality]['diff']
+
+    @property
+    def faces(self) -> np.ndarray:
+        """
+        Frontal face boxes (x, y, w, h), shared by all face-based detectors (no boxes when face detection
+        is unavailable). Found on swapped_gray, the plane the face consistency check has always detected on;
+        the video face-mask check, which used to detect on luma, reuses these boxes
+        """
+        def compute():
+            try:
+                return detect_faces(self.swapped_gray)
+            except Exception as e:
+                logger.warning(f"Face detection error: {e}")
+                return np.empty((0, 4), dtype=np.int32)
+        return self.derive('faces', compute)
+
+    @property
+    def exif(self) -> Optional[dict]:
+        """EXIF tags, or None when the image has none (read errors propagate and are not cached)"""
+        return self.derive('exif', lambda: self.image._getexif() if hasattr(self.image, '_getexif') else None)
+
+    @property
+    def screenshot(self) -> dict:
+        """
+        Native screenshot classification (aspect ratio / mobile resolution)
+        Returns: dict with aspect_ratio, is_common_ratio, has_mobile_resolution, is_typical_screenshot
+        """
+        def compute():
+            width, height = self.width, self.height
+            aspect_ratio = width / height if height > 0 else 1
+            tolerance = SCREENSHOT_FEATURES['ratio_tolerance'] * 1.5
+            is_common_ratio = any(
+                abs(aspect_ratio - r) < tolerance or abs((1 / aspect_ratio) - r) < tolerance
+                for r in SCREENSHOT_FEATURES['common_aspect_ratios']
+            )
+            has_mobile_resolution = min(width, height) >= 400 and max(width, height) >= 800
+            reasonable_dimensions = width >= 300 and height >= 500
+            return {
+                'aspect_ratio': aspect_ratio,
+                'is_common_ratio': is_common_ratio,
+                'has_mobile_resolution': has_mobile_resolution,
+                'is_typical_screenshot': is_common_ratio or (has_mobile_resolution and reasonable_dimensions),
+            }
+        return self.derive('screenshot', compute)
+
+    def stats(self) -> dict:
+        """Which planes were computed, how often and how long they took (proxy planes prefixed 'proxy.')"""
+        stats = {
+            name: {'computed': count, 'seconds': round(self.compute_time.get(name, 0.0), 4)}
+            for name, count in self.computed.items()
+        }
+        proxy = self._memo.get('proxy')
+        if proxy is not None:
+            stats.update({f"proxy.{name}": entry for name, entry in proxy.stats().items()})
+        return stats
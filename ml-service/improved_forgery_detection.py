@@ -5,11 +5,13 @@ This file contains the updated analyze_forgery function with configurable thresh
 
 import numpy as np
 from PIL import Image
-import tempfile
-import os
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import logging
 
+from block_stats import tile_count
+from image_context import ImageContext
+from service_config import FORENSICS_BLOCK_COVERAGE
+
 logger = logging.getLogger(__name__)
 
 # Import configuration
@@ -17,7 +19,7 @@ try:
     from fraud_detection_config import get_thresholds, SCREENSHOT_FEATURES, GENUINE_SCREENSHOT_ADJUSTMENTS
 except ImportError:
     # Fallback to default balanced thresholds
-    def get_thresholds():
+    def get_thresholds(scale=1.0):
         return {
             'ela_edited_threshold': 18,
             'ela_high_threshold': 28,
@@ -54,16 +56,21 @@ except ImportError:
     CV2_AVAILABLE = False
     logger.warning("OpenCV not available - some forensics features disabled")
 
-def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, bool, float, List[str]]:
+def analyze_forgery_improved(image: Image.Image, ctx: Optional[ImageContext] = None
+                             ) -> Tuple[float, str, float, bool, float, List[str]]:
     """
     IMPROVED forgery detection with reduced false positives
+    ctx: the request's ImageContext, whose derived planes are shared with the other detectors (None = a fresh one)
     Returns: (forgery_score, verdict, confidence, is_edited, edit_confidence, edit_indicators)
     """
-    # Get current thresholds
-    T = get_thresholds()
+    # Global statistics run on a size-bounded proxy of large images (localized checks stay full-res).
+    ctx = ctx or ImageContext(image)
+    img_array = ctx.array
+    proxy = ctx.proxy
+    proxy_array = proxy.array
     
-    # Convert to numpy array
-    img_array = np.array(image)
+    # Get current thresholds (calibrated for the proxy scale)
+    T = get_thresholds(scale=ctx.working_size['scale'])
     
     forgery_score = 0.0
     confidence = 0.4  # Start lower to reduce false positives
@@ -72,22 +79,8 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
     width, height = image.size
     
     # ===== SCREENSHOT DETECTION (Genuine Detection) - MORE LENIENT =====
-    aspect_ratio = width / height if height > 0 else 1
-    common_ratios = SCREENSHOT_FEATURES['common_aspect_ratios']
-    tolerance = SCREENSHOT_FEATURES['ratio_tolerance'] * 1.5  # More lenient tolerance
-    
-    def matches_ratio(ratio: float, tol: float = tolerance) -> bool:
-        return abs(aspect_ratio - ratio) < tol or abs((1 / aspect_ratio) - ratio) < tol
-    
-    is_common_ratio = any(matches_ratio(r) for r in common_ratios)
-    # More lenient resolution check - many screenshots are smaller
-    has_mobile_resolution = (min(width, height) >= 400 and max(width, height) >= 800)  # Lowered from 600/1200
-    # Don't require divisible_by_10 - many screenshots don't meet this
-    # Just check if dimensions are reasonable for screenshots
-    reasonable_dimensions = width >= 300 and height >= 500
-    
-    # Screenshot if: common ratio OR (mobile resolution AND reasonable dimensions)
-    is_typical_screenshot = is_common_ratio or (has_mobile_resolution and reasonable_dimensions)
+    # Screenshot if: common ratio (1.5x tolerance) OR (mobile resolution AND reasonable dimensions)
+    is_typical_screenshot = ctx.screenshot['is_typical_screenshot']
     
     # Track strong forgery indicators (score additions >= 25)
     strong_indicators: List[str] = []
@@ -112,7 +105,7 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
     
     # 1. METADATA ANALYSIS - Less aggressive
     try:
-        exif_data = image._getexif() if hasattr(image, '_getexif') else None
+        exif_data = ctx.exif
         if exif_data is None:
             if is_typical_screenshot:
                 # Screenshots normally don't have EXIF - this is FINE
@@ -145,13 +138,15 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
     if len(img_array.shape) == 3:
         block_size = 8
         if height >= block_size * 2 and width >= block_size * 2:
-            block_variances = []
-            for i in range(0, min(height - block_size, 64), block_size):
-                for j in range(0, min(width - block_size, 64), block_size):
-                    block = img_array[i:i+block_size, j:j+block_size]
-                    block_variances.append(np.var(block))
+            if FORENSICS_BLOCK_COVERAGE == 'full':
+                rows = cols = None
+            else:
+                # Blocks starting in the top-left 64x64 corner
+                rows = tile_count(height, block_size, min(height - block_size, 64))
+                cols = tile_count(width, block_size, min(width - block_size, 64))
+            block_variances = ctx.block_stats(block_size, rows, cols)['var']
             
-            if len(block_variances) > 0:
+            if block_variances.size > 0:
                 avg_block_var = np.mean(block_variances)
                 # More forgiving threshold - only flag very suspicious patterns
                 if avg_block_var < 30 and not is_typical_screenshot:  # Reduced from 50
@@ -161,15 +156,15 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
                     strong_indicators.append("compression")
     
     # 3. NOISE INCONSISTENCY DETECTION - More forgiving thresholds
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         regions_noise = []
-        region_size = min(height, width) // 4
+        region_size = min(proxy.height, proxy.width) // 4
         
         if region_size > 10:
-            for i in range(0, height - region_size, region_size):
-                for j in range(0, width - region_size, region_size):
-                    region = img_array[i:i+region_size, j:j+region_size]
-                    regions_noise.append(np.std(region))
+            regions = proxy.block_stats(region_size,
+                                        tile_count(proxy.height, region_size, proxy.height - region_size),
+                                        tile_count(proxy.width, region_size, proxy.width - region_size))
+            regions_noise = regions['std'].ravel()
         
         if len(regions_noise) > 1:
             noise_std = np.std(regions_noise)
@@ -186,8 +181,8 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
                 confidence += 0.08
     
     # 4. EDGE DETECTION ANOMALIES - More forgiving
-    if len(img_array.shape) == 3:
-        gray = np.mean(img_array, axis=2).astype(np.uint8)
+    if len(proxy_array.shape) == 3:
+        gray = proxy.mean_gray_u8
         
         if gray.shape[0] > 2 and gray.shape[1] > 2:
             grad_x = np.abs(np.diff(gray, axis=1))
@@ -211,8 +206,8 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
                 confidence += 0.08
     
     # 5. STATISTICAL INCONSISTENCY - More forgiving
-    if len(img_array.shape) == 3:
-        std_val = np.std(img_array)
+    if len(proxy_array.shape) == 3:
+        std_val = np.std(proxy_array)
         
         # Use configurable threshold
         if std_val < T['low_variance_threshold']:
@@ -252,18 +247,9 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
     # Method 1: Error Level Analysis (ELA) - Use improved thresholds
     if CV2_AVAILABLE and len(img_array.shape) == 3:
         try:
-            import cv2
-            img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-            
-            temp_path = tempfile.mktemp(suffix='.jpg')
-            cv2.imwrite(temp_path, gray, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            recompressed = cv2.imread(temp_path, cv2.IMREAD_GRAYSCALE)
-            os.remove(temp_path)
-            
-            diff = np.abs(gray.astype(np.float32) - recompressed.astype(np.float32))
-            ela_score = np.mean(diff)
-            ela_std = np.std(diff)
+            ela = ctx.ela('gray', (90,))[90]
+            ela_score = ela['mean']
+            ela_std = ela['std']
             
             # Use configurable thresholds
             if ela_score > T['ela_high_threshold']:
@@ -287,16 +273,11 @@ def analyze_forgery_improved(image: Image.Image) -> Tuple[float, str, float, boo
             logger.debug(f"ELA analysis error: {e}")
     
     # Method 2: Frequency Domain Analysis - ALMOST IGNORE FOR SCREENSHOTS
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         try:
-            from numpy import fft
-            gray = np.mean(img_array, axis=2)
-            f_transform = fft.fft2(gray)
-            f_shift = fft.fftshift(f_transform)
-            magnitude_spectrum = np.abs(f_shift)
-            
-            freq_variance = np.var(magnitude_spectrum)
-            freq_mean = np.mean(magnitude_spectrum)
+            spectrum = proxy.spectrum('mean_gray')
+            freq_variance = spectrum['var']
+            freq_mean = spectrum['mean']
             
             # Screenshots naturally contain lots of grid/UI elements, text, buttons, icons
             # These create frequency patterns that are COMPLETELY NORMAL for screenshots
@@ -0,0 +1,102 @@
+"""
+Lightweight CPU Inference Backends
+TFLite and ONNX Runtime runners for classifiers exported by tools/export_deepfake_cnn.py.
+Same contract as the Keras model - float32 (N, H, W, C) batch in, (N, 1) probabilities out -
+without importing TensorFlow into the serving process.
+"""
+
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# Standalone TFLite interpreters (no TensorFlow import); tf.lite is the last resort
+try:
+    from ai_edge_litert.interpreter import Interpreter as TFLiteInterpreter
+    TFLITE_AVAILABLE = True
+except ImportError:
+    try:
+        from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
+        TFLITE_AVAILABLE = True
+    except ImportError:
+        TFLiteInterpreter = None
+        TFLITE_AVAILABLE = False
+
+BACKENDS = ('tensorflow', 'tflite', 'onnx')
+
+
+class TFLiteClassifier:
+    """
+    TFLite interpreter (INT8 dynamic-range quantized weights, float32 I/O)
+    The interpreter is not thread-safe; calls are serialized.
+    """
+    backend = 'tflite'
+
+    def __init__(self, path: str, threads: int = 1):
+        interpreter_cls = TFLiteInterpreter
+        if interpreter_cls is None:
+            logger.warning("No standalone TFLite runtime installed; falling back to tf.lite (imports TensorFlow)")
+            import tensorflow as tf
+            interpreter_cls = tf.lite.Interpreter
+        self.path = path
+        self.parameters = None
+        self.weight_bytes = os.path.getsize(path)
+        self._interpreter = interpreter_cls(model_path=path, num_threads=threads)
+        self._input = self._interpreter.get_input_details()[0]['index']
+        self._output = self._interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+class OnnxClassifier:
+    """ONNX Runtime session on the CPU execution provider (thread-safe)"""
+    backend = 'onnx'
+
+    def __init__(self, path: str, threads: int = 1):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = path
+        self.parameters = None
+        self.weight_bytes = os.path.getsize(path)
+        self._session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self._input = self._session.get_inputs()[0].name
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self._session.run(None, {self._input: batch})[0]
+
+
+def load_classifier(backend: str, path: str, threads: int = 1):
+    """
+    Exported classifier for a lightweight backend ('tflite' or 'onnx')
+    Raises: ValueError (unknown backend), ImportError (runtime missing), FileNotFoundError (not exported yet)
+    """
+    if backend not in ('tflite', 'onnx'):
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if backend == 'onnx' and not ONNXRUNTIME_AVAILABLE:
+        raise ImportError("onnxruntime is not installed. Install with: pip install onnxruntime")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found - export it with tools/export_deepfake_cnn.py")
+    classifier = OnnxClassifier(path, threads) if backend == 'onnx' else TFLiteClassifier(path, threads)
+    logger.info(f"Loaded {backend} classifier from {path} ({classifier.weight_bytes / 2 ** 20:.1f} MB)")
+    return classifier
@@ -0,0 +1,321 @@
+"""
+Analysis Jobs
+Long video and voice analyses can run as jobs instead of inside the request: submitting returns a job ID
+at once, GET /api/jobs/{id} reports status, progress and the result, and an optional webhook is called
+when the job ends. Jobs wait on their workload pool while it is full, finished jobs are kept for a TTL,
+and resubmitting the same file with the same options returns the existing job instead of a second analysis.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+
+from fastapi import HTTPException
+
+from execution import ServiceOverloaded, analysis_executor
+from service_config import (
+    JOB_MAX_ACTIVE,
+    JOB_STORE_MAX_ENTRIES,
+    JOB_STORE_TTL,
+    JOB_WEBHOOK_HOSTS,
+    JOB_WEBHOOK_RETRIES,
+    JOB_WEBHOOK_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Retry-After when too many jobs are active (they take tens of seconds each)
+JOBS_RETRY_AFTER = 10
+
+_local = threading.local()
+
+
+class JobCancelled(BaseException):
+    """
+    Raised at a progress checkpoint of a cancelled job
+    A BaseException, so the detectors' `except Exception` fallbacks do not turn it into a result
+    """
+
+
+def job_progress(fraction: float, stage: str = None):
+    """
+    Report progress (0-1) of the job running on this thread; a no-op outside jobs
+    Raises: JobCancelled once the job has been cancelled (analyses stop at their next checkpoint)
+    """
+    job = getattr(_local, 'job', None)
+    if job is None:
+        return
+    if job.cancel_requested.is_set():
+        raise JobCancelled()
+    job.progress = max(job.progress, min(1.0, fraction))
+    if stage:
+        job.stage = stage
+
+
+def check_webhook(url: Optional[str]):
+    """
+    Raises HTTPException 400 unless url is an http(s) URL on an allowed host (JOB_WEBHOOK_HOSTS)
+    Without configured hosts webhooks are refused: the service would otherwise POST to any address
+    a client names, internal ones included.
+    """
+    if url is None:
+        return
+    if not JOB_WEBHOOK_HOSTS:
+        raise HTTPException(status_code=400, detail="Webhooks are disabled (no JOB_WEBHOOK_HOSTS configured)")
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise HTTPException(status_code=400, detail="Invalid webhook URL. Use an http(s) URL")
+    if parsed.hostname.lower() not in JOB_WEBHOOK_HOSTS:
+        raise HTTPException(status_code=400, detail=f"Webhook host not allowed: {parsed.hostname}")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could lead a webhook off the allowed hosts: 3xx answers count as failures
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class Job:
+    """One submitted analysis; progress and stage are written by the worker running it"""
+
+    def __init__(self, kind: str, workload: str, key: Optional[str], webhook: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.workload = workload
+        self.key = key
+        self.webhook = webhook
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stage = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = threading.Event()
+        self.task = None
+        # Set (on the event loop) once the workload pool has accepted the job
+        self.admitted = False
+
+    def to_dict(self) -> dict:
+        return {
+            'jobId': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'stage': self.stage,
+            'createdAt': round(self.created, 3),
+            'startedAt': round(self.started, 3) if self.started else None,
+            'finishedAt': round(self.finished, 3) if self.finished else None,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+def _run_job(job: Job, fn, args: tuple):
+    # Runs in the worker thread, where job_progress finds the job
+    _local.job = job
+    try:
+        job.status, job.started = RUNNING, time.time()
+        job_progress(0.0)  # Cancelled while it was queued
+        return fn(*args)
+    finally:
+        _local.job = None
+
+
+class JobStore:
+    """
+    Jobs by ID, with deduplication by key
+    Unfinished jobs are never evicted; finished ones expire after the TTL and the oldest
+    go first when more than max_entries are kept.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, max_active: int = 32):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_active = max_active
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0,
+                       'cancelled': 0, 'webhooks_sent': 0, 'webhook_errors': 0}
+
+    def _active(self) -> int:
+        # Caller holds the lock
+        return sum(1 for job in self._jobs.values() if job.status not in FINISHED)
+
+    def _evict(self):
+        # Caller holds the lock: expired jobs, then the longest finished ones over the entry budget
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.status in FINISHED), key=lambda job: job.finished)
+        expired = sum(1 for job in finished if job.finished + self.ttl <= now)
+        for job in finished[:max(expired, len(self._jobs) - self.max_entries)]:
+            self._jobs.pop(job.id, None)
+            if job.key and self._keys.get(job.key) == job.id:
+                del self._keys[job.key]
+
+    def check(self):
+        """Refuse early (before reading an upload) when too many jobs are active"""
+        with self._lock:
+            if self._active() >= self.max_active:
+                self._stats['rejected'] += 1
+                raise ServiceOverloaded('job', JOBS_RETRY_AFTER)
+
+    def submit(self, kind: str, workload: str, fn, args: tuple, key: str = None, webhook: str = None,
+               cleanup=None) -> tuple:
+        """
+        Start fn(*args) as a job on a workload pool (call from the event loop)
+        key: jobs with the same key (same file and options) are deduplicated while the earlier one
+             is queued, running or succeeded and not expired
+        cleanup: called once the job ends, or at once when the submission is deduplicated
+        Returns: (job, created)
+        """
+        with self._lock:
+            self._evict()
+            existing = self._jobs.get(self._keys.get(key)) if key else None
+            if existing is not None and existing.status in (FAILED, CANCELLED):
+                existing = None
+            job = None
+            if existing is not None:
+                self._stats['deduplicated'] += 1
+            elif self._active() >= self.max_active:
+                self._stats['rejected'] += 1
+            else:
+                job = Job(kind, workload, key, webhook)
+                self._jobs[job.id] = job
+                if key:
+                    self._keys[key] = job.id
+                self._stats['submitted'] += 1
+        if job is None:
+            if cleanup is not None:
+                cleanup()
+            if existing is None:
+                raise ServiceOverloaded('job', JOBS_RETRY_AFTER)
+            logger.info(f"Job {existing.id} ({kind}) resubmitted; returning the existing job")
+            return existing, False
+        job.task = asyncio.ensure_future(self._run(job, fn, args, cleanup))
+        job.task.add_done_callback(functools.partial(self._task_done, job, cleanup))
+        logger.info(f"Job {job.id} ({kind}) submitted")
+        return job, True
+
+    def _task_done(self, job: Job, cleanup, task: asyncio.Task):
+        # A task cancelled before its first step never entered _run: finish the job here
+        if not task.cancelled() or job.status in FINISHED:
+            return
+        self._finish(job, CANCELLED)
+        if cleanup is not None:
+            cleanup()
+        if job.webhook:
+            asyncio.get_running_loop().run_in_executor(None, self._notify, job)
+
+    async def _run(self, job: Job, fn, args: tuple, cleanup):
+        def admitted():
+            job.admitted = True
+
+        try:
+            if analysis_executor.pools[job.workload].mode == 'process':
+                # The job cannot travel to a worker process: no progress reports or cancellation checkpoints
+                job.status, job.started = RUNNING, time.time()
+                result = await analysis_executor.run_queued(job.workload, fn, *args, on_admitted=admitted)
+            else:
+                result = await analysis_executor.run_queued(job.workload, _run_job, job, fn, args,
+                                                            on_admitted=admitted)
+            if hasattr(result, 'model_dump'):
+                result = result.model_dump(mode='json')
+            self._finish(job, SUCCEEDED, result=result)
+        except (JobCancelled, asyncio.CancelledError):
+            self._finish(job, CANCELLED)
+        except HTTPException as e:
+            self._finish(job, FAILED, error={'status': e.status_code, 'detail': e.detail})
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            self._finish(job, FAILED, error={'status': 500, 'detail': f"Analysis failed: {str(e)}"})
+        finally:
+            if cleanup is not None:
+                cleanup()
+        if job.webhook:
+            await asyncio.get_running_loop().run_in_executor(None, self._notify, job)
+
+    def _finish(self, job: Job, status: str, result=None, error: dict = None):
+        with self._lock:
+            job.status, job.finished = status, time.time()
+            job.result, job.error = result, error
+            if status == SUCCEEDED:
+                job.progress, job.stage = 1.0, None
+            self._stats[status] += 1
+        logger.info(f"Job {job.id} ({job.kind}) {status} after {job.finished - job.created:.1f} s")
+
+    def _notify(self, job: Job):
+        """POST the finished job to its webhook, retrying with backoff"""
+        body = json.dumps(job.to_dict()).encode('utf-8')
+        for attempt in range(JOB_WEBHOOK_RETRIES + 1):
+            try:
+                request = urllib.request.Request(job.webhook, data=body, method='POST',
+                                                 headers={'Content-Type': 'application/json'})
+                with _webhook_opener.open(request, timeout=JOB_WEBHOOK_TIMEOUT):
+                    pass
+                with self._lock:
+                    self._stats['webhooks_sent'] += 1
+                return
+            except Exception as e:
+                logger.warning(f"Webhook for job {job.id} failed (attempt {attempt + 1}): {e}")
+                if attempt < JOB_WEBHOOK_RETRIES:
+                    time.sleep(2 ** attempt)
+        with self._lock:
+            self._stats['webhook_errors'] += 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job, or None if unknown or expired"""
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job (call from the event loop): a job still waiting for its pool is dropped; once the pool
+        has accepted it, it stops at its next progress checkpoint (the first one runs before the analysis)
+        Returns: the job (unchanged if it had already finished), or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_requested.set()
+        # Cancelling the task after admission would abandon the worker and clean up its file under it
+        if not job.admitted and job.task is not None:
+            job.task.cancel()
+        logger.info(f"Job {job.id} ({job.kind}) cancellation requested")
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                'entries': len(statuses),
+                'max_entries': self.max_entries,
+                'queued': statuses.count(QUEUED),
+                'running': statuses.count(RUNNING),
+                'max_active': self.max_active,
+                'ttl_seconds': self.ttl,
+                **self._stats,
+            }
+
+
+job_store = JobStore(JOB_STORE_MAX_ENTRIES, JOB_STORE_TTL, JOB_MAX_ACTIVE)
@@ -3,15 +3,22 @@ ML Service for Image Forensics Analysis
 FastAPI service that analyzes images for forgery and extracts OCR text
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+import asyncio
 import base64
+import functools
+import hashlib
 import io
+import time
 from PIL import Image
 import numpy as np
 from typing import Optional, List
 import logging
+import threading
 import re
 
 # Configure logging FIRST before any imports that might use it
@@ -43,8 +50,6 @@ except ImportError:
     SKIMAGE_AVAILABLE = False
     logger.warning("scikit-image not available. Some image analysis features will be disabled. Install with: pip install scikit-image")
 
-import imageio
-import tempfile
 import os
 
 try:
@@ -101,6 +106,84 @@ except ImportError:
     logger.warning("pytesseract not available. Real OCR will be disabled. Install with: pip install pytesseract")
 
 from upi_validator import comprehensive_transaction_validation
+from ocr_engine import get_ocr_backend, ocr_image_to_string, run_ocr_variants, TESSEROCR_AVAILABLE
+from service_config import (
+    ANALYSIS_PROXY_MAX_PIXELS,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_BYTES,
+    BATCH_MAX_ITEMS,
+    DEEPFAKE_CNN_BACKEND,
+    DEEPFAKE_CNN_MODEL_PATH,
+    DEEPFAKE_CNN_ONNX_PATH,
+    DEEPFAKE_CNN_THREADS,
+    DEEPFAKE_CNN_TFLITE_PATH,
+    EXPLAIN_STORE_MAX_SIDE,
+    FORENSICS_BLOCK_COVERAGE,
+    HEATMAP_FORMAT,
+    HEATMAP_MAX_SIDE,
+    HEATMAP_QUALITY,
+    METRICS_ENABLED,
+    MODEL_PRELOAD,
+    OCR_CASCADE_MIN_CONFIDENCE,
+    OCR_CASCADE_MIN_FIELDS,
+    OCR_ENGINE_PROFILE,
+    OCR_PRELOAD,
+    OCR_STRATEGY,
+    OCR_TESSDATA_FAST_PATH,
+    OCR_TESSDATA_PATH,
+    OCR_TEXT_REGIONS,
+    RESPONSE_COMPRESSION,
+    SPECTRAL_FAST_LEN,
+    UPLOAD_MAX_BYTES,
+    VIDEO_GRADCAM_TOP_K,
+    VIDEO_TRACK_STEPS,
+)
+from analysis_cache import analysis_cache, config_fingerprint, content_digest
+from image_context import ImageContext
+from model_registry import model_registry
+from inference_backends import load_classifier
+from gradcam import GradCamExplainer, heatmaps_to_images
+from face_detection import check_cascade, detect_faces, face_detection_stats, largest_face, track_faces
+from video_sampler import sample_video
+from explanation_store import explanation_store
+from execution import analysis_executor
+from jobs import check_webhook, job_progress, job_store
+from response_encoding import CompressionMiddleware, FastJSONResponse, json_dumps, response_encoding_stats
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    MetricsMiddleware,
+    record_verdict,
+    register_collector,
+    render_metrics,
+    stage_timer,
+    timed,
+)
+from uploads import (
+    body_kind,
+    body_suffix,
+    check_upload,
+    decode_to_file,
+    form_file,
+    parse_json_field,
+    read_body,
+    read_json_body,
+    request_limit,
+    request_too_large,
+    spool_body_to_file,
+    spool_to_file,
+    too_large,
+    upload_size,
+    upload_suffix,
+)
+from block_stats import tile_count
+from spectral import spectrum_features, summarize as summarize_spectrum
+from ela import ela_diff, run_ela
+from fraud_detection_config import get_active_config, scale_threshold
+
+# The in-process engine pool works without the tesseract executable
+if not TESSERACT_AVAILABLE and TESSEROCR_AVAILABLE:
+    TESSERACT_AVAILABLE = True
+    logger.info("Tesseract C-API binding (tesserocr) available - using in-process OCR engines")
 
 # Optional imports for explainable AI (TensorFlow/Keras) - LAZY LOADED
 # TensorFlow is heavy, so we'll import it only when needed
@@ -137,7 +220,7 @@ except ImportError:
     MATPLOTLIB_AVAILABLE = False
     logger.warning("Matplotlib not available. Some visualization features will be disabled.")
 
-app = FastAPI(title="Secure UPI ML Service", version="1.0.0")
+app = FastAPI(title="Secure UPI ML Service", version="1.0.0", default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -148,6 +231,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Refuse bodies announced larger than the upload cap (plus base64/multipart overhead) before reading them"""
+    length = request.headers.get('content-length')
+    if length and length.isdigit() and int(length) > request_limit(request.url.path)[0]:
+        return JSONResponse(status_code=413, content={
+            "detail": request_too_large(int(length), request.url.path).detail
+        })
+    return await call_next(request)
+
 # Startup event - service is ready immediately for basic operations
 @app.on_event("startup")
 async def startup_event():
@@ -155,12 +255,38 @@ async def startup_event():
     logger.info("ML Service starting up...")
     logger.info("Service ready for requests (heavy dependencies will load on-demand)")
     logger.info("Core features (forensics, validation) are available immediately")
+    # Logged once here rather than as a warning from every face check
+    check_cascade()
+    if TESSERACT_AVAILABLE and OCR_PRELOAD:
+        # Load the OCR engines (and their traineddata) once, before the first request
+        backend = get_ocr_backend()
+        logger.info(f"OCR backend ready: {backend.name} (profile: {backend.profile})")
+    if MODEL_PRELOAD:
+        # Build and warm up the deepfake CNN without delaying startup
+        threading.Thread(target=model_registry.get, args=(DEEPFAKE_CNN,), daemon=True,
+                         name="model-preload").start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the analysis worker pools (queued analyses are dropped)"""
+    analysis_executor.shutdown()
 
 
 class ImageAnalysisRequest(BaseModel):
     image: str  # Base64 encoded image
     format: str = "base64"
     manualData: dict = None  # Optional manual transaction data
+    ocrTimeBudget: Optional[float] = None  # Optional OCR wall-clock budget in seconds
+
+
+class BatchImageItem(ImageAnalysisRequest):
+    id: Optional[str] = None  # Client ID echoed on the item's result line (default: its position)
+
+
+class ImageBatchRequest(BaseModel):
+    items: List[BatchImageItem]
+    ocrTimeBudget: Optional[float] = None  # Default OCR budget for items without their own
 
 
 class ImageAnalysisResponse(BaseModel):
@@ -175,12 +301,14 @@ class ImageAnalysisResponse(BaseModel):
     isEdited: bool = False  # Whether image is edited or original
     editConfidence: float = 0.0  # Confidence that image is edited
     editIndicators: list = []  # Reasons why image appears edited
+    processingDetails: dict = {}  # How the analysis ran (OCR variants, timings)
 
 
 class DeepfakeDetectionRequest(BaseModel):
     file: Optional[str] = None  # Base64 encoded file
     format: str = "base64"  # "base64" or "url"
     fileType: str = "image"  # "image" or "video"
+    explain: bool = False  # Inline heatmaps in the response (otherwise fetch them via /api/deepfake/{analysisId}/explain)
 
 
 class DeepfakeDetectionResponse(BaseModel):
@@ -195,6 +323,7 @@ class DeepfakeDetectionResponse(BaseModel):
     explainability: dict = {}  # Explainable AI data: heatmaps, method contributions, feature importance
     faceMaskDetected: bool = False  # Whether face mask edit was detected (for videos)
     faceMaskScore: float = 0.0  # Face mask detection score (0-100)
+    analysisId: Optional[str] = None  # Key for GET /api/deepfake/{analysisId}/explain (expires after EXPLAIN_STORE_TTL_SECONDS; not set for images analysed with explain)
 
 
 class VoiceDeepfakeDetectionRequest(BaseModel):
@@ -202,6 +331,14 @@ class VoiceDeepfakeDetectionRequest(BaseModel):
     format: str = "base64"
 
 
+class DeepfakeJobRequest(DeepfakeDetectionRequest):
+    webhook: Optional[str] = None  # URL the finished job (status + result) is POSTed to
+
+
+class VoiceDeepfakeJobRequest(VoiceDeepfakeDetectionRequest):
+    webhook: Optional[str] = None  # URL the finished job (status + result) is POSTed to
+
+
 class VoiceDeepfakeDetectionResponse(BaseModel):
     isDeepfake: bool
     deepfakeScore: float  # 0-100, higher = more likely deepfake/AI-generated
@@ -213,14 +350,82 @@ class VoiceDeepfakeDetectionResponse(BaseModel):
     technicalDetails: dict = {}
 
 
-def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
+# Analysis endpoints take base64 JSON, multipart/form-data, or the file itself as the body.
+# Options of a raw body travel in these headers; multipart requests send them as form fields.
+OPTION_HEADERS = {
+    'manualData': 'X-Manual-Data',  # JSON object
+    'ocrTimeBudget': 'X-Ocr-Time-Budget',
+    'fileType': 'X-File-Type',
+    'explain': 'X-Explain',
+    'webhook': 'X-Webhook',
+}
+
+
+def request_body_docs(model, file_field: str) -> dict:
+    """OpenAPI requestBody of an endpoint that reads its body by Content-Type"""
+    options = {field: {"type": "string"} for field in OPTION_HEADERS if field in model.model_fields}
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        "multipart/form-data": {"schema": {"type": "object", "required": [file_field], "properties": {
+            file_field: {"type": "string", "format": "binary"}, **options}}},
+        "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+
+async def json_request(request: Request, model):
+    """The JSON body validated as model (422 on invalid input, like a typed body parameter; 413 over the size cap)"""
+    body = await read_json_body(request)
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+
+def binary_request(model, options: dict, **defaults):
+    """
+    model for a request whose file travels outside it (format "binary")
+    options: raw string values from headers or form fields (see header_options, form_options)
+    """
+    values = {**defaults, **options, 'format': 'binary'}
+    if 'manualData' in values:
+        values['manualData'] = parse_json_field(values['manualData'], 'manualData')
+    try:
+        return model.model_validate(values)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+
+def header_options(request: Request, model) -> dict:
+    return {field: request.headers[header] for field, header in OPTION_HEADERS.items()
+            if field in model.model_fields and header in request.headers}
+
+
+def form_options(form, model) -> dict:
+    return {field: form[field] for field in OPTION_HEADERS
+            if field in model.model_fields and isinstance(form.get(field), str)}
+
+
+def raw_file_type(request: Request) -> str:
+    """fileType of a raw deepfake body: X-File-Type, else video for video/* content"""
+    content_type = request.headers.get('content-type', '').lower()
+    return request.headers.get(OPTION_HEADERS['fileType'], 'video' if content_type.startswith('video/') else 'image')
+
+
+def extract_transaction_data(image: Image.Image, time_budget: Optional[float] = None,
+                             ctx: Optional[ImageContext] = None) -> tuple[str, dict, dict]:
     """
     Extract and parse transaction data from image using REAL OCR
-    Returns: (ocr_text, extracted_data_dict)
+    time_budget: wall-clock seconds allowed for the OCR variants (None = service default)
+    ctx: the request's ImageContext (derived planes shared with the forgery detectors)
+    Returns: (ocr_text, extracted_data_dict, ocr_context) - ocr_context describes the Tesseract run and is
+             empty when OCR did not run and flagged simulatedFallback when Tesseract found no text;
+             extracted_data comes from simulated data unless OCR found text
     """
+    ocr_context = {}
     try:
         width, height = image.size
-        img_array = np.array(image)
+        ctx = ctx or ImageContext(image)
+        img_array = ctx.array
         
         # Try REAL OCR first (for Instagram screenshots, social media profiles, etc.)
         ocr_text = ""
@@ -228,56 +433,43 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
             try:
                 # Preprocess image for better OCR - IMPROVED for Instagram screenshots
                 if CV2_AVAILABLE:
-                    # Convert PIL to OpenCV format
-                    img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-                    
-                    # Try multiple preprocessing methods for better results
-                    ocr_results = []
-                    
-                    # Method 1: Grayscale + OTSU thresholding (original)
-                    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-                    _, thresh1 = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    text1 = pytesseract.image_to_string(thresh1, lang='eng', config='--psm 6')
-                    if text1 and len(text1.strip()) > 0:
-                        ocr_results.append(('otsu', text1))
-                    
-                    # Method 2: Adaptive thresholding (better for varying lighting)
-                    adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-                    text2 = pytesseract.image_to_string(adaptive, lang='eng', config='--psm 6')
-                    if text2 and len(text2.strip()) > 0:
-                        ocr_results.append(('adaptive', text2))
-                    
-                    # Method 3: Denoised + thresholded (better for screenshots)
-                    denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-                    _, thresh3 = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    text3 = pytesseract.image_to_string(thresh3, lang='eng', config='--psm 6')
-                    if text3 and len(text3.strip()) > 0:
-                        ocr_results.append(('denoised', text3))
-                    
-                    # Method 4: Original grayscale (sometimes works better)
-                    text4 = pytesseract.image_to_string(gray, lang='eng', config='--psm 6')
-                    if text4 and len(text4.strip()) > 0:
-                        ocr_results.append(('grayscale', text4))
-                    
-                    # Method 5: Upscaled image (better for small text)
-                    scale_factor = 2
-                    upscaled = cv2.resize(gray, (width * scale_factor, height * scale_factor), interpolation=cv2.INTER_CUBIC)
-                    _, thresh5 = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    text5 = pytesseract.image_to_string(thresh5, lang='eng', config='--psm 6')
-                    if text5 and len(text5.strip()) > 0:
-                        ocr_results.append(('upscaled', text5))
-                    
+                    # Gray plane is shared with the forgery detectors (ELA runs on the same plane)
+                    gray = ctx.gray
+
+                    # Try multiple preprocessing methods for better results (run concurrently)
+                    ocr_run = run_ocr_variants(gray, time_budget=time_budget)
+                    ocr_results = ocr_run['results']
+                    ocr_context = {
+                        'strategy': ocr_run['strategy'],
+                        'mode': ocr_run['mode'],
+                        'backend': ocr_run['backend'],
+                        'method': ocr_run['method'],
+                        'earlyExit': ocr_run['accepted'],
+                        'confidence': ocr_run['confidence'],
+                        'upiFields': ocr_run['fields'],
+                        'elapsed': ocr_run['elapsed'],
+                        'timeBudget': ocr_run['time_budget'],
+                        'variantConfidences': ocr_run['confidences'],
+                        'variantTimings': ocr_run['timings'],
+                        'skippedVariants': ocr_run['skipped'],
+                        'timedOutVariants': ocr_run['timed_out'],
+                        'textRegions': ocr_run['text_regions'],
+                    }
+                    if ocr_run['accepted'] and ocr_run['skipped']:
+                        logger.info(f"OCR cascade accepted '{ocr_run['method']}' (confidence {ocr_run['confidence']:.1f}) - skipped: {', '.join(ocr_run['skipped'])}")
+                    if ocr_run['timed_out']:
+                        logger.warning(f"OCR time budget exhausted - skipped variants: {', '.join(ocr_run['timed_out'])}")
+
                     # Choose the result with most text (usually most accurate)
                     if ocr_results:
-                        ocr_results.sort(key=lambda x: len(x[1]), reverse=True)
-                        best_method, ocr_text = ocr_results[0]
-                        logger.info(f"Real OCR extracted {len(ocr_text)} characters using Tesseract (method: {best_method})")
+                        best_method, ocr_text = ocr_run['method'], ocr_run['text']
+                        logger.info(f"Real OCR extracted {len(ocr_text)} characters using Tesseract (method: {best_method}, {ocr_run['elapsed']:.2f}s)")
                         logger.info(f"OCR text preview (first 500 chars): {ocr_text[:500]}")
                     else:
                         # Last resort: try original image with different PSM modes
                         for psm_mode in ['6', '11', '12', '3']:
                             try:
-                                text = pytesseract.image_to_string(image, lang='eng', config=f'--psm {psm_mode}')
+                                text = ocr_image_to_string(image, psm=int(psm_mode))
                                 if text and len(text.strip()) > 0:
                                     ocr_text = text
                                     logger.info(f"Real OCR extracted {len(ocr_text)} characters using PSM mode {psm_mode}")
@@ -288,7 +480,7 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
                     # Fallback: use PIL image directly with multiple PSM modes
                     for psm_mode in ['6', '11', '12', '3']:
                         try:
-                            text = pytesseract.image_to_string(image, lang='eng', config=f'--psm {psm_mode}')
+                            text = ocr_image_to_string(image, psm=int(psm_mode))
                             if text and len(text.strip()) > 0:
                                 ocr_text = text
                                 logger.info(f"Real OCR extracted {len(ocr_text)} characters using Tesseract (PSM {psm_mode}, no preprocessing)")
@@ -313,6 +505,9 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
         # If real OCR failed or not available, use fallback
         if not ocr_text or len(ocr_text.strip()) < 10:
             logger.info("Using fallback OCR simulation (real OCR not available or failed)")
+            if ocr_context:
+                # Tesseract ran but found no usable text; the receipt below is random
+                ocr_context['simulatedFallback'] = True
             # Simulate OCR extraction with realistic data
             # In production, use Tesseract, EasyOCR, or Google Vision API
         
@@ -323,7 +518,7 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
         
         # Detect if image likely contains text
         if len(img_array.shape) == 3:
-            gray = np.mean(img_array, axis=2)
+            gray = ctx.mean_gray
             variance = np.var(gray)
             
             # Generate realistic transaction data regardless of variance
@@ -463,16 +658,16 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
                 'merchant': '',
                 'confidence': 'high'
             }
-            return ocr_text, extracted_data
+            return ocr_text, extracted_data, ocr_context
         
         # If OCR text exists but Tesseract wasn't available, still return it
         if ocr_text and len(ocr_text.strip()) > 0:
             logger.info(f"✅ OCR text available (non-Tesseract): {len(ocr_text)} chars")
-            return ocr_text, extracted_data
+            return ocr_text, extracted_data, ocr_context
         
         # Only fall back to simulated data if OCR completely failed
         logger.warning("OCR completely failed - using fallback simulation")
-        return ocr_text, extracted_data
+        return ocr_text, extracted_data, ocr_context
     
     except Exception as e:
         logger.error(f"OCR extraction error: {e}")
@@ -493,16 +688,21 @@ def extract_transaction_data(image: Image.Image) -> tuple[str, dict]:
             f"Error: {str(e)}\n"
             f"Please use manual data entry or try uploading a clearer image."
         )
-        return ocr_text, extracted_data
+        return ocr_text, extracted_data, {}
 
 
-def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
+def _legacy_analyze_forgery(image: Image.Image, ctx: Optional[ImageContext] = None) -> tuple[float, str, float]:
     """
     Enhanced forgery detection using multiple algorithms
     Returns: (forgery_score, verdict, confidence)
     """
-    # Convert to numpy array
-    img_array = np.array(image)
+    # Derived planes are shared with the other detectors of this request (ctx).
+    # Global statistics run on a size-bounded proxy of large images (localized checks stay full-res).
+    ctx = ctx or ImageContext(image)
+    img_array = ctx.array
+    proxy = ctx.proxy
+    proxy_array = proxy.array
+    proxy_scale = ctx.working_size['scale']
     
     forgery_score = 0.0
     confidence = 0.5
@@ -531,7 +731,7 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
     
     # 1. METADATA ANALYSIS - More aggressive
     try:
-        exif_data = image._getexif() if hasattr(image, '_getexif') else None
+        exif_data = ctx.exif
         if exif_data is None:
             if is_typical_screenshot:
                 forgery_score += 5
@@ -558,13 +758,15 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
         block_size = 8
         if height >= block_size * 2 and width >= block_size * 2:
             # Sample blocks and check for artificial boundaries
-            block_variances = []
-            for i in range(0, min(height - block_size, 64), block_size):
-                for j in range(0, min(width - block_size, 64), block_size):
-                    block = img_array[i:i+block_size, j:j+block_size]
-                    block_variances.append(np.var(block))
+            if FORENSICS_BLOCK_COVERAGE == 'full':
+                rows = cols = None
+            else:
+                # Blocks starting in the top-left 64x64 corner
+                rows = tile_count(height, block_size, min(height - block_size, 64))
+                cols = tile_count(width, block_size, min(width - block_size, 64))
+            block_variances = ctx.block_stats(block_size, rows, cols)['var']
             
-            if len(block_variances) > 0:
+            if block_variances.size > 0:
                 avg_block_var = np.mean(block_variances)
                 if avg_block_var < 50:  # Very uniform blocks = suspicious
                     forgery_score += 25
@@ -573,17 +775,17 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
                     strong_indicators.append("compression")
     
     # 3. NOISE INCONSISTENCY DETECTION
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         # Analyze noise levels across different regions
         regions_noise = []
-        region_size = min(height, width) // 4
+        region_size = min(proxy.height, proxy.width) // 4
         
         if region_size > 10:
-            for i in range(0, height - region_size, region_size):
-                for j in range(0, width - region_size, region_size):
-                    region = img_array[i:i+region_size, j:j+region_size]
-                    # Calculate local variance as noise indicator
-                    regions_noise.append(np.std(region))
+            # Local std of each region as noise indicator
+            regions = proxy.block_stats(region_size,
+                                        tile_count(proxy.height, region_size, proxy.height - region_size),
+                                        tile_count(proxy.width, region_size, proxy.width - region_size))
+            regions_noise = regions['std'].ravel()
         
         if len(regions_noise) > 1:
             noise_variance = np.var(regions_noise)
@@ -602,9 +804,9 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
     
     # 4. EDGE DETECTION ANOMALIES
     # Sharp transitions that don't match natural image characteristics
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         # Convert to grayscale for edge detection
-        gray = np.mean(img_array, axis=2).astype(np.uint8)
+        gray = proxy.mean_gray_u8
         
         # Simple edge detection using gradient
         if gray.shape[0] > 2 and gray.shape[1] > 2:
@@ -629,11 +831,11 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
                 confidence += 0.1
     
     # 5. COLOR HISTOGRAM ANALYSIS
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         # Check for unnatural color distributions
+        histograms = proxy.histograms
         for channel in range(3):
-            channel_data = img_array[:, :, channel].flatten()
-            hist, _ = np.histogram(channel_data, bins=256, range=(0, 256))
+            hist = histograms[channel]
             
             # Check for spiky or unnatural histogram
             hist_peaks = np.sum(hist > np.mean(hist) * 5)
@@ -673,10 +875,10 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
             strong_indicators.append("screenshot_ratio")
     
     # 8. STATISTICAL INCONSISTENCY
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         # Calculate overall image statistics
-        mean_val = np.mean(img_array)
-        std_val = np.std(img_array)
+        mean_val = np.mean(proxy_array)
+        std_val = np.std(proxy_array)
         
         # Unnatural statistics
         if std_val < 20:  # Very low variance = flat/edited
@@ -752,7 +954,7 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
         # Screenshots typically lack EXIF
         has_exif = False
         try:
-            exif_data = image._getexif() if hasattr(image, '_getexif') else None
+            exif_data = ctx.exif
             has_exif = exif_data is not None and len(exif_data) > 0
         except:
             pass
@@ -780,20 +982,10 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
     # Method 1: Error Level Analysis (ELA) - SIGNIFICANTLY MORE LENIENT FOR SCREENSHOTS
     if CV2_AVAILABLE and len(img_array.shape) == 3:
         try:
-            # Convert to BGR for OpenCV
-            img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-            
-            # Save at quality 90 and reload to detect compression differences
-            temp_path = tempfile.mktemp(suffix='.jpg')
-            cv2.imwrite(temp_path, gray, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            recompressed = cv2.imread(temp_path, cv2.IMREAD_GRAYSCALE)
-            os.remove(temp_path)
-            
-            # Calculate ELA (Error Level Analysis)
-            diff = np.abs(gray.astype(np.float32) - recompressed.astype(np.float32))
-            ela_score = np.mean(diff)
-            ela_std = np.std(diff)
+            # ELA (Error Level Analysis): luma re-compressed at quality 90
+            ela = ctx.ela('gray', (90,))[90]
+            ela_score = ela['mean']
+            ela_std = ela['std']
             
             # MUCH higher thresholds for screenshots
             high_threshold = 50 if is_likely_screenshot else 35
@@ -822,25 +1014,17 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
             logger.warning(f"ELA analysis error: {e}")
     
     # Method 2: Frequency Domain Analysis - Detects editing artifacts (SCREENSHOT-AWARE)
-    if len(img_array.shape) == 3:
+    if len(proxy_array.shape) == 3:
         try:
-            gray = np.mean(img_array, axis=2)
-            # Apply FFT
-            f_transform = fft.fft2(gray)
-            f_shift = fft.fftshift(f_transform)
-            magnitude_spectrum = np.abs(f_shift)
-            
-            # Check for grid-like patterns (common in edited images)
-            h, w = magnitude_spectrum.shape
-            center_h, center_w = h // 2, w // 2
+            spectrum = proxy.spectrum('mean_gray')
             
             # Check for unnatural frequency patterns
-            freq_variance = np.var(magnitude_spectrum)
-            freq_mean = np.mean(magnitude_spectrum)
+            freq_variance = spectrum['var']
+            freq_mean = spectrum['mean']
             
             # Screenshots have UI elements with DIFFERENT frequency patterns - this is NORMAL
             # Use much higher threshold for screenshots
-            freq_threshold = 15 if is_likely_screenshot else 7
+            freq_threshold = scale_threshold('frequency_variance_ratio', 15 if is_likely_screenshot else 7, proxy_scale)
             
             if freq_variance > freq_mean * freq_threshold:
                 is_edited = True
@@ -851,8 +1035,8 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
             logger.warning(f"Frequency analysis error: {e}")
     
     # Method 3: Copy-paste artifact detection (sharp boundaries) - SCREENSHOT-AWARE
-    if len(img_array.shape) == 3:
-        gray = np.mean(img_array, axis=2)
+    if len(proxy_array.shape) == 3:
+        gray = proxy.mean_gray
         grad_x = np.abs(np.gradient(gray, axis=1))
         grad_y = np.abs(np.gradient(gray, axis=0))
         sharp_edges = np.sum((grad_x > 100) | (grad_y > 100))
@@ -876,8 +1060,8 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
             edit_indicators.append("Moderate edge anomalies - Possible editing")
     
     # Method 4: Compression inconsistencies (SCREENSHOT-AWARE)
-    if len(img_array.shape) == 3:
-        gray = np.mean(img_array, axis=2)
+    if len(proxy_array.shape) == 3:
+        gray = proxy.mean_gray
         std_val = np.std(gray)
         # Screenshots can be uniform (e.g., white backgrounds in UPI apps)
         # Only flag if EXTREMELY uniform AND not a screenshot
@@ -890,7 +1074,7 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
     
     # Method 5: Metadata analysis (SCREENSHOT-FRIENDLY)
     try:
-        exif_data = image._getexif() if hasattr(image, '_getexif') else None
+        exif_data = ctx.exif
         if exif_data is None:
             # Screenshots NEVER have EXIF - this is completely normal
             # DON'T add any score if it's likely a screenshot
@@ -990,21 +1174,23 @@ def _legacy_analyze_forgery(image: Image.Image) -> tuple[float, str, float]:
     return forgery_score, verdict, confidence, is_edited, edit_confidence, edit_indicators
 
 
-def analyze_forgery(image: Image.Image):
+def analyze_forgery(image: Image.Image, ctx: Optional[ImageContext] = None):
     """
     Wrapper that prefers the improved forgery detector with better screenshot handling.
     Falls back to the legacy implementation if the improved module isn't available.
+    ctx: the request's ImageContext (None = a fresh one)
     """
     if IMPROVED_FORGERY_AVAILABLE and analyze_forgery_improved:
-        return analyze_forgery_improved(image)
-    return _legacy_analyze_forgery(image)
+        return analyze_forgery_improved(image, ctx)
+    return _legacy_analyze_forgery(image, ctx)
 
 
 # ===== DEEPFAKE DETECTION FUNCTIONS =====
 
-def error_level_analysis(image: np.ndarray) -> tuple[float, List[str]]:
+def error_level_analysis(image: np.ndarray, ctx: Optional[ImageContext] = None) -> tuple[float, List[str]]:
     """
     Error Level Analysis (ELA) - Detects compression artifacts
+    ctx: context of the image; its swapped_gray ELA (the plane this derives from a BGR array) is reused
     Returns: (score, indicators)
     """
     score = 0.0
@@ -1017,15 +1203,9 @@ def error_level_analysis(image: np.ndarray) -> tuple[float, List[str]]:
         else:
             gray = image
         
-        # Save at quality 90 and reload to detect compression differences
-        temp_path = tempfile.mktemp(suffix='.jpg')
-        cv2.imwrite(temp_path, gray, [cv2.IMWRITE_JPEG_QUALITY, 90])
-        recompressed = cv2.imread(temp_path, cv2.IMREAD_GRAYSCALE)
-        os.remove(temp_path)
-        
-        # Calculate difference
-        diff = np.abs(gray.astype(np.float32) - recompressed.astype(np.float32))
-        ela_score = np.mean(diff)
+        # Re-compress at quality 90 (in memory) to detect compression differences
+        ela = ctx.ela('swapped_gray', (90,))[90] if ctx is not None else run_ela(gray, (90,))[90]
+        ela_score = ela['mean']
         
         # High ELA score indicates manipulation
         if ela_score > 15:
@@ -1036,7 +1216,7 @@ def error_level_analysis(image: np.ndarray) -> tuple[float, List[str]]:
             indicators.append(f"Moderate compression artifacts (ELA: {ela_score:.2f})")
         
         # Check for inconsistent compression (sign of editing)
-        std_diff = np.std(diff)
+        std_diff = ela['std']
         if std_diff > 8:
             score += 20
             indicators.append(f"Inconsistent compression patterns (std: {std_diff:.2f})")
@@ -1047,39 +1227,28 @@ def error_level_analysis(image: np.ndarray) -> tuple[float, List[str]]:
     return min(score, 50), indicators
 
 
-def frequency_domain_analysis(image: np.ndarray) -> tuple[float, List[str]]:
+def frequency_domain_analysis(image: np.ndarray, scale: float = 1.0, spectrum: Optional[dict] = None) -> tuple[float, List[str]]:
     """
     Frequency domain analysis using FFT
     Deepfakes often show artifacts in frequency domain
+    scale: resolution of image relative to the original (for downscaled analysis proxies)
+    spectrum: precomputed spectral features of the image (spectral.spectrum_features)
     Returns: (score, indicators)
     """
     score = 0.0
     indicators = []
     
     try:
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = image
+        if spectrum is None:
+            if len(image.shape) == 3:
+                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            else:
+                gray = image
+            spectrum = spectrum_features(gray)
         
-        # Apply FFT
-        f_transform = fft.fft2(gray)
-        f_shift = fft.fftshift(f_transform)
-        magnitude_spectrum = np.abs(f_shift)
-        
-        # Check for unusual patterns in frequency domain
-        # Deepfakes often have grid-like patterns
-        h, w = magnitude_spectrum.shape
-        center_h, center_w = h // 2, w // 2
-        
-        # Check for grid artifacts (common in deepfakes)
-        grid_score = 0
-        for i in range(0, h, h//10):
-            for j in range(0, w, w//10):
-                if i < h and j < w:
-                    val = magnitude_spectrum[i, j]
-                    if val > np.mean(magnitude_spectrum) * 2:
-                        grid_score += 1
+        # Check for grid artifacts (common in deepfakes):
+        # a 10x10 grid of samples of the centered spectrum above twice its mean
+        grid_score = spectrum['grid_score']
         
         if grid_score > 20:
             score += 35
@@ -1089,8 +1258,8 @@ def frequency_domain_analysis(image: np.ndarray) -> tuple[float, List[str]]:
             indicators.append(f"Moderate frequency artifacts (score: {grid_score})")
         
         # Check for unnatural frequency distribution
-        freq_variance = np.var(magnitude_spectrum)
-        if freq_variance > np.mean(magnitude_spectrum) * 3:
+        freq_variance = spectrum['var']
+        if freq_variance > spectrum['mean'] * scale_threshold('frequency_variance_ratio', 3, scale):
             score += 15
             indicators.append("Unnatural frequency distribution detected")
             
@@ -1100,9 +1269,10 @@ def frequency_domain_analysis(image: np.ndarray) -> tuple[float, List[str]]:
     return min(score, 50), indicators
 
 
-def face_consistency_check(image: np.ndarray) -> tuple[float, List[str]]:
+def face_consistency_check(image: np.ndarray, faces: Optional[np.ndarray] = None) -> tuple[float, List[str]]:
     """
     Check for face inconsistencies (blinking, asymmetry, etc.)
+    faces: face boxes already detected for this image (ImageContext.faces); None = detect here
     Returns: (score, indicators)
     """
     score = 0.0
@@ -1111,15 +1281,14 @@ def face_consistency_check(image: np.ndarray) -> tuple[float, List[str]]:
     try:
         if not CV2_AVAILABLE:
             return 0, ["OpenCV not available - cannot perform face consistency check"]
-        # Load face detector
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
         else:
             gray = image
         
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        if faces is None:
+            faces = detect_faces(gray)
         
         if len(faces) == 0:
             # No face detected - might not be a deepfake, but also can't verify
@@ -1173,7 +1342,7 @@ def face_consistency_check(image: np.ndarray) -> tuple[float, List[str]]:
     return min(score, 50), indicators
 
 
-def metadata_analysis(image: Image.Image) -> tuple[float, List[str]]:
+def metadata_analysis(image: Image.Image, ctx: Optional[ImageContext] = None) -> tuple[float, List[str]]:
     """
     Analyze image metadata for signs of manipulation
     Returns: (score, indicators)
@@ -1183,7 +1352,7 @@ def metadata_analysis(image: Image.Image) -> tuple[float, List[str]]:
     
     try:
         # Check EXIF data
-        exif_data = image._getexif() if hasattr(image, '_getexif') else None
+        exif_data = (ctx or ImageContext(image)).exif
         
         if exif_data is None:
             score += 15
@@ -1247,91 +1416,171 @@ def build_deepfake_cnn_model(input_shape=(224, 224, 3)):
         return None
 
 
-def generate_gradcam_heatmap(model, img_array, layer_name='block_16_expand'):
+# Built once per process on first use (or at startup with MODEL_PRELOAD), shared by all requests
+DEEPFAKE_CNN = 'deepfake_cnn'
+DEEPFAKE_CNN_INPUT_SHAPE = (224, 224, 3)
+
+
+def load_deepfake_cnn_model():
     """
-    Generate Grad-CAM heatmap showing which pixels indicate manipulation
-    Returns: heatmap as numpy array (0-255)
+    Deepfake CNN for the model registry, on the DEEPFAKE_CNN_BACKEND runtime:
+    tflite / onnx - the exported INT8 classifier (no TensorFlow import);
+    tensorflow - the saved model at DEEPFAKE_CNN_MODEL_PATH if set, otherwise a freshly built MobileNetV2 classifier
     """
-    if not _load_tensorflow():
-        return None
-    
-    try:
-        if model is None:
+    if DEEPFAKE_CNN_BACKEND == 'tflite':
+        return load_classifier('tflite', DEEPFAKE_CNN_TFLITE_PATH, DEEPFAKE_CNN_THREADS)
+    if DEEPFAKE_CNN_BACKEND == 'onnx':
+        return load_classifier('onnx', DEEPFAKE_CNN_ONNX_PATH, DEEPFAKE_CNN_THREADS)
+    if DEEPFAKE_CNN_BACKEND != 'tensorflow':
+        logger.warning(f"Unknown DEEPFAKE_CNN_BACKEND '{DEEPFAKE_CNN_BACKEND}', using tensorflow")
+    if DEEPFAKE_CNN_MODEL_PATH:
+        if not _load_tensorflow():
             return None
-        
-        # Resize image to model input size
-        img_resized = cv2.resize(img_array, (224, 224))
-        img_tensor = np.expand_dims(img_resized, axis=0)
-        img_tensor = keras.applications.mobilenet_v2.preprocess_input(img_tensor.astype(np.float32))
-        
-        # Get the last convolutional layer
-        try:
-            conv_layer = model.get_layer(layer_name)
-        except:
-            # Try to find any convolutional layer
-            for layer in model.layers[::-1]:
-                if 'conv' in layer.name.lower() or 'expand' in layer.name.lower():
-                    conv_layer = layer
-                    break
-            else:
-                return None
-        
-        # Create a model that outputs the conv layer and final prediction
-        grad_model = keras.Model(
-            [model.inputs],
-            [conv_layer.output, model.output]
-        )
-        
-        # Compute gradients
-        with tf.GradientTape() as tape:
-            conv_outputs, predictions = grad_model(img_tensor)
-            loss = predictions[:, 0]  # Probability of being fake
-        
-        # Get gradients
-        grads = tape.gradient(loss, conv_outputs)
-        
-        # Global average pooling of gradients
-        pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
-        
-        # Weight the feature maps by gradients
-        conv_outputs = conv_outputs[0]
-        heatmap = conv_outputs @ pooled_grads[..., tf.newaxis]
-        heatmap = tf.squeeze(heatmap)
-        
-        # Normalize heatmap
-        heatmap = tf.maximum(heatmap, 0) / tf.math.reduce_max(heatmap)
-        heatmap = heatmap.numpy()
-        
-        # Resize heatmap to original image size
-        heatmap_resized = cv2.resize(heatmap, (img_array.shape[1], img_array.shape[0]))
-        heatmap_uint8 = (heatmap_resized * 255).astype(np.uint8)
-        
-        return heatmap_uint8
-        
-    except Exception as e:
-        logger.warning(f"Grad-CAM generation error: {e}")
+        logger.info(f"Loading deepfake CNN from {DEEPFAKE_CNN_MODEL_PATH}")
+        return keras.models.load_model(DEEPFAKE_CNN_MODEL_PATH, compile=False)
+    return build_deepfake_cnn_model(DEEPFAKE_CNN_INPUT_SHAPE)
+
+
+model_registry.register(DEEPFAKE_CNN, load_deepfake_cnn_model, DEEPFAKE_CNN_INPUT_SHAPE)
+
+
+def prepare_cnn_batch(images_bgr: List[np.ndarray]) -> np.ndarray:
+    """
+    Stack images into one MobileNetV2-preprocessed float32 batch of shape (N, 224, 224, 3)
+    (mobilenet_v2.preprocess_input scaling to [-1, 1], without needing Keras for the lightweight backends)
+    """
+    height, width = DEEPFAKE_CNN_INPUT_SHAPE[:2]
+    batch = np.stack([cv2.resize(img, (width, height)) for img in images_bgr]).astype(np.float32)
+    batch /= 127.5
+    batch -= 1.0
+    return batch
+
+
+def predict_deepfake_cnn(images_bgr: List[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    CNN probability of being fake for each image, from a single batched inference call
+    Returns: array of shape (N,), or None when the CNN is unavailable
+    """
+    if not images_bgr:
+        return None
+    cnn = model_registry.get(DEEPFAKE_CNN)
+    if cnn is None:
         return None
+    # Timed here, not around the call: the stage only counts inference that actually ran
+    with stage_timer('cnn'):
+        predictions = cnn.predict(prepare_cnn_batch(images_bgr))
+    return predictions[:, 0] if predictions.ndim == 2 and predictions.shape[1] > 0 else None
 
 
-def generate_ela_heatmap(img_array):
+def explain_deepfake_cnn(images_bgr: List[np.ndarray]) -> Optional[tuple]:
+    """
+    CNN probabilities and Grad-CAM heatmaps from one taped forward pass (cached gradient model)
+    Returns: (probabilities of shape (N,), uint8 heatmaps at each image's size),
+             or None when Grad-CAM is unavailable (no CNN, or a tflite / onnx backend without Keras layers)
+    """
+    if not images_bgr:
+        return None
+    cnn = model_registry.get(DEEPFAKE_CNN)
+    if cnn is None or cnn.keras_model is None:
+        return None
+    with stage_timer('gradcam'):
+        explainer = cnn.derive('gradcam', lambda: GradCamExplainer(cnn.keras_model))
+        probabilities, heatmaps = explainer.explain(prepare_cnn_batch(images_bgr))
+        return probabilities, heatmaps_to_images(heatmaps, images_bgr)
+
+
+# ===== ON-DEMAND EXPLAINABILITY =====
+
+EXPLAIN_METHODS = ('ela', 'gradcam')
+EXPLAIN_FORMATS = {'png': 'png', 'jpeg': 'jpeg', 'jpg': 'jpeg', 'webp': 'webp'}
+HEATMAP_EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+DEFAULT_HEATMAP_FORMAT = EXPLAIN_FORMATS.get(HEATMAP_FORMAT, 'png')
+if HEATMAP_FORMAT not in EXPLAIN_FORMATS:
+    logger.warning(f"Unknown HEATMAP_FORMAT {HEATMAP_FORMAT!r}, using png")
+
+
+def remember_image_analysis(ctx: ImageContext) -> str:
+    """
+    Keep what the image heatmaps need (downscaled pixels + ELA map) for GET /api/deepfake/{id}/explain
+    Uses the request's ImageContext, so nothing is recomputed. Returns: analysis ID
+    """
+    ela_heatmap = generate_ela_heatmap(ctx.bgr, ctx=ctx)
+    return explanation_store.put({
+        'kind': 'image',
+        'image': limit_size(ctx.bgr, EXPLAIN_STORE_MAX_SIDE),
+        'ela': limit_size(ela_heatmap, EXPLAIN_STORE_MAX_SIDE) if ela_heatmap is not None else None,
+    })
+
+
+def _record_gradcam(record: dict, images: List[np.ndarray], analysis_id: Optional[str] = None) -> Optional[list]:
+    # Grad-CAM maps are computed on first request and kept with the record (counted by the store)
+    if 'gradcam' not in record:
+        try:
+            explained = explain_deepfake_cnn(images)
+        except Exception as gradcam_error:
+            logger.warning(f"Grad-CAM generation failed: {gradcam_error}")
+            explained = None
+        gradcam_maps = list(explained[1]) if explained is not None else None
+        if analysis_id is None or not explanation_store.update(analysis_id, 'gradcam', gradcam_maps):
+            record['gradcam'] = gradcam_maps
+    return record['gradcam']
+
+
+def render_explanation(record: dict, methods=EXPLAIN_METHODS, max_side: Optional[int] = None,
+                       image_format: Optional[str] = None, quality: Optional[int] = None,
+                       analysis_id: Optional[str] = None) -> dict:
+    """
+    Heatmap overlays (base64) of an analysis record (encoding: see overlay_heatmap_on_image)
+    analysis_id: the record's ID when it is already in explanation_store (lazy entries are then recounted)
+    Returns: {'ela', 'gradcam'} for images, {'gradcam_frames': [{'frame', 'score', 'heatmap'}]} for videos
+    """
+    heatmaps = {}
+    if record['kind'] == 'video':
+        frames = record['frames']
+        gradcam_maps = (_record_gradcam(record, [f['image'] for f in frames], analysis_id)
+                        if frames and 'gradcam' in methods else None)
+        if gradcam_maps is not None:
+            heatmaps['gradcam_frames'] = []
+            for frame, heatmap in zip(frames, gradcam_maps):
+                overlay = overlay_heatmap_on_image(frame['image'], heatmap, alpha=0.6, max_side=max_side,
+                                                   image_format=image_format, quality=quality)
+                if overlay:
+                    heatmaps['gradcam_frames'].append({'frame': frame['frame'], 'score': frame['score'], 'heatmap': overlay})
+        return heatmaps
+
+    image = record['image']
+    if 'gradcam' in methods:
+        gradcam_maps = _record_gradcam(record, [image], analysis_id)
+        if gradcam_maps:
+            overlay = overlay_heatmap_on_image(image, gradcam_maps[0], alpha=0.6, max_side=max_side,
+                                               image_format=image_format, quality=quality)
+            if overlay:
+                heatmaps['gradcam'] = overlay
+    if 'ela' in methods and record.get('ela') is not None:
+        overlay = overlay_heatmap_on_image(image, record['ela'], alpha=0.6, max_side=max_side,
+                                           image_format=image_format, quality=quality)
+        if overlay:
+            heatmaps['ela'] = overlay
+    return heatmaps
+
+
+def generate_ela_heatmap(img_array, ctx: Optional[ImageContext] = None):
     """
     Generate Error Level Analysis heatmap showing compression artifacts
+    ctx: reuse the request's memoized ELA difference map instead of recomputing it
     Returns: heatmap as numpy array (0-255)
     """
     try:
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
+        if ctx is not None:
+            diff = ctx.ela_diff('gray', 90)
         else:
-            gray = img_array
-        
-        # Save at quality 90 and reload
-        temp_path = tempfile.mktemp(suffix='.jpg')
-        cv2.imwrite(temp_path, gray, [cv2.IMWRITE_JPEG_QUALITY, 90])
-        recompressed = cv2.imread(temp_path, cv2.IMREAD_GRAYSCALE)
-        os.remove(temp_path)
-        
-        # Calculate difference (ELA)
-        diff = np.abs(gray.astype(np.float32) - recompressed.astype(np.float32))
+            if len(img_array.shape) == 3:
+                gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
+            else:
+                gray = img_array
+            
+            # Re-compress at quality 90 (in memory) and take the difference (ELA)
+            diff = ela_diff(gray, 90)
         
         # Normalize to 0-255
         if diff.max() > 0:
@@ -1346,32 +1595,64 @@ def generate_ela_heatmap(img_array):
         return None
 
 
-def overlay_heatmap_on_image(img_array, heatmap, alpha=0.6):
+def limit_size(img_array: np.ndarray, max_side: Optional[int]) -> np.ndarray:
+    """Downscale (INTER_AREA) so the longest side is at most max_side; unchanged if already small enough"""
+    height, width = img_array.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return img_array
+    scale = max_side / max(height, width)
+    return cv2.resize(img_array, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def encode_heatmap(img_bgr: np.ndarray, image_format: Optional[str] = None, quality: Optional[int] = None) -> bytes:
+    """
+    Encode an overlay with cv2.imencode (no PIL round-trip)
+    image_format: png, jpeg or webp (None = HEATMAP_FORMAT); quality: 1-100 for jpeg / webp (None = HEATMAP_QUALITY)
+    """
+    image_format = EXPLAIN_FORMATS.get(image_format, DEFAULT_HEATMAP_FORMAT)
+    quality = int(HEATMAP_QUALITY if quality is None else quality)
+    if image_format == 'jpeg':
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    elif image_format == 'webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        params = []
+    ok, buffer = cv2.imencode(HEATMAP_EXTENSIONS[image_format], img_bgr, params)
+    if not ok:
+        raise RuntimeError(f"Could not encode heatmap as {image_format}")
+    return buffer.tobytes()
+
+
+@timed('heatmap')
+def overlay_heatmap_on_image(img_array, heatmap, alpha=0.6, max_side: Optional[int] = None,
+                             image_format: Optional[str] = None, quality: Optional[int] = None):
     """
     Overlay heatmap on original image for visualization
-    Returns: RGB image with heatmap overlay (base64 encoded)
+    max_side: downscale the overlay to this longest side (None = HEATMAP_MAX_SIDE, 0 = full size)
+    image_format / quality: see encode_heatmap
+    Returns: image with heatmap overlay (base64 encoded)
     """
     try:
         # Ensure heatmap is valid
         if heatmap is None or heatmap.size == 0:
             return None
         
-        # Convert to RGB if needed
+        # Work in BGR: the colormap and the encoder use it, so there is no RGB round-trip
         if len(img_array.shape) == 2:
-            img_rgb = cv2.cvtColor(img_array, cv2.COLOR_GRAY2RGB)
+            img_bgr = cv2.cvtColor(img_array, cv2.COLOR_GRAY2BGR)
         elif len(img_array.shape) == 3:
             if img_array.shape[2] == 4:
-                img_rgb = cv2.cvtColor(img_array, cv2.COLOR_BGRA2RGB)
-            elif img_array.shape[2] == 3:
-                img_rgb = cv2.cvtColor(img_array, cv2.COLOR_BGR2RGB)
+                img_bgr = cv2.cvtColor(img_array, cv2.COLOR_BGRA2BGR)
             else:
-                img_rgb = img_array
+                img_bgr = img_array
         else:
             return None
+        img_bgr = limit_size(img_bgr, HEATMAP_MAX_SIDE if max_side is None else max_side)
         
         # Ensure heatmap matches image size
-        if heatmap.shape[:2] != img_rgb.shape[:2]:
-            heatmap = cv2.resize(heatmap, (img_rgb.shape[1], img_rgb.shape[0]))
+        if heatmap.shape[:2] != img_bgr.shape[:2]:
+            heatmap = cv2.resize(heatmap, (img_bgr.shape[1], img_bgr.shape[0]))
         
         # Normalize heatmap to 0-255
         if heatmap.max() > 0:
@@ -1385,20 +1666,13 @@ def overlay_heatmap_on_image(img_array, heatmap, alpha=0.6):
         # Apply colormap to heatmap
         if len(heatmap.shape) == 2:
             heatmap_colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-            heatmap_colored = cv2.cvtColor(heatmap_colored, cv2.COLOR_BGR2RGB)
         else:
             heatmap_colored = heatmap
         
         # Overlay heatmap on image
-        overlay = cv2.addWeighted(img_rgb, 1 - alpha, heatmap_colored, alpha, 0)
-        
-        # Convert to PIL Image and then to base64
-        overlay_pil = Image.fromarray(overlay)
-        buffer = io.BytesIO()
-        overlay_pil.save(buffer, format='PNG')
-        overlay_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        overlay = cv2.addWeighted(img_bgr, 1 - alpha, heatmap_colored, alpha, 0)
         
-        return overlay_base64
+        return base64.b64encode(encode_heatmap(overlay, image_format, quality)).decode('ascii')
         
     except Exception as e:
         logger.warning(f"Heatmap overlay error: {e}", exc_info=True)
@@ -1445,10 +1719,14 @@ def calculate_method_contributions(ela_score, freq_score, face_score, meta_score
     return contributions
 
 
-def detect_deepfake_image(image: Image.Image) -> dict:
+def detect_deepfake_image(image: Image.Image, cnn_probability: Optional[float] = None, explain: bool = True,
+                          ctx: Optional[ImageContext] = None) -> dict:
     """
     Comprehensive deepfake detection for images with Explainable AI
     Uses multiple detection methods + CNN model for maximum accuracy (98-99%)
+    cnn_probability: CNN output already computed for this image (batched video inference); None = run the CNN here
+    explain: render the ELA / Grad-CAM heatmap overlays into explainability.heatmaps
+             (off: heatmaps are left to GET /api/deepfake/{id}/explain)
     """
     deepfake_score = 0.0
     all_indicators = []
@@ -1460,93 +1738,93 @@ def detect_deepfake_image(image: Image.Image) -> dict:
     method_contributions = {}
     
     try:
-        # Convert PIL to numpy
-        img_array = np.array(image)
-        img_array_bgr = img_array.copy()
-        if len(img_array.shape) == 3:
-            img_array_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+        # Derived planes (BGR view, gray planes, ELA map) are computed once for all methods
+        ctx = ctx or ImageContext(image)
+        img_array_bgr = ctx.bgr
+        # The rule-based methods convert their BGR input with RGB weights; hand them that plane directly
+        rule_gray = ctx.swapped_gray
         
         # ===== RULE-BASED METHODS =====
         
         # Method 1: Error Level Analysis
-        ela_score, ela_indicators = error_level_analysis(img_array_bgr)
+        ela_score, ela_indicators = error_level_analysis(rule_gray, ctx=ctx)
         if ela_score > 0:
             deepfake_score += ela_score
             detection_methods.append("Error Level Analysis (ELA)")
             all_indicators.extend(ela_indicators)
         
         # Method 2: Frequency Domain Analysis
-        freq_score, freq_indicators = frequency_domain_analysis(img_array_bgr)
+        # Global spectrum statistics run on the size-bounded proxy
+        spectrum = ctx.proxy.spectrum('swapped_gray')
+        freq_score, freq_indicators = frequency_domain_analysis(ctx.proxy.swapped_gray, scale=ctx.working_size['scale'],
+                                                                spectrum=spectrum)
         if freq_score > 0:
             deepfake_score += freq_score
             detection_methods.append("Frequency Domain Analysis")
             all_indicators.extend(freq_indicators)
         
         # Method 3: Face Consistency Check
-        face_score, face_indicators = face_consistency_check(img_array_bgr)
+        face_score, face_indicators = face_consistency_check(rule_gray, faces=ctx.faces)
         if face_score > 0:
             deepfake_score += face_score
             detection_methods.append("Face Consistency Analysis")
             all_indicators.extend(face_indicators)
         
         # Method 4: Metadata Analysis
-        meta_score, meta_indicators = metadata_analysis(image)
+        meta_score, meta_indicators = metadata_analysis(image, ctx)
         if meta_score > 0:
             deepfake_score += meta_score
             detection_methods.append("Metadata Analysis")
             all_indicators.extend(meta_indicators)
         
         # ===== DEEP LEARNING AI MODEL =====
-        if _load_tensorflow():
+        gradcam_heatmap = None
+        if cnn_probability is None:
             try:
-                # Build or load CNN model
-                cnn_model = build_deepfake_cnn_model()
-                
-                if cnn_model is not None:
+                # Process-wide CNN (built and warmed up once), batch of one.
+                # With Grad-CAM, the prediction comes out of the same taped pass as the heatmap.
+                explained = None
+                if explain:
                     try:
-                        # Prepare image for CNN
-                        img_resized = cv2.resize(img_array_bgr, (224, 224))
-                        img_tensor = np.expand_dims(img_resized, axis=0)
-                        img_tensor = keras.applications.mobilenet_v2.preprocess_input(img_tensor.astype(np.float32))
-                        
-                        # Get CNN prediction (probability of being fake)
-                        cnn_prediction = cnn_model.predict(img_tensor, verbose=0)
-                        if len(cnn_prediction) > 0 and len(cnn_prediction[0]) > 0:
-                            cnn_prediction_value = float(cnn_prediction[0][0])
-                            cnn_score = cnn_prediction_value * 100  # Convert to 0-100 scale
-                            cnn_confidence = abs(cnn_prediction_value - 0.5) * 2  # Distance from 0.5 (uncertainty)
-                            
-                            # Add CNN score to total (weighted)
-                            cnn_weight = 0.4  # 40% weight for CNN, 60% for rule-based
-                            weighted_cnn_score = cnn_score * cnn_weight
-                            weighted_rule_score = deepfake_score * (1 - cnn_weight)
-                            deepfake_score = weighted_cnn_score + weighted_rule_score
-                            
-                            detection_methods.append("CNN Deep Learning Model")
-                            all_indicators.append(f"AI Model Prediction: {cnn_score:.1f}% probability of deepfake")
-                            
-                            # Generate Grad-CAM heatmap (shows which pixels indicate manipulation)
-                            try:
-                                gradcam_heatmap = generate_gradcam_heatmap(cnn_model, img_array_bgr)
-                                if gradcam_heatmap is not None:
-                                    gradcam_overlay = overlay_heatmap_on_image(img_array_bgr, gradcam_heatmap, alpha=0.6)
-                                    if gradcam_overlay:
-                                        heatmaps['gradcam'] = gradcam_overlay
-                                        all_indicators.append("Grad-CAM heatmap generated - shows AI-detected manipulation regions")
-                            except Exception as gradcam_error:
-                                logger.warning(f"Grad-CAM generation failed: {gradcam_error}")
-                    except Exception as cnn_error:
-                        logger.warning(f"CNN prediction error (using rule-based only): {cnn_error}")
-            except Exception as e:
-                logger.warning(f"CNN model error (using rule-based only): {e}")
-        else:
-            # TensorFlow not available - use rule-based methods only
-            logger.debug("TensorFlow not available. Using rule-based detection methods only.")
+                        explained = explain_deepfake_cnn([img_array_bgr])
+                    except Exception as gradcam_error:
+                        logger.warning(f"Grad-CAM generation failed: {gradcam_error}")
+                if explained is not None:
+                    predictions, gradcam_heatmap = explained[0], explained[1][0]
+                else:
+                    predictions = predict_deepfake_cnn([img_array_bgr])
+                if predictions is not None and len(predictions) > 0:
+                    cnn_probability = float(predictions[0])
+                else:
+                    # CNN not available (TensorFlow / exported model missing) - use rule-based methods only
+                    logger.debug("Deepfake CNN not available. Using rule-based detection methods only.")
+            except Exception as cnn_error:
+                logger.warning(f"CNN prediction error (using rule-based only): {cnn_error}")
+        
+        if cnn_probability is not None:
+            cnn_score = cnn_probability * 100  # Convert to 0-100 scale
+            cnn_confidence = abs(cnn_probability - 0.5) * 2  # Distance from 0.5 (uncertainty)
+            
+            # Add CNN score to total (weighted)
+            cnn_weight = 0.4  # 40% weight for CNN, 60% for rule-based
+            weighted_cnn_score = cnn_score * cnn_weight
+            weighted_rule_score = deepfake_score * (1 - cnn_weight)
+            deepfake_score = weighted_cnn_score + weighted_rule_score
+            
+            detection_methods.append("CNN Deep Learning Model")
+            all_indicators.append(f"AI Model Prediction: {cnn_score:.1f}% probability of deepfake")
+            
+            # Grad-CAM heatmap (shows which pixels indicate manipulation)
+            if explain and gradcam_heatmap is not None:
+                overlay = overlay_heatmap_on_image(img_array_bgr, gradcam_heatmap, alpha=0.6)
+                if overlay:
+                    heatmaps['gradcam'] = overlay
+                    all_indicators.append("Grad-CAM heatmap generated - shows AI-detected manipulation regions")
         
         # ===== GENERATE EXPLAINABILITY HEATMAPS =====
         
         # Generate ELA heatmap (compression artifacts)
-        ela_heatmap = generate_ela_heatmap(img_array_bgr)
+        ela_heatmap = generate_ela_heatmap(img_array_bgr, ctx=ctx) if explain else None
         if ela_heatmap is not None:
             ela_overlay = overlay_heatmap_on_image(img_array_bgr, ela_heatmap, alpha=0.6)
             if ela_overlay:
@@ -1615,6 +1893,7 @@ def detect_deepfake_image(image: Image.Image) -> dict:
             explainability = {
                 'method_contributions': method_contributions or {},
                 'heatmaps': heatmaps or {},
+                'heatmap_format': DEFAULT_HEATMAP_FORMAT,
                 'pixel_level_analysis': {
                     'gradcam_available': 'gradcam' in (heatmaps or {}),
                     'ela_available': 'ela' in (heatmaps or {}),
@@ -1658,7 +1937,9 @@ def detect_deepfake_image(image: Image.Image) -> dict:
                 "cnn_score": round(cnn_score, 2),
                 "cnn_confidence": round(cnn_confidence, 2),
                 "total_methods": num_methods,
-                "ai_enhanced": cnn_score > 0
+                "ai_enhanced": cnn_score > 0,
+                "analysis_size": ctx.working_size,
+                "spectral": summarize_spectrum(spectrum)
             },
             "explainability": explainability
         }
@@ -1694,9 +1975,10 @@ def detect_deepfake_image(image: Image.Image) -> dict:
 
 # ===== FACE MASK DETECTION FUNCTIONS =====
 
-def detect_face_mask_edit(image: np.ndarray) -> tuple[float, List[str]]:
+def detect_face_mask_edit(image: np.ndarray, faces: Optional[np.ndarray] = None) -> tuple[float, List[str]]:
     """
     Detect face mask edits (face swapping, face replacement)
+    faces: face boxes already detected for this image (ImageContext.faces); None = detect here
     Returns: (score, indicators)
     """
     score = 0.0
@@ -1705,15 +1987,14 @@ def detect_face_mask_edit(image: np.ndarray) -> tuple[float, List[str]]:
     try:
         if not CV2_AVAILABLE:
             return 0, ["OpenCV not available - cannot perform face mask detection"]
-        # Load face detector
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
             gray = image
         
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        if faces is None:
+            faces = detect_faces(gray)
         
         if len(faces) == 0:
             return 0, ["No face detected - cannot check for face mask edits"]
@@ -1856,10 +2137,12 @@ def detect_face_mask_edit(image: np.ndarray) -> tuple[float, List[str]]:
         return 0, [f"Face mask detection error: {str(e)}"]
 
 
-def detect_temporal_face_inconsistency(frames: List[np.ndarray]) -> tuple[float, List[str]]:
+def detect_temporal_face_inconsistency(frames: List[np.ndarray],
+                                       faces: Optional[List[np.ndarray]] = None) -> tuple[float, List[str]]:
     """
     Detect temporal inconsistencies in face across video frames
     Face mask edits often have flickering or inconsistent face appearance
+    faces: face boxes already detected for each frame; None = detect here
     Returns: (score, indicators)
     """
     score = 0.0
@@ -1871,13 +2154,12 @@ def detect_temporal_face_inconsistency(frames: List[np.ndarray]) -> tuple[float,
         
         if not CV2_AVAILABLE:
             return 0, ["OpenCV not available - cannot perform temporal face analysis"]
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         
         face_positions = []
         face_sizes = []
         face_brightness = []
         
-        for frame in frames:
+        for idx, frame in enumerate(frames):
             if len(frame.shape) == 3:
                 if CV2_AVAILABLE:
                     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -1887,12 +2169,12 @@ def detect_temporal_face_inconsistency(frames: List[np.ndarray]) -> tuple[float,
             else:
                 gray = frame
             
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            frame_faces = faces[idx] if faces is not None else detect_faces(gray)
             
-            if len(faces) > 0:
-                # Use largest face
-                largest_face = max(faces, key=lambda f: f[2] * f[3])
-                x, y, w, h = largest_face
+            # Use largest face
+            face = largest_face(frame_faces)
+            if face is not None:
+                x, y, w, h = face
                 
                 face_positions.append((x, y))
                 face_sizes.append((w, h))
@@ -1978,10 +2260,12 @@ def detect_temporal_face_inconsistency(frames: List[np.ndarray]) -> tuple[float,
         return 0, [f"Temporal analysis error: {str(e)}"]
 
 
-def detect_deepfake_video(video_path: str) -> dict:
+def detect_deepfake_video(video_path: str, explain: bool = False) -> dict:
     """
     Enhanced deepfake and face mask detection for videos
     Analyzes multiple frames for temporal consistency + face mask edits
+    explain: render Grad-CAM overlays of the most suspicious frames into the response
+             (they are kept under the returned analysisId either way)
     """
     deepfake_score = 0.0
     face_mask_score = 0.0
@@ -1992,38 +2276,13 @@ def detect_deepfake_video(video_path: str) -> dict:
     face_mask_detected = False
     
     try:
-        # Read video
-        reader = imageio.get_reader(video_path)
-        fps = reader.get_meta_data().get('fps', 30)
-        
-        # Try to get frame count, but handle if not available
-        try:
-            num_frames = reader.count_frames()
-        except:
-            num_frames = None
-        
-        # Sample frames (every 30 frames or at least 15 frames for better face mask detection)
-        if num_frames:
-            frame_interval = max(1, num_frames // 15)
-        else:
-            frame_interval = 30  # Default interval
-        
-        sampled_frames = []
-        sampled_frames_np = []  # Store as numpy arrays for face mask detection
-        
-        for i, frame in enumerate(reader):
-            if i % frame_interval == 0:
-                sampled_frames.append(frame)
-                # Convert to BGR for OpenCV
-                if len(frame.shape) == 3:
-                    frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                else:
-                    frame_bgr = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-                sampled_frames_np.append(frame_bgr)
-                if len(sampled_frames) >= 15:
-                    break
-        
-        reader.close()
+        # Decode only the sampled frames: 15 for the full analysis, the ones between them (gray) for face tracking
+        job_progress(0.0, "decoding")
+        video = sample_video(video_path, count=15, track_steps=VIDEO_TRACK_STEPS)
+        fps = video.fps
+        sampled_frames_np = video.frames  # BGR numpy arrays for OpenCV and face mask detection
+        sampled_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in sampled_frames_np]
+        temporal_grays = video.grays
         
         if len(sampled_frames) == 0:
             return {
@@ -2041,13 +2300,27 @@ def detect_deepfake_video(video_path: str) -> dict:
             }
         
         # ===== DEEPFAKE DETECTION (Frame-by-frame) =====
+        # All sampled frames go through the CNN as one (N, 224, 224, 3) batch
+        cnn_probabilities = None
+        job_progress(0.2, "cnn")
+        try:
+            cnn_probabilities = predict_deepfake_cnn(sampled_frames_np)
+        except Exception as cnn_error:
+            logger.warning(f"Batched CNN prediction error (falling back to per-frame inference): {cnn_error}")
+        
         frame_scores = []
+        frame_faces = []  # Face boxes detected once per frame, reused by the face mask and temporal checks
         for idx, frame in enumerate(sampled_frames):
+            job_progress(0.3 + 0.5 * idx / len(sampled_frames), "frames")
             frame_img = Image.fromarray(frame)
-            frame_result = detect_deepfake_image(frame_img)
+            frame_ctx = ImageContext(frame_img)
+            frame_probability = float(cnn_probabilities[idx]) if cnn_probabilities is not None else None
+            frame_result = detect_deepfake_image(frame_img, cnn_probability=frame_probability, explain=False,
+                                                 ctx=frame_ctx)
+            frame_faces.append(frame_ctx.faces)
             frame_scores.append(frame_result["deepfakeScore"])
             frame_analyses.append({
-                "frame": idx * frame_interval,
+                "frame": video.indices[idx],
                 "score": frame_result["deepfakeScore"],
                 "verdict": frame_result["verdict"],
                 "indicators": frame_result["indicators"][:3]  # Top 3 indicators per frame
@@ -2072,14 +2345,28 @@ def detect_deepfake_video(video_path: str) -> dict:
             detection_methods.append("Frame-by-Frame Analysis")
             all_indicators.append(f"{suspicious_frames}/{len(frame_scores)} frames detected as suspicious")
         
+        # Grad-CAM only for the most suspicious frames (one batched pass), now or on request
+        ranked = sorted(range(len(frame_scores)), key=lambda i: frame_scores[i], reverse=True)[:VIDEO_GRADCAM_TOP_K]
+        explanation = {
+            'kind': 'video',
+            'frames': [
+                {'frame': video.indices[idx], 'score': frame_scores[idx],
+                 'image': limit_size(sampled_frames_np[idx], EXPLAIN_STORE_MAX_SIDE)}
+                for idx in ranked
+            ],
+        }
+        video_heatmaps = render_explanation(explanation, ('gradcam',)) if explain else {}
+        analysis_id = explanation_store.put(explanation)
+        
         # ===== FACE MASK DETECTION =====
         face_mask_indicators = []
         face_mask_methods = []
+        job_progress(0.8, "face_mask")
         
         # 1. Detect face mask in individual frames
         frame_face_mask_scores = []
         for idx, frame_np in enumerate(sampled_frames_np):
-            mask_score, mask_indicators = detect_face_mask_edit(frame_np)
+            mask_score, mask_indicators = detect_face_mask_edit(frame_np, faces=frame_faces[idx])
             if mask_score > 0:
                 frame_face_mask_scores.append(mask_score)
                 face_mask_indicators.extend(mask_indicators)
@@ -2096,7 +2383,18 @@ def detect_deepfake_video(video_path: str) -> dict:
                 face_mask_indicators.append(f"Face mask detected in {len(frame_face_mask_scores)}/{len(sampled_frames_np)} frames")
         
         # 2. Temporal face inconsistency (face mask flickering)
-        temporal_score, temporal_indicators = detect_temporal_face_inconsistency(sampled_frames_np)
+        # Always scored on the analyzed frames; with tracking on, their faces are the boxes tracked through the
+        # frames in between rather than independent detections (kept where tracking is off or fails)
+        temporal_frames, temporal_faces, tracking_stats = sampled_frames_np, frame_faces, None
+        job_progress(0.9, "temporal")
+        if len(temporal_grays) > len(sampled_frames_np):
+            try:
+                tracked, tracking_stats = track_faces(temporal_grays)
+                tracked_at = dict(zip(video.gray_indices, tracked))
+                temporal_faces = [tracked_at.get(index, faces) for index, faces in zip(video.indices, frame_faces)]
+            except Exception as track_error:
+                logger.warning(f"Face tracking error (temporal checks use the detected faces): {track_error}")
+        temporal_score, temporal_indicators = detect_temporal_face_inconsistency(temporal_frames, faces=temporal_faces)
         if temporal_score > 0:
             face_mask_score += temporal_score
             face_mask_indicators.extend(temporal_indicators)
@@ -2164,9 +2462,15 @@ def detect_deepfake_video(video_path: str) -> dict:
                 "score_std": round(score_std, 2),
                 "fps": fps,
                 "face_mask_detection": face_mask_detected,
-                "face_mask_score": round(face_mask_score, 2)
+                "face_mask_score": round(face_mask_score, 2),
+                "cnn_batched": cnn_probabilities is not None,
+                "num_temporal_frames": len(temporal_frames),
+                "face_tracking": tracking_stats,
+                "decoding": video.stats()
             },
-            "explainability": {}  # Video explainability can be added later if needed
+            "explainability": {"heatmaps": video_heatmaps, "heatmap_format": DEFAULT_HEATMAP_FORMAT}
+                              if video_heatmaps.get('gradcam_frames') else {},
+            "analysisId": analysis_id
         }
         
     except Exception as e:
@@ -2203,9 +2507,18 @@ async def health_check():
                 "opencv": CV2_AVAILABLE,
                 "scikit-image": SKIMAGE_AVAILABLE,
                 "librosa": LIBROSA_AVAILABLE,
-                "tensorflow": "lazy_loaded",  # Loaded on-demand
+                "tensorflow": TENSORFLOW_AVAILABLE if _tensorflow_loaded else "lazy_loaded",  # Loaded on-demand
                 "matplotlib": MATPLOTLIB_AVAILABLE,
-            }
+                "tesseract": TESSERACT_AVAILABLE,
+            },
+            "ocr": get_ocr_backend().stats() if TESSERACT_AVAILABLE else {},
+            "cache": analysis_cache.stats(),
+            "models": model_registry.stats(),
+            "explanations": explanation_store.stats(),
+            "faceDetection": face_detection_stats(),
+            "execution": analysis_executor.stats(),
+            "jobs": job_store.stats(),
+            "responses": response_encoding_stats()
         }
         return checks
     except Exception as e:
@@ -2213,6 +2526,58 @@ async def health_check():
         return {"status": "unhealthy", "error": str(e), "service": "ml-service"}
 
 
+def service_metrics():
+    """Scrape-time gauges and counters from the stats() reported under /health"""
+    pools = analysis_executor.stats()
+    yield ('ml_pool_workers', 'gauge', 'Workers of each analysis pool',
+           [({'pool': name}, pool['workers']) for name, pool in pools.items()])
+    yield ('ml_pool_in_flight', 'gauge', 'Analyses running or queued on each pool',
+           [({'pool': name}, pool['in_flight']) for name, pool in pools.items()])
+    yield ('ml_pool_queue_depth', 'gauge', 'Analyses waiting for a pool worker',
+           [({'pool': name}, pool['queued']) for name, pool in pools.items()])
+    yield ('ml_pool_rejected_total', 'counter', 'Requests refused because the pool was full',
+           [({'pool': name}, pool['rejected']) for name, pool in pools.items()])
+
+    cache, explanations = analysis_cache.stats(), explanation_store.stats()
+    caches = {
+        'analysis': (cache['hits'] + cache['disk_hits'], cache['misses']),
+        'explanation': (explanations['hits'], explanations['misses']),
+    }
+    yield ('ml_cache_hits_total', 'counter', 'Cache lookups that found an entry',
+           [({'cache': name}, hits) for name, (hits, _) in caches.items()])
+    yield ('ml_cache_misses_total', 'counter', 'Cache lookups that found nothing',
+           [({'cache': name}, misses) for name, (_, misses) in caches.items()])
+    yield ('ml_cache_hit_ratio', 'gauge', 'Share of cache lookups that hit since startup',
+           [({'cache': name}, hits / (hits + misses) if hits + misses else 0.0) for name, (hits, misses) in caches.items()])
+    yield ('ml_cache_entries', 'gauge', 'Entries kept in each cache',
+           [({'cache': 'analysis'}, cache['entries']), ({'cache': 'explanation'}, explanations['entries'])])
+
+    models = model_registry.stats()
+    yield ('ml_model_load_seconds', 'gauge', 'Time to build or load each model',
+           [({'model': name}, model.get('load_time')) for name, model in models.items()])
+    yield ('ml_model_warmup_seconds', 'gauge', 'Time of the warm-up inference of each model',
+           [({'model': name}, model.get('warmup_time')) for name, model in models.items()])
+    yield ('ml_model_calls_total', 'counter', 'Inference calls of each model',
+           [({'model': name}, model.get('calls')) for name, model in models.items()])
+
+    jobs = job_store.stats()
+    yield ('ml_jobs', 'gauge', 'Unfinished jobs by status',
+           [({'status': 'queued'}, jobs['queued']), ({'status': 'running'}, jobs['running'])])
+    yield ('ml_jobs_finished_total', 'counter', 'Finished jobs by status',
+           [({'status': status}, jobs[status]) for status in ('succeeded', 'failed', 'cancelled')])
+
+
+register_collector(service_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/api/forensics/validate")
 async def validate_transaction(body: dict):
     """
@@ -2266,23 +2631,31 @@ async def validate_transaction(body: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/forensics/analyze", response_model=ImageAnalysisResponse)
-async def analyze_image(request: ImageAnalysisRequest):
+def ocr_cache_fingerprint() -> str:
+    """Settings cached OCR results depend on: strategy, cascade thresholds, engine backend and models"""
+    return config_fingerprint('ocr', OCR_STRATEGY, OCR_TEXT_REGIONS, OCR_ENGINE_PROFILE,
+                              OCR_CASCADE_MIN_CONFIDENCE, OCR_CASCADE_MIN_FIELDS,
+                              get_ocr_backend().name if TESSERACT_AVAILABLE else None,
+                              OCR_TESSDATA_PATH, OCR_TESSDATA_FAST_PATH)
+
+
+def analyze_image_request(request: ImageAnalysisRequest, image_data: bytes = None) -> ImageAnalysisResponse:
     """
-    Analyze image for forgery and extract OCR text
+    Analyze image for forgery and extract OCR text (runs on the image worker pool)
     
     Args:
         request: ImageAnalysisRequest with base64 encoded image
+        image_data: raw image bytes, used instead of request.image (multipart uploads)
         
     Returns:
         ImageAnalysisResponse with OCR text, forgery score, verdict, and confidence
     """
     try:
-        # Decode base64 image
-        if request.format == "base64":
+        # Decode base64 image (uploads pass the bytes)
+        if image_data is None:
+            if request.format != "base64":
+                raise HTTPException(status_code=400, detail="Unsupported image format")
             image_data = base64.b64decode(request.image)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported image format")
         
         # Open image
         try:
@@ -2295,6 +2668,18 @@ async def analyze_image(request: ImageAnalysisRequest):
             logger.error(f"Image opening error: {e}")
             raise HTTPException(status_code=400, detail=f"Invalid image data: {str(e)}")
         
+        # Derived planes shared by OCR and the forgery detectors of this request
+        ctx = ImageContext(image)
+        
+        # Identical evidence (same decoded bytes) reuses cached OCR/forensics results
+        image_digest = content_digest(image_data)
+        ocr_fingerprint = ocr_cache_fingerprint()
+        forgery_fingerprint = config_fingerprint('forgery', IMPROVED_FORGERY_AVAILABLE, get_active_config(),
+                                                 ANALYSIS_PROXY_MAX_PIXELS, FORENSICS_BLOCK_COVERAGE,
+                                                 SPECTRAL_FAST_LEN)
+        cache_status = {}
+        ocr_context = {}
+        
         # Extract transaction data with OCR or use manual data
         try:
             if request.manualData and request.manualData.get('upiId'):
@@ -2315,10 +2700,24 @@ async def analyze_image(request: ImageAnalysisRequest):
                     f"Merchant: {extracted_data['merchant']}"
                 )
             else:
-                # Use OCR extraction
-                logger.info("Starting OCR extraction...")
-                ocr_text, extracted_data = extract_transaction_data(image)
-                logger.info(f"OCR extraction completed. Text length: {len(ocr_text)}")
+                cached_ocr = analysis_cache.get('ocr', image_digest, ocr_fingerprint)
+                if cached_ocr is not None:
+                    logger.info("Using cached OCR result for identical image")
+                    ocr_text, extracted_data, ocr_context = cached_ocr['text'], cached_ocr['data'], cached_ocr['context']
+                    cache_status['ocr'] = 'hit'
+                else:
+                    # Use OCR extraction
+                    logger.info("Starting OCR extraction...")
+                    ocr_text, extracted_data, ocr_context = extract_transaction_data(
+                        image, time_budget=request.ocrTimeBudget, ctx=ctx)
+                    logger.info(f"OCR extraction completed. Text length: {len(ocr_text)}")
+                    cache_status['ocr'] = 'miss'
+                    # Only complete OCR runs that found text are cached (not the random fallback receipt
+                    # or budget-truncated runs)
+                    if (ocr_context and not ocr_context.get('simulatedFallback')
+                            and not ocr_context.get('timedOutVariants')):
+                        analysis_cache.put('ocr', image_digest, ocr_fingerprint,
+                                           {'text': ocr_text, 'data': extracted_data, 'context': ocr_context})
         except Exception as e:
             logger.error(f"OCR extraction failed: {e}", exc_info=True)
             # Return fallback instead of failing completely
@@ -2338,7 +2737,14 @@ async def analyze_image(request: ImageAnalysisRequest):
             }
         
         # Analyze for image forgery (returns edit detection too)
-        forgery_result = analyze_forgery(image)
+        forgery_result = analysis_cache.get('forgery', image_digest, forgery_fingerprint)
+        if forgery_result is not None:
+            logger.info("Using cached forgery analysis for identical image")
+            cache_status['forgery'] = 'hit'
+        else:
+            forgery_result = analyze_forgery(image, ctx)
+            cache_status['forgery'] = 'miss'
+            analysis_cache.put('forgery', image_digest, forgery_fingerprint, list(forgery_result))
         if len(forgery_result) == 6:
             forgery_score, verdict, confidence, is_edited, edit_confidence, edit_indicators = forgery_result
         else:
@@ -2407,7 +2813,16 @@ async def analyze_image(request: ImageAnalysisRequest):
                     confidence = min(1.0, confidence + 0.1)  # Increase confidence for legitimate transactions
                 logger.info(f"✅ Transaction data appears legitimate (risk_score={risk_score})")
         
+        processing_details = {
+            'cache': cache_status,
+            # Resolution the global forensics statistics ran at (large images use a downscaled proxy)
+            'analysisSize': ctx.working_size,
+        }
+        if ocr_context:
+            processing_details['ocr'] = ocr_context
+        
         logger.info(f"Analysis complete: verdict={verdict}, forgery_score={forgery_score:.2f}, fraud_detected={fraud_detected}, is_edited={is_edited}, transaction_risk={transaction_validation.get('overall_risk_score', 0) if transaction_validation else 0}")
+        record_verdict('forensics', verdict)
         
         return ImageAnalysisResponse(
             ocrText=ocr_text,
@@ -2420,7 +2835,8 @@ async def analyze_image(request: ImageAnalysisRequest):
             fraudIndicators=fraud_indicators,
             isEdited=is_edited,
             editConfidence=round(edit_confidence, 2),
-            editIndicators=edit_indicators
+            editIndicators=edit_indicators,
+            processingDetails=processing_details
         )
     
     except HTTPException:
@@ -2430,8 +2846,145 @@ async def analyze_image(request: ImageAnalysisRequest):
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+def analyze_image_upload(upload: UploadFile, request: ImageAnalysisRequest) -> ImageAnalysisResponse:
+    """Analyze a multipart image; reads it from Starlette's spooled file in the worker"""
+    check_upload(upload)
+    return analyze_image_request(request, upload.file.read())
+
+
+@app.post("/api/forensics/analyze", response_model=ImageAnalysisResponse,
+          openapi_extra=request_body_docs(ImageAnalysisRequest, 'image'))
+async def analyze_image(request: Request):
+    """
+    Analyze image for forgery and extract OCR text (see analyze_image_request)
+    Body: ImageAnalysisRequest as JSON (base64 image); multipart with the file in "image" and
+    manualData (JSON) / ocrTimeBudget fields; or the image itself (application/octet-stream, image/*)
+    with X-Manual-Data / X-Ocr-Time-Budget headers
+    """
+    kind = body_kind(request)
+    if kind == 'json':
+        return await analysis_executor.run('image', analyze_image_request, await json_request(request, ImageAnalysisRequest))
+    # Refuse before reading the upload when the image pool is already full
+    analysis_executor.check('image')
+    if kind == 'multipart':
+        async with request.form() as form:
+            options = binary_request(ImageAnalysisRequest, form_options(form, ImageAnalysisRequest), image="")
+            return await analysis_executor.run('image', analyze_image_upload, form_file(form, 'image'), options)
+    options = binary_request(ImageAnalysisRequest, header_options(request, ImageAnalysisRequest), image="")
+    return await analysis_executor.run('image', analyze_image_request, options, await read_body(request))
+
+
+def analyze_batch_item(item: ImageAnalysisRequest) -> ImageAnalysisResponse:
+    """One image of a JSON batch (base64), with the single-file size cap"""
+    if len(item.image) * 3 // 4 > UPLOAD_MAX_BYTES:
+        raise too_large(len(item.image) * 3 // 4)
+    return analyze_image_request(item)
+
+
+def batch_error(e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        return {"status": e.status_code, "detail": e.detail}
+    logger.error(f"Batch item failed: {e}")
+    return {"status": 500, "detail": f"Analysis failed: {str(e)}"}
+
+
+async def stream_batch_results(ids: List[str], fn, arg_lists: list, uploads: List[UploadFile] = ()):
+    """
+    NDJSON lines of a batch in completion order: {"id", "index", "ok": true, "result": ImageAnalysisResponse}
+    or {"id", "index", "ok": false, "error": {"status", "detail"}} per item, then {"summary": {...}}
+    """
+    start = time.time()
+    succeeded = failed = 0
+    try:
+        async for index, result, error in analysis_executor.run_unordered('image', fn, arg_lists, BATCH_CONCURRENCY):
+            line = {"id": ids[index], "index": index, "ok": error is None}
+            if error is None:
+                line["result"] = result.model_dump(mode="json")
+                succeeded += 1
+            else:
+                line["error"] = batch_error(error)
+                failed += 1
+            yield json_dumps(line) + b"\n"
+        yield json_dumps({"summary": {"total": len(ids), "succeeded": succeeded, "failed": failed,
+                                      "seconds": round(time.time() - start, 3)}}) + b"\n"
+    finally:
+        for upload in uploads:
+            await upload.close()
+
+
+def check_batch_size(count: int, total_bytes: int = 0):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="Batch contains no images")
+    if count > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large ({count} images). Maximum is {BATCH_MAX_ITEMS}")
+    # The Content-Length check misses chunked bodies: the received files are counted here as well
+    if total_bytes > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=(
+            f"Batch too large ({total_bytes / 2 ** 20:.1f} MB). Maximum batch size is {BATCH_MAX_BYTES / 2 ** 20:.0f} MB"
+        ))
+
+
+@app.post("/api/forensics/analyze/batch", openapi_extra=request_body_docs(ImageBatchRequest, 'files'))
+async def analyze_image_batch(request: Request):
+    """
+    Analyze many images in one request (JSON: items of ImageAnalysisRequest plus an optional id;
+    multipart: see /api/forensics/analyze/batch/upload)
+    Items are spread over the image worker pool and streamed back as NDJSON as each one completes
+    (see stream_batch_results); an invalid or failing item is reported on its line and does not fail the batch
+    """
+    kind = body_kind(request)
+    if kind == 'raw':
+        raise HTTPException(status_code=415, detail="Send a batch as JSON or multipart/form-data")
+    if kind == 'multipart':
+        # Left open on success: the files are read while the response streams
+        form = await request.form(max_files=BATCH_MAX_ITEMS, max_fields=BATCH_MAX_ITEMS + 16)
+        try:
+            options = binary_request(ImageAnalysisRequest, form_options(form, ImageAnalysisRequest), image="")
+        except Exception:
+            await form.close()
+            raise
+        ocr_time_budget = options.ocrTimeBudget
+        return await analyze_image_batch_upload([f for f in form.getlist('files') if not isinstance(f, str)],
+                                                form.getlist('ids') or None, ocr_time_budget)
+    request = await json_request(request, ImageBatchRequest)
+    check_batch_size(len(request.items))
+    ids, arg_lists = [], []
+    for index, item in enumerate(request.items):
+        if item.ocrTimeBudget is None:
+            item.ocrTimeBudget = request.ocrTimeBudget
+        ids.append(item.id if item.id is not None else str(index))
+        arg_lists.append((item,))
+    logger.info(f"Image batch received: {len(ids)} images")
+    return StreamingResponse(stream_batch_results(ids, analyze_batch_item, arg_lists),
+                             media_type="application/x-ndjson")
+
+
+@app.post("/api/forensics/analyze/batch/upload")
+async def analyze_image_batch_upload(files: List[UploadFile] = File(...), ids: Optional[List[str]] = Form(None),
+                                     ocrTimeBudget: Optional[float] = Form(None)):
+    """
+    Multipart variant of /api/forensics/analyze/batch (fields: files, repeated; ids, repeated in the
+    same order, defaulting to the file names; ocrTimeBudget)
+    """
+    try:
+        check_batch_size(len(files), sum(upload_size(upload) for upload in files))
+        if ids is not None and len(ids) != len(files):
+            raise HTTPException(status_code=400, detail=f"Got {len(ids)} ids for {len(files)} files")
+    except HTTPException:
+        for upload in files:
+            await upload.close()
+        raise
+    ids = ids or [upload.filename or str(index) for index, upload in enumerate(files)]
+    request = ImageAnalysisRequest(image="", format="binary", ocrTimeBudget=ocrTimeBudget)
+    logger.info(f"Image batch upload received: {len(files)} images")
+    return StreamingResponse(
+        stream_batch_results(ids, analyze_image_upload, [(upload, request) for upload in files], files),
+        media_type="application/x-ndjson")
+
+
 # ===== VOICE DEEPFAKE DETECTION FUNCTIONS =====
 
+@timed('voice_spectral')
 def spectral_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Analyze spectral characteristics for AI-generated voice detection
@@ -2512,6 +3065,7 @@ def spectral_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]
     return min(score, 50), indicators
 
 
+@timed('voice_mfcc')
 def mfcc_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Mel-frequency cepstral coefficients analysis
@@ -2573,6 +3127,7 @@ def mfcc_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     return min(score, 50), indicators
 
 
+@timed('voice_pitch')
 def pitch_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Pitch (fundamental frequency) analysis
@@ -2654,6 +3209,7 @@ def pitch_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     return min(score, 50), indicators
 
 
+@timed('voice_formant')
 def formant_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Formant analysis (vowel characteristics)
@@ -2709,6 +3265,7 @@ def formant_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]
     return min(score, 50), indicators
 
 
+@timed('voice_temporal')
 def temporal_consistency_analysis(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Analyze temporal consistency
@@ -2763,6 +3320,7 @@ def temporal_consistency_analysis(audio_data: np.ndarray, sr: int) -> tuple[floa
     return min(score, 50), indicators
 
 
+@timed('voice_spam')
 def spam_call_detection(audio_data: np.ndarray, sr: int) -> tuple[float, List[str]]:
     """
     Detect spam call characteristics
@@ -2856,7 +3414,9 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             raise Exception(f"Path is not a file: {abs_audio_path}")
         
         # Load audio file with absolute path
-        audio_data, sr = librosa.load(abs_audio_path, sr=None, duration=60)  # Max 60 seconds
+        job_progress(0.0, "loading")
+        with stage_timer('audio_load'):
+            audio_data, sr = librosa.load(abs_audio_path, sr=None, duration=60)  # Max 60 seconds
         
         if len(audio_data) == 0:
             logger.error("Audio file is empty or could not be loaded")
@@ -2890,6 +3450,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
         spam_score = 0.0
         
         # Method 1: Spectral Analysis (ALWAYS RUN)
+        job_progress(0.15, "spectral")
         try:
             spec_score, spec_indicators = spectral_analysis(audio_data, sr)
             detection_methods.append("Spectral Analysis")
@@ -2904,6 +3465,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             all_indicators.append(f"Spectral analysis error: {str(e)}")
         
         # Method 2: MFCC Analysis (ALWAYS RUN)
+        job_progress(0.3, "mfcc")
         try:
             mfcc_score, mfcc_indicators = mfcc_analysis(audio_data, sr)
             detection_methods.append("MFCC Analysis")
@@ -2918,6 +3480,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             all_indicators.append(f"MFCC analysis error: {str(e)}")
         
         # Method 3: Pitch Analysis (ALWAYS RUN)
+        job_progress(0.45, "pitch")
         try:
             pitch_score, pitch_indicators = pitch_analysis(audio_data, sr)
             detection_methods.append("Pitch Analysis")
@@ -2932,6 +3495,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             all_indicators.append(f"Pitch analysis error: {str(e)}")
         
         # Method 4: Formant Analysis (ALWAYS RUN)
+        job_progress(0.6, "formant")
         try:
             formant_score, formant_indicators = formant_analysis(audio_data, sr)
             detection_methods.append("Formant Analysis")
@@ -2946,6 +3510,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             all_indicators.append(f"Formant analysis error: {str(e)}")
         
         # Method 5: Temporal Consistency (ALWAYS RUN)
+        job_progress(0.75, "temporal")
         try:
             temporal_score, temporal_indicators = temporal_consistency_analysis(audio_data, sr)
             detection_methods.append("Temporal Consistency Analysis")
@@ -2960,6 +3525,7 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
             all_indicators.append(f"Temporal analysis error: {str(e)}")
         
         # Method 6: Spam Call Detection (ALWAYS RUN)
+        job_progress(0.9, "spam")
         try:
             spam_score, spam_inds = spam_call_detection(audio_data, sr)
             detection_methods.append("Spam Call Pattern Detection")
@@ -3012,7 +3578,8 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
         # Additional AI voice detection: Check for unnatural harmonic patterns
         try:
             # AI voices often have unnatural harmonic structures
-            harmonic, percussive = librosa.effects.hpss(audio_data)
+            with stage_timer('hpss'):
+                harmonic, percussive = librosa.effects.hpss(audio_data)
             harmonic_ratio = np.mean(np.abs(harmonic)) / (np.mean(np.abs(audio_data)) + 1e-10)
             
             if harmonic_ratio < 0.3:  # Very low harmonic content
@@ -3117,11 +3684,79 @@ def _detect_voice_deepfake_impl(audio_path: str) -> dict:
         raise Exception(f"Voice detection failed: {error_msg}")
 
 
-@app.post("/api/deepfake/detect", response_model=DeepfakeDetectionResponse)
-async def detect_deepfake(request: DeepfakeDetectionRequest):
+def _complete_deepfake_result(result: dict) -> DeepfakeDetectionResponse:
+    # Ensure all required fields are present
+    if 'explainability' not in result:
+        result['explainability'] = {}
+    if 'faceMaskDetected' not in result:
+        result['faceMaskDetected'] = False
+    if 'faceMaskScore' not in result:
+        result['faceMaskScore'] = 0.0
+    return DeepfakeDetectionResponse(**result)
+
+
+def deepfake_image_response(source, explain: bool = False) -> DeepfakeDetectionResponse:
+    """
+    Deepfake detection for an image
+    source: the encoded image as a file object (BytesIO, spooled upload)
+    """
+    logger.info("Processing image for deepfake detection")
+    try:
+        image = Image.open(source)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+    except Exception as e:
+        logger.error(f"Error opening image: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=f"Invalid image data: {str(e)}")
+    
+    try:
+        logger.info(f"Starting deepfake detection for image: {image.size[0]}x{image.size[1]} pixels")
+        ctx = ImageContext(image)
+        result = detect_deepfake_image(image, explain=explain, ctx=ctx)
+        # With explain the heatmaps are already in the response: nothing to keep for later
+        if not explain:
+            try:
+                result['analysisId'] = remember_image_analysis(ctx)
+            except Exception as e:
+                logger.warning(f"Could not keep analysis for later explanation: {e}")
+        logger.info(f"Image detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}, confidence={result.get('confidence')}")
+        record_verdict('deepfake_image', result.get('verdict'))
+        logger.info("Returning image detection results")
+        return _complete_deepfake_result(result)
+    except Exception as e:
+        logger.error(f"Error in detect_deepfake_image: {e}", exc_info=True)
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Image detection failed: {str(e)}")
+
+
+def deepfake_video_response(video_path: str, explain: bool = False) -> DeepfakeDetectionResponse:
+    """Deepfake and face mask detection for a video file (the caller removes the file)"""
+    try:
+        logger.info("Starting video deepfake detection...")
+        result = detect_deepfake_video(video_path, explain=explain)
+        logger.info(f"Video detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}, confidence={result.get('confidence')}")
+        record_verdict('deepfake_video', result.get('verdict'))
+        logger.info("Returning video detection results")
+        return _complete_deepfake_result(result)
+    except Exception as e:
+        logger.error(f"Error processing video: {e}", exc_info=True)
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Video detection failed: {str(e)}")
+
+
+def remove_temp_file(path: str):
+    if path and os.path.exists(path):
+        logger.info(f"Cleaning up temp file: {path}")
+        os.remove(path)
+
+
+def detect_deepfake_request(request: DeepfakeDetectionRequest) -> DeepfakeDetectionResponse:
     """
     Detect deepfakes in images or videos
     Uses multiple advanced detection methods for maximum accuracy
+    (large videos: prefer the multipart /api/deepfake/detect/upload)
     """
     try:
         logger.info(f"Deepfake detection request received: fileType={request.fileType}, format={request.format}")
@@ -3130,8 +3765,14 @@ async def detect_deepfake(request: DeepfakeDetectionRequest):
             logger.error("No file provided in request")
             raise HTTPException(status_code=400, detail="No file provided")
         
-        # Decode base64 file
-        if request.format == "base64":
+        if request.format != "base64":
+            logger.error(f"Unsupported format: {request.format}")
+            raise HTTPException(status_code=400, detail="Unsupported format. Use base64")
+        
+        if request.fileType == "image":
+            # 4 base64 characters per 3 bytes: refuse oversized files before decoding them
+            if len(request.file) * 3 // 4 > UPLOAD_MAX_BYTES:
+                raise too_large(len(request.file) * 3 // 4)
             try:
                 logger.info(f"Decoding base64 file (size: {len(request.file)} chars)")
                 file_data = base64.b64decode(request.file)
@@ -3139,78 +3780,17 @@ async def detect_deepfake(request: DeepfakeDetectionRequest):
             except Exception as e:
                 logger.error(f"Base64 decode error: {e}", exc_info=True)
                 raise HTTPException(status_code=400, detail=f"Invalid base64 data: {str(e)}")
-        else:
-            logger.error(f"Unsupported format: {request.format}")
-            raise HTTPException(status_code=400, detail="Unsupported format. Use base64")
-        
-        if request.fileType == "image":
-            logger.info("Processing image for deepfake detection")
-            # Process image
-            try:
-                image = Image.open(io.BytesIO(file_data))
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-            except Exception as e:
-                logger.error(f"Error opening image: {e}", exc_info=True)
-                raise HTTPException(status_code=400, detail=f"Invalid image data: {str(e)}")
-            
-            try:
-                logger.info(f"Starting deepfake detection for image: {image.size[0]}x{image.size[1]} pixels")
-                result = detect_deepfake_image(image)
-                logger.info(f"Image detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}, confidence={result.get('confidence')}")
-                
-                # Ensure all required fields are present
-                if 'explainability' not in result:
-                    result['explainability'] = {}
-                if 'faceMaskDetected' not in result:
-                    result['faceMaskDetected'] = False
-                if 'faceMaskScore' not in result:
-                    result['faceMaskScore'] = 0.0
-                
-                logger.info("Returning image detection results")
-                return DeepfakeDetectionResponse(**result)
-            except Exception as e:
-                logger.error(f"Error in detect_deepfake_image: {e}", exc_info=True)
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                raise HTTPException(status_code=500, detail=f"Image detection failed: {str(e)}")
+            return deepfake_image_response(io.BytesIO(file_data), explain=request.explain)
             
         elif request.fileType == "video":
             logger.info("Processing video for deepfake detection")
-            # Process video
+            # Decoded straight into a new temp file (size-capped, created with mkstemp)
+            temp_path, _ = decode_to_file(request.file, '.mp4')
             try:
-                # Save to temp file
-                temp_path = tempfile.mktemp(suffix='.mp4')
-                logger.info(f"Saving video to temp file: {temp_path}")
-                with open(temp_path, 'wb') as f:
-                    f.write(file_data)
-                logger.info(f"Video saved: {len(file_data)} bytes")
-                
-                try:
-                    logger.info("Starting video deepfake detection...")
-                    result = detect_deepfake_video(temp_path)
-                    logger.info(f"Video detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}, confidence={result.get('confidence')}")
-                    
-                    # Ensure all required fields are present
-                    if 'explainability' not in result:
-                        result['explainability'] = {}
-                    if 'faceMaskDetected' not in result:
-                        result['faceMaskDetected'] = False
-                    if 'faceMaskScore' not in result:
-                        result['faceMaskScore'] = 0.0
-                    
-                    logger.info("Returning video detection results")
-                    return DeepfakeDetectionResponse(**result)
-                finally:
-                    # Clean up
-                    if os.path.exists(temp_path):
-                        logger.info(f"Cleaning up temp file: {temp_path}")
-                        os.remove(temp_path)
-            except Exception as e:
-                logger.error(f"Error processing video: {e}", exc_info=True)
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                raise HTTPException(status_code=500, detail=f"Video detection failed: {str(e)}")
+                logger.info(f"Video saved to temp file: {temp_path}")
+                return deepfake_video_response(temp_path, explain=request.explain)
+            finally:
+                remove_temp_file(temp_path)
         else:
             raise HTTPException(status_code=400, detail="Invalid fileType. Use 'image' or 'video'")
             
@@ -3223,11 +3803,442 @@ async def detect_deepfake(request: DeepfakeDetectionRequest):
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
 
-@app.post("/api/voice/deepfake/detect", response_model=VoiceDeepfakeDetectionResponse)
-async def detect_voice_deepfake(request: VoiceDeepfakeDetectionRequest):
+@app.post("/api/deepfake/detect", response_model=DeepfakeDetectionResponse,
+          openapi_extra=request_body_docs(DeepfakeDetectionRequest, 'file'))
+async def detect_deepfake(request: Request):
+    """
+    Detect deepfakes in images or videos (see detect_deepfake_request); videos use the video worker pool
+    Body: DeepfakeDetectionRequest as JSON (base64 file); multipart (see /api/deepfake/detect/upload);
+    or the file itself (application/octet-stream, image/*, video/*) with X-File-Type / X-Explain headers
+    """
+    kind = body_kind(request)
+    if kind == 'json':
+        body = await json_request(request, DeepfakeDetectionRequest)
+        workload = 'video' if body.fileType == 'video' else 'image'
+        return await analysis_executor.run(workload, detect_deepfake_request, body)
+    if kind == 'multipart':
+        async with request.form() as form:
+            options = binary_request(DeepfakeDetectionRequest, form_options(form, DeepfakeDetectionRequest))
+            return await detect_deepfake_upload(form_file(form, 'file'), options.fileType, options.explain)
+    options = binary_request(DeepfakeDetectionRequest, header_options(request, DeepfakeDetectionRequest),
+                             fileType=raw_file_type(request))
+    logger.info(f"Deepfake raw body received: fileType={options.fileType}")
+    if options.fileType == "image":
+        analysis_executor.check('image')
+        data = await read_body(request)
+        return await analysis_executor.run('image', deepfake_image_response, io.BytesIO(data), options.explain)
+    elif options.fileType == "video":
+        # Refuse before spooling the body when the video pool is already full
+        analysis_executor.check('video')
+        temp_path = await spool_body_to_file(request, body_suffix(request, '.mp4'))
+        try:
+            return await analysis_executor.run('video', deepfake_video_response, temp_path, options.explain)
+        finally:
+            remove_temp_file(temp_path)
+    else:
+        raise HTTPException(status_code=400, detail="Invalid fileType. Use 'image' or 'video'")
+
+
+@app.post("/api/deepfake/detect/upload", response_model=DeepfakeDetectionResponse)
+async def detect_deepfake_upload(file: UploadFile = File(...), fileType: str = Form("image"),
+                                 explain: bool = Form(False)):
+    """
+    Multipart variant of /api/deepfake/detect: the file is streamed to disk in chunks
+    instead of travelling as base64 inside JSON (fields: file, fileType, explain)
+    """
+    try:
+        logger.info(f"Deepfake upload received: fileType={fileType}, filename={file.filename}")
+        if fileType == "image":
+            check_upload(file)
+            return await analysis_executor.run('image', deepfake_image_response, file.file, explain)
+        elif fileType == "video":
+            logger.info("Processing video for deepfake detection")
+            # Refuse before spooling the upload when the video pool is already full
+            analysis_executor.check('video')
+            temp_path = await spool_to_file(file, upload_suffix(file, '.mp4'))
+            try:
+                logger.info(f"Video spooled to {temp_path}: {os.path.getsize(temp_path)} bytes")
+                return await analysis_executor.run('video', deepfake_video_response, temp_path, explain)
+            finally:
+                remove_temp_file(temp_path)
+        else:
+            raise HTTPException(status_code=400, detail="Invalid fileType. Use 'image' or 'video'")
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Deepfake upload detection error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
+    finally:
+        await file.close()
+
+
+@app.get("/api/deepfake/{analysis_id}/explain")
+async def explain_deepfake(analysis_id: str, methods: str = "ela,gradcam", format: Optional[str] = None,
+                           size: Optional[int] = None, quality: Optional[int] = None):
+    """
+    Render the heatmaps of an earlier deepfake analysis on demand
+    methods: comma-separated subset of ela, gradcam (videos: gradcam of the most suspicious frames)
+    format: png, jpeg or webp (default HEATMAP_FORMAT); quality: 1-100 for jpeg / webp (default HEATMAP_QUALITY)
+    size: longest side of the overlays in pixels (default HEATMAP_MAX_SIDE, 0 = as stored)
+    """
+    record = explanation_store.get(analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    image_format = EXPLAIN_FORMATS.get(format.lower()) if format else DEFAULT_HEATMAP_FORMAT
+    if image_format is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(EXPLAIN_FORMATS)}")
+    if quality is not None and not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be between 1 and 100")
+    requested = tuple(m.strip().lower() for m in methods.split(',') if m.strip())
+    unknown = [m for m in requested if m not in EXPLAIN_METHODS]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Unknown methods: {', '.join(unknown) or methods}. Use: {', '.join(EXPLAIN_METHODS)}")
+    if size is not None and (size < 0 or 0 < size < 16):
+        raise HTTPException(status_code=400, detail="size must be 0 or at least 16 pixels")
+    
+    heatmaps = await analysis_executor.run('image', render_explanation, record, requested, max_side=size,
+                                           image_format=image_format, quality=quality, analysis_id=analysis_id)
+    return FastJSONResponse({
+        "analysisId": analysis_id,
+        "kind": record['kind'],
+        "format": image_format,
+        "heatmaps": heatmaps
+    })
+
+
+def detect_voice_in_file(temp_path: str) -> VoiceDeepfakeDetectionResponse:
+    """
+    Load an audio file (converting it with pydub if librosa cannot read it) and run voice deepfake detection
+    """
+    try:
+        # Verify file was created and has content
+        if not os.path.exists(temp_path):
+            raise HTTPException(status_code=500, detail=f"Failed to create temporary audio file at: {temp_path}")
+        
+        if not os.path.isfile(temp_path):
+            raise HTTPException(status_code=500, detail=f"Temporary path is not a file: {temp_path}")
+        
+        file_size = os.path.getsize(temp_path)
+        logger.info(f"Saved audio to temp file: {temp_path} ({file_size} bytes)")
+        
+        if file_size == 0:
+            # Clean up empty file
+            try:
+                os.remove(temp_path)
+            except:
+                pass
+            raise HTTPException(status_code=400, detail="Audio file is empty (0 bytes). Please check the file and try again.")
+        
+        # Final verification - check file is readable
+        if not os.access(temp_path, os.R_OK):
+            raise HTTPException(status_code=500, detail=f"Temporary file is not readable: {temp_path}")
+        
+        # Try to load and convert if needed
+        audio_loaded = False
+        last_error_msg = None
+        
+        # Verify file one more time before processing
+        if not os.path.exists(temp_path):
+            raise HTTPException(status_code=500, detail=f"Temporary file disappeared: {temp_path}")
+        
+        try:
+            # Try loading with librosa (handles many formats)
+            if LIBROSA_AVAILABLE:
+                try:
+                    logger.info(f"Attempting librosa load from: {temp_path}")
+                    # Verify file exists and is readable
+                    if not os.path.exists(temp_path):
+                        raise Exception(f"File does not exist: {temp_path}")
+                    if not os.path.isfile(temp_path):
+                        raise Exception(f"Path is not a file: {temp_path}")
+                    if not os.access(temp_path, os.R_OK):
+                        raise Exception(f"File is not readable: {temp_path}")
+                    
+                    # Try loading with librosa - use absolute path for Windows
+                    abs_path = os.path.abspath(temp_path)
+                    logger.info(f"Loading with librosa from absolute path: {abs_path}")
+                    audio_array, sr = librosa.load(abs_path, sr=None, duration=60)
+                    if len(audio_array) > 0:
+                        logger.info(f"Loaded audio with librosa: {len(audio_array)} samples, {sr} Hz sample rate")
+                        # Save as WAV for consistent processing if soundfile is available
+                        if SOUNDFILE_AVAILABLE:
+                            try:
+                                import soundfile as sf
+                                sf.write(temp_path, audio_array, sr)
+                                logger.info("Converted audio to WAV format")
+                            except Exception as sf_error:
+                                logger.warning(f"Could not save as WAV: {sf_error}, continuing with original")
+                        audio_loaded = True
+                    else:
+                        raise Exception("Audio file is empty after loading")
+                except Exception as librosa_error:
+                    logger.warning(f"librosa load failed: {librosa_error}, trying pydub")
+                    raise librosa_error
+            else:
+                raise Exception("librosa not available")
+        except Exception as e:
+            logger.warning(f"librosa load failed: {e}, trying pydub")
+            # If librosa fails, try pydub
+            if not audio_loaded:
+                try:
+                    if PYDUB_AVAILABLE:
+                        from pydub import AudioSegment
+                        logger.info(f"Attempting pydub conversion from: {temp_path}")
+                        # Verify file exists before pydub
+                        if not os.path.exists(temp_path):
+                            raise Exception(f"File does not exist for pydub: {temp_path}")
+                        if not os.path.isfile(temp_path):
+                            raise Exception(f"Path is not a file for pydub: {temp_path}")
+                        
+                        # Load with pydub - use absolute path
+                        abs_path = os.path.abspath(temp_path)
+                        logger.info(f"Loading with pydub from absolute path: {abs_path}")
+                        audio = AudioSegment.from_file(abs_path)
+                        
+                        # Export to a new temp file first, then replace (safer for Windows)
+                        import tempfile as tf
+                        import uuid
+                        temp_wav_path = os.path.join(tf.gettempdir(), f"voice_audio_conv_{uuid.uuid4()}.wav")
+                        
+                        logger.info(f"Exporting converted audio to: {temp_wav_path}")
+                        audio.export(temp_wav_path, format="wav")
+                        
+                        # Wait for Windows file system
+                        import time
+                        time.sleep(0.3)
+                        
+                        # Verify converted file exists
+                        if os.path.exists(temp_wav_path) and os.path.getsize(temp_wav_path) > 0:
+                            # Replace original with converted
+                            if os.path.exists(temp_path):
+                                try:
+                                    os.remove(temp_path)
+                                    time.sleep(0.1)  # Wait after delete
+                                except Exception as rm_err:
+                                    logger.warning(f"Could not remove original temp file: {rm_err}")
+                            
+                            # Use absolute paths for rename
+                            abs_old = os.path.abspath(temp_path) if os.path.exists(temp_path) else None
+                            abs_new = os.path.abspath(temp_wav_path)
+                            
+                            if abs_old and os.path.exists(abs_old):
+                                os.remove(abs_old)
+                                time.sleep(0.1)
+                            
+                            os.rename(abs_new, abs_path)
+                            temp_path = abs_path  # Update to absolute path
+                            time.sleep(0.1)  # Wait after rename
+                            
+                            logger.info("Converted audio with pydub to WAV format")
+                            
+                            # After pydub conversion, try loading with librosa
+                            if LIBROSA_AVAILABLE:
+                                try:
+                                    if not os.path.exists(temp_path):
+                                        raise Exception(f"File missing after pydub conversion: {temp_path}")
+                                    # Use absolute path for librosa after pydub conversion
+                                    abs_path_after_conv = os.path.abspath(temp_path)
+                                    logger.info(f"Loading converted file with librosa: {abs_path_after_conv}")
+                                    audio_array, sr = librosa.load(abs_path_after_conv, sr=None, duration=60)
+                                    if len(audio_array) > 0:
+                                        logger.info(f"Successfully loaded after pydub conversion: {len(audio_array)} samples")
+                                        audio_loaded = True
+                                    else:
+                                        raise Exception("Audio still empty after pydub conversion")
+                                except Exception as load_error:
+                                    logger.error(f"Failed to load after pydub conversion: {load_error}")
+                                    raise Exception(f"pydub converted but librosa load failed: {str(load_error)}")
+                            else:
+                                audio_loaded = True  # pydub conversion succeeded, assume it's valid
+                        else:
+                            raise Exception("pydub conversion failed - output file not created or is empty")
+                    else:
+                        raise Exception("pydub not available")
+                except Exception as e2:
+                    logger.error(f"Audio conversion failed with pydub: {e2}")
+                    # pydub failed, but we already tried librosa, so this is the final error
+                    import traceback
+                    full_error = traceback.format_exc()
+                    logger.error(f"Full traceback: {full_error}")
+                    error_msg = str(e2)
+                    if len(error_msg) > 200:
+                        error_msg = error_msg[:200] + "..."
+                    error_detail = (
+                        f"Could not process audio file.\n\n"
+                        f"Tried:\n"
+                        f"1. librosa direct load\n"
+                        f"2. pydub conversion then librosa\n\n"
+                        f"Last error: {error_msg}\n\n"
+                        f"Please ensure:\n"
+                        f"- Audio file is not corrupted\n"
+                        f"- File format is supported (MP3, WAV, M4A, FLAC, OGG, AAC)\n"
+                        f"- File size is reasonable (< 50MB)\n"
+                        f"- Try converting to WAV format first"
+                    )
+                    raise HTTPException(status_code=400, detail=error_detail)
+        
+        if not audio_loaded:
+            # Check file size for more context
+            file_size_mb = os.path.getsize(temp_path) / (1024 * 1024) if os.path.exists(temp_path) else 0
+            error_detail = (
+                f"Could not load audio file.\n\n"
+                f"File size: {file_size_mb:.2f} MB\n"
+                f"File may be corrupted or in unsupported format.\n\n"
+                f"Supported formats: MP3, WAV, M4A, FLAC, OGG, AAC, AMR, 3GPP\n\n"
+                f"Please try:\n"
+                f"- Converting to WAV format\n"
+                f"- Using a different audio file\n"
+                f"- Checking if file is corrupted\n"
+                f"- Ensure file is a valid audio file"
+            )
+            raise HTTPException(status_code=400, detail=error_detail)
+        
+        logger.info("Starting voice deepfake detection...")
+        
+        # Convert to absolute path before passing to detection function
+        abs_temp_path = os.path.abspath(temp_path)
+        logger.info(f"Calling detection with absolute path: {abs_temp_path}")
+        
+        # Verify file still exists before detection
+        if not os.path.exists(abs_temp_path):
+            raise HTTPException(status_code=500, detail=f"Temp file disappeared before detection: {abs_temp_path}")
+        
+        # Call the internal implementation function (not the async endpoint)
+        try:
+            result = _detect_voice_deepfake_impl(abs_temp_path)
+        except Exception as impl_error:
+            logger.error(f"Detection implementation failed: {impl_error}", exc_info=True)
+            error_msg = str(impl_error)
+            if "librosa" in error_msg.lower() or "backend" in error_msg.lower():
+                raise HTTPException(
+                    status_code=503,
+                    detail="Audio processing error. Please ensure librosa and soundfile are installed: pip install librosa soundfile"
+                )
+            elif "not found" in error_msg.lower() or "does not exist" in error_msg.lower():
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Audio file error: {error_msg}"
+                )
+            else:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Voice detection failed: {error_msg}"
+                )
+        
+        # Verify result is a dict, not a coroutine
+        if not isinstance(result, dict):
+            logger.error(f"detect_voice_deepfake returned non-dict: {type(result)}")
+            raise HTTPException(status_code=500, detail=f"Internal error: detection function returned invalid type: {type(result)}")
+        
+        logger.info(f"Detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}")
+        record_verdict('voice', result.get('verdict'))
+        
+        # Clean up temp file
+        try:
+            if 'temp_path' in locals() and os.path.exists(temp_path):
+                os.remove(temp_path)
+                logger.info(f"Cleaned up temp file: {temp_path}")
+        except Exception as cleanup_error:
+            logger.warning(f"Failed to cleanup temp file: {cleanup_error}")
+        
+        return VoiceDeepfakeDetectionResponse(**result)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Clean up temp file on error
+        try:
+            if 'temp_path' in locals() and temp_path:
+                abs_cleanup_path = os.path.abspath(temp_path) if os.path.exists(temp_path) else temp_path
+                if os.path.exists(abs_cleanup_path):
+                    os.remove(abs_cleanup_path)
+                    logger.info(f"Cleaned up temp file after error: {abs_cleanup_path}")
+        except Exception as cleanup_error:
+            logger.warning(f"Failed to cleanup temp file after error: {cleanup_error}")
+        logger.error(f"Error processing audio: {e}", exc_info=True)
+        import traceback
+        error_trace = traceback.format_exc()
+        logger.error(f"Full traceback: {error_trace}")
+        
+        # Check if it's a coroutine error
+        error_str = str(e)
+        if 'coroutine' in error_str.lower():
+            error_detail = (
+                f"Audio processing error (code issue detected).\n\n"
+                f"Error: {error_str}\n\n"
+                f"This appears to be a code issue. Please:\n"
+                f"- Try a different audio file\n"
+                f"- Restart the ML service\n"
+                f"- Check ML service logs for details"
+            )
+        else:
+            error_detail = (
+                f"Invalid audio data: {error_str}\n\n"
+                f"Please ensure:\n"
+                f"- Audio file is not corrupted\n"
+                f"- File format is supported (MP3, WAV, M4A, FLAC, OGG, AAC)\n"
+                f"- File size is reasonable (< 50MB)"
+            )
+        raise HTTPException(status_code=400, detail=error_detail)
+
+
+def voice_detection_error(e: Exception) -> HTTPException:
+    """HTTP error for a failed voice detection (status chosen from the error message)"""
+    logger.error(f"Voice deepfake detection error: {e}", exc_info=True)
+    import traceback
+    error_trace = traceback.format_exc()
+    logger.error(f"Full traceback: {error_trace}")
+    
+    # Provide more helpful error messages and handle specific errors
+    error_message = str(e)
+    
+    # Check for specific error types
+    if "librosa" in error_message.lower():
+        detail = "Audio processing error: librosa is required but not available. Please install: pip install librosa soundfile"
+        return HTTPException(status_code=503, detail=detail)
+    elif "audio" in error_message.lower() and ("format" in error_message.lower() or "codec" in error_message.lower()):
+        detail = f"Unsupported audio format: {error_message}. Please convert to WAV, MP3, or M4A format."
+        return HTTPException(status_code=400, detail=detail)
+    elif "timeout" in error_message.lower():
+        detail = f"Processing timeout: {error_message}. Audio file may be too large or complex. Try a shorter audio file."
+        return HTTPException(status_code=408, detail=detail)
+    elif "file" in error_message.lower() and ("not found" in error_message.lower() or "does not exist" in error_message.lower()):
+        detail = f"Audio file error: {error_message}. Please ensure the file is valid and try again."
+        return HTTPException(status_code=400, detail=detail)
+    elif "memory" in error_message.lower() or "out of memory" in error_message.lower():
+        detail = f"Memory error: {error_message}. Audio file may be too large. Try a smaller file."
+        return HTTPException(status_code=413, detail=detail)
+    else:
+        # For unknown errors, provide generic message but don't expose internal details
+        detail = f"Voice detection failed. Please ensure the audio file is valid and try again. If the problem persists, check ML service logs."
+        logger.error(f"Unknown error in voice detection: {error_message}")
+        return HTTPException(status_code=500, detail=detail)
+
+
+def check_voice_available():
+    if not LIBROSA_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="Voice deepfake detection is not available. Please install librosa: pip install librosa soundfile"
+        )
+
+
+def voice_file_response(temp_path: str) -> VoiceDeepfakeDetectionResponse:
+    """Voice deepfake detection for an audio file, failures mapped by voice_detection_error (the caller removes the file)"""
+    try:
+        return detect_voice_in_file(temp_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise voice_detection_error(e)
+
+
+def detect_voice_deepfake_request(request: VoiceDeepfakeDetectionRequest) -> VoiceDeepfakeDetectionResponse:
     """
     Detect AI-generated deepfake voices and spam calls
     Uses multiple advanced audio analysis methods for maximum accuracy
+    (large recordings: prefer the multipart /api/voice/deepfake/detect/upload)
     """
     try:
         # Check if librosa is available
@@ -3243,6 +4254,9 @@ async def detect_voice_deepfake(request: VoiceDeepfakeDetectionRequest):
         
         # Decode base64 audio
         if request.format == "base64":
+            # 4 base64 characters per 3 bytes: refuse oversized files before decoding them
+            if len(request.audio) * 3 // 4 > UPLOAD_MAX_BYTES:
+                raise too_large(len(request.audio) * 3 // 4)
             try:
                 audio_data = base64.b64decode(request.audio)
                 logger.info(f"Decoded audio data: {len(audio_data)} bytes")
@@ -3275,308 +4289,216 @@ async def detect_voice_deepfake(request: VoiceDeepfakeDetectionRequest):
             # Wait for Windows file system to update
             time.sleep(0.2)
             
-            # Verify file was created and has content
-            if not os.path.exists(temp_path):
-                raise HTTPException(status_code=500, detail=f"Failed to create temporary audio file at: {temp_path}")
-            
-            if not os.path.isfile(temp_path):
-                raise HTTPException(status_code=500, detail=f"Temporary path is not a file: {temp_path}")
-            
-            file_size = os.path.getsize(temp_path)
-            logger.info(f"Saved audio to temp file: {temp_path} ({file_size} bytes)")
-            
-            if file_size == 0:
-                # Clean up empty file
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-                raise HTTPException(status_code=400, detail="Audio file is empty (0 bytes). Please check the file and try again.")
-            
-            # Final verification - check file is readable
-            if not os.access(temp_path, os.R_OK):
-                raise HTTPException(status_code=500, detail=f"Temporary file is not readable: {temp_path}")
-            
-            # Try to load and convert if needed
-            audio_loaded = False
-            last_error_msg = None
-            
-            # Verify file one more time before processing
-            if not os.path.exists(temp_path):
-                raise HTTPException(status_code=500, detail=f"Temporary file disappeared: {temp_path}")
-            
-            try:
-                # Try loading with librosa (handles many formats)
-                if LIBROSA_AVAILABLE:
-                    try:
-                        logger.info(f"Attempting librosa load from: {temp_path}")
-                        # Verify file exists and is readable
-                        if not os.path.exists(temp_path):
-                            raise Exception(f"File does not exist: {temp_path}")
-                        if not os.path.isfile(temp_path):
-                            raise Exception(f"Path is not a file: {temp_path}")
-                        if not os.access(temp_path, os.R_OK):
-                            raise Exception(f"File is not readable: {temp_path}")
-                        
-                        # Try loading with librosa - use absolute path for Windows
-                        abs_path = os.path.abspath(temp_path)
-                        logger.info(f"Loading with librosa from absolute path: {abs_path}")
-                        audio_array, sr = librosa.load(abs_path, sr=None, duration=60)
-                        if len(audio_array) > 0:
-                            logger.info(f"Loaded audio with librosa: {len(audio_array)} samples, {sr} Hz sample rate")
-                            # Save as WAV for consistent processing if soundfile is available
-                            if SOUNDFILE_AVAILABLE:
-                                try:
-                                    import soundfile as sf
-                                    sf.write(temp_path, audio_array, sr)
-                                    logger.info("Converted audio to WAV format")
-                                except Exception as sf_error:
-                                    logger.warning(f"Could not save as WAV: {sf_error}, continuing with original")
-                            audio_loaded = True
-                        else:
-                            raise Exception("Audio file is empty after loading")
-                    except Exception as librosa_error:
-                        logger.warning(f"librosa load failed: {librosa_error}, trying pydub")
-                        raise librosa_error
-                else:
-                    raise Exception("librosa not available")
-            except Exception as e:
-                logger.warning(f"librosa load failed: {e}, trying pydub")
-                # If librosa fails, try pydub
-                if not audio_loaded:
-                    try:
-                        if PYDUB_AVAILABLE:
-                            from pydub import AudioSegment
-                            logger.info(f"Attempting pydub conversion from: {temp_path}")
-                            # Verify file exists before pydub
-                            if not os.path.exists(temp_path):
-                                raise Exception(f"File does not exist for pydub: {temp_path}")
-                            if not os.path.isfile(temp_path):
-                                raise Exception(f"Path is not a file for pydub: {temp_path}")
-                            
-                            # Load with pydub - use absolute path
-                            abs_path = os.path.abspath(temp_path)
-                            logger.info(f"Loading with pydub from absolute path: {abs_path}")
-                            audio = AudioSegment.from_file(abs_path)
-                            
-                            # Export to a new temp file first, then replace (safer for Windows)
-                            import tempfile as tf
-                            import uuid
-                            temp_wav_path = os.path.join(tf.gettempdir(), f"voice_audio_conv_{uuid.uuid4()}.wav")
-                            
-                            logger.info(f"Exporting converted audio to: {temp_wav_path}")
-                            audio.export(temp_wav_path, format="wav")
-                            
-                            # Wait for Windows file system
-                            import time
-                            time.sleep(0.3)
-                            
-                            # Verify converted file exists
-                            if os.path.exists(temp_wav_path) and os.path.getsize(temp_wav_path) > 0:
-                                # Replace original with converted
-                                if os.path.exists(temp_path):
-                                    try:
-                                        os.remove(temp_path)
-                                        time.sleep(0.1)  # Wait after delete
-                                    except Exception as rm_err:
-                                        logger.warning(f"Could not remove original temp file: {rm_err}")
-                                
-                                # Use absolute paths for rename
-                                abs_old = os.path.abspath(temp_path) if os.path.exists(temp_path) else None
-                                abs_new = os.path.abspath(temp_wav_path)
-                                
-                                if abs_old and os.path.exists(abs_old):
-                                    os.remove(abs_old)
-                                    time.sleep(0.1)
-                                
-                                os.rename(abs_new, abs_path)
-                                temp_path = abs_path  # Update to absolute path
-                                time.sleep(0.1)  # Wait after rename
-                                
-                                logger.info("Converted audio with pydub to WAV format")
-                                
-                                # After pydub conversion, try loading with librosa
-                                if LIBROSA_AVAILABLE:
-                                    try:
-                                        if not os.path.exists(temp_path):
-                                            raise Exception(f"File missing after pydub conversion: {temp_path}")
-                                        # Use absolute path for librosa after pydub conversion
-                                        abs_path_after_conv = os.path.abspath(temp_path)
-                                        logger.info(f"Loading converted file with librosa: {abs_path_after_conv}")
-                                        audio_array, sr = librosa.load(abs_path_after_conv, sr=None, duration=60)
-                                        if len(audio_array) > 0:
-                                            logger.info(f"Successfully loaded after pydub conversion: {len(audio_array)} samples")
-                                            audio_loaded = True
-                                        else:
-                                            raise Exception("Audio still empty after pydub conversion")
-                                    except Exception as load_error:
-                                        logger.error(f"Failed to load after pydub conversion: {load_error}")
-                                        raise Exception(f"pydub converted but librosa load failed: {str(load_error)}")
-                                else:
-                                    audio_loaded = True  # pydub conversion succeeded, assume it's valid
-                            else:
-                                raise Exception("pydub conversion failed - output file not created or is empty")
-                        else:
-                            raise Exception("pydub not available")
-                    except Exception as e2:
-                        logger.error(f"Audio conversion failed with pydub: {e2}")
-                        # pydub failed, but we already tried librosa, so this is the final error
-                        import traceback
-                        full_error = traceback.format_exc()
-                        logger.error(f"Full traceback: {full_error}")
-                        error_msg = str(e2)
-                        if len(error_msg) > 200:
-                            error_msg = error_msg[:200] + "..."
-                        error_detail = (
-                            f"Could not process audio file.\n\n"
-                            f"Tried:\n"
-                            f"1. librosa direct load\n"
-                            f"2. pydub conversion then librosa\n\n"
-                            f"Last error: {error_msg}\n\n"
-                            f"Please ensure:\n"
-                            f"- Audio file is not corrupted\n"
-                            f"- File format is supported (MP3, WAV, M4A, FLAC, OGG, AAC)\n"
-                            f"- File size is reasonable (< 50MB)\n"
-                            f"- Try converting to WAV format first"
-                        )
-                        raise HTTPException(status_code=400, detail=error_detail)
-            
-            if not audio_loaded:
-                # Check file size for more context
-                file_size_mb = os.path.getsize(temp_path) / (1024 * 1024) if os.path.exists(temp_path) else 0
-                error_detail = (
-                    f"Could not load audio file.\n\n"
-                    f"File size: {file_size_mb:.2f} MB\n"
-                    f"File may be corrupted or in unsupported format.\n\n"
-                    f"Supported formats: MP3, WAV, M4A, FLAC, OGG, AAC, AMR, 3GPP\n\n"
-                    f"Please try:\n"
-                    f"- Converting to WAV format\n"
-                    f"- Using a different audio file\n"
-                    f"- Checking if file is corrupted\n"
-                    f"- Ensure file is a valid audio file"
-                )
-                raise HTTPException(status_code=400, detail=error_detail)
-            
-            logger.info("Starting voice deepfake detection...")
-            
-            # Convert to absolute path before passing to detection function
-            abs_temp_path = os.path.abspath(temp_path)
-            logger.info(f"Calling detection with absolute path: {abs_temp_path}")
-            
-            # Verify file still exists before detection
-            if not os.path.exists(abs_temp_path):
-                raise HTTPException(status_code=500, detail=f"Temp file disappeared before detection: {abs_temp_path}")
-            
-            # Call the internal implementation function (not the async endpoint)
-            try:
-                result = _detect_voice_deepfake_impl(abs_temp_path)
-            except Exception as impl_error:
-                logger.error(f"Detection implementation failed: {impl_error}", exc_info=True)
-                error_msg = str(impl_error)
-                if "librosa" in error_msg.lower() or "backend" in error_msg.lower():
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Audio processing error. Please ensure librosa and soundfile are installed: pip install librosa soundfile"
-                    )
-                elif "not found" in error_msg.lower() or "does not exist" in error_msg.lower():
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Audio file error: {error_msg}"
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Voice detection failed: {error_msg}"
-                    )
-            
-            # Verify result is a dict, not a coroutine
-            if not isinstance(result, dict):
-                logger.error(f"detect_voice_deepfake returned non-dict: {type(result)}")
-                raise HTTPException(status_code=500, detail=f"Internal error: detection function returned invalid type: {type(result)}")
-            
-            logger.info(f"Detection complete: verdict={result.get('verdict')}, score={result.get('deepfakeScore')}")
-            
-            # Clean up temp file
-            try:
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    os.remove(temp_path)
-                    logger.info(f"Cleaned up temp file: {temp_path}")
-            except Exception as cleanup_error:
-                logger.warning(f"Failed to cleanup temp file: {cleanup_error}")
-            
-            return VoiceDeepfakeDetectionResponse(**result)
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            # Clean up temp file on error
-            try:
-                if 'temp_path' in locals() and temp_path:
-                    abs_cleanup_path = os.path.abspath(temp_path) if os.path.exists(temp_path) else temp_path
-                    if os.path.exists(abs_cleanup_path):
-                        os.remove(abs_cleanup_path)
-                        logger.info(f"Cleaned up temp file after error: {abs_cleanup_path}")
-            except Exception as cleanup_error:
-                logger.warning(f"Failed to cleanup temp file after error: {cleanup_error}")
-            logger.error(f"Error processing audio: {e}", exc_info=True)
-            import traceback
-            error_trace = traceback.format_exc()
-            logger.error(f"Full traceback: {error_trace}")
-            
-            # Check if it's a coroutine error
-            error_str = str(e)
-            if 'coroutine' in error_str.lower():
-                error_detail = (
-                    f"Audio processing error (code issue detected).\n\n"
-                    f"Error: {error_str}\n\n"
-                    f"This appears to be a code issue. Please:\n"
-                    f"- Try a different audio file\n"
-                    f"- Restart the ML service\n"
-                    f"- Check ML service logs for details"
-                )
-            else:
-                error_detail = (
-                    f"Invalid audio data: {error_str}\n\n"
-                    f"Please ensure:\n"
-                    f"- Audio file is not corrupted\n"
-                    f"- File format is supported (MP3, WAV, M4A, FLAC, OGG, AAC)\n"
-                    f"- File size is reasonable (< 50MB)"
-                )
-            raise HTTPException(status_code=400, detail=error_detail)
+            return detect_voice_in_file(temp_path)
+        finally:
+            remove_temp_file(temp_path)
             
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Voice deepfake detection error: {e}", exc_info=True)
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(f"Full traceback: {error_trace}")
+        raise voice_detection_error(e)
+
+
+@app.post("/api/voice/deepfake/detect", response_model=VoiceDeepfakeDetectionResponse,
+          openapi_extra=request_body_docs(VoiceDeepfakeDetectionRequest, 'audio'))
+async def detect_voice_deepfake(request: Request):
+    """
+    Detect AI-generated deepfake voices and spam calls (see detect_voice_deepfake_request)
+    Body: VoiceDeepfakeDetectionRequest as JSON (base64 audio); multipart with the file in "audio";
+    or the audio itself (application/octet-stream, audio/*)
+    """
+    kind = body_kind(request)
+    if kind == 'json':
+        return await analysis_executor.run('voice', detect_voice_deepfake_request,
+                                           await json_request(request, VoiceDeepfakeDetectionRequest))
+    if kind == 'multipart':
+        async with request.form() as form:
+            return await detect_voice_deepfake_upload(form_file(form, 'audio'))
+    check_voice_available()
+    analysis_executor.check('voice')
+    temp_path = await spool_body_to_file(request, body_suffix(request, '.wav'))
+    try:
+        logger.info(f"Audio body spooled to {temp_path}: {os.path.getsize(temp_path)} bytes")
+        return await analysis_executor.run('voice', voice_file_response, temp_path)
+    finally:
+        remove_temp_file(temp_path)
+
+
+@app.post("/api/voice/deepfake/detect/upload", response_model=VoiceDeepfakeDetectionResponse)
+async def detect_voice_deepfake_upload(audio: UploadFile = File(...)):
+    """
+    Multipart variant of /api/voice/deepfake/detect: the audio is streamed to disk in chunks
+    instead of travelling as base64 inside JSON (field: audio)
+    """
+    temp_path = None
+    try:
+        if not LIBROSA_AVAILABLE:
+            logger.error("librosa is not available. Voice detection requires librosa.")
+            raise HTTPException(
+                status_code=503,
+                detail="Voice deepfake detection is not available. Please install librosa: pip install librosa soundfile"
+            )
         
-        # Provide more helpful error messages and handle specific errors
-        error_message = str(e)
-        
-        # Check for specific error types
-        if "librosa" in error_message.lower():
-            detail = "Audio processing error: librosa is required but not available. Please install: pip install librosa soundfile"
-            raise HTTPException(status_code=503, detail=detail)
-        elif "audio" in error_message.lower() and ("format" in error_message.lower() or "codec" in error_message.lower()):
-            detail = f"Unsupported audio format: {error_message}. Please convert to WAV, MP3, or M4A format."
-            raise HTTPException(status_code=400, detail=detail)
-        elif "timeout" in error_message.lower():
-            detail = f"Processing timeout: {error_message}. Audio file may be too large or complex. Try a shorter audio file."
-            raise HTTPException(status_code=408, detail=detail)
-        elif "file" in error_message.lower() and ("not found" in error_message.lower() or "does not exist" in error_message.lower()):
-            detail = f"Audio file error: {error_message}. Please ensure the file is valid and try again."
-            raise HTTPException(status_code=400, detail=detail)
-        elif "memory" in error_message.lower() or "out of memory" in error_message.lower():
-            detail = f"Memory error: {error_message}. Audio file may be too large. Try a smaller file."
-            raise HTTPException(status_code=413, detail=detail)
-        else:
-            # For unknown errors, provide generic message but don't expose internal details
-            detail = f"Voice detection failed. Please ensure the audio file is valid and try again. If the problem persists, check ML service logs."
-            logger.error(f"Unknown error in voice detection: {error_message}")
-            raise HTTPException(status_code=500, detail=detail)
+        # Refuse before spooling the upload when the voice pool is already full
+        analysis_executor.check('voice')
+        temp_path = await spool_to_file(audio, upload_suffix(audio, '.wav'))
+        logger.info(f"Audio upload spooled to {temp_path}: {os.path.getsize(temp_path)} bytes")
+        return await analysis_executor.run('voice', detect_voice_in_file, temp_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise voice_detection_error(e)
+    finally:
+        remove_temp_file(temp_path)
+        await audio.close()
+
+
+
+# ===== ASYNCHRONOUS JOBS =====
+
+def check_deepfake_job(file_type: str, webhook: Optional[str]):
+    if file_type not in ("image", "video"):
+        raise HTTPException(status_code=400, detail="Invalid fileType. Use 'image' or 'video'")
+    check_webhook(webhook)
+
+
+def check_voice_job(webhook: Optional[str]):
+    check_voice_available()
+    check_webhook(webhook)
+
+
+def job_response(job, created: bool) -> FastJSONResponse:
+    """202 with the job's state; a deduplicated submission returns the earlier job"""
+    return FastJSONResponse(status_code=202, content={**job.to_dict(), "deduplicated": not created},
+                             headers={"Location": f"/api/jobs/{job.id}"})
+
+
+def submit_deepfake_job(temp_path: str, digest: str, file_type: str, explain: bool,
+                        webhook: Optional[str]) -> FastJSONResponse:
+    """Start deepfake detection of a spooled file as a job (the job removes the file)"""
+    if file_type == "video":
+        workload, fn = 'video', deepfake_video_response
+    else:
+        workload, fn = 'image', deepfake_image_response
+    job, created = job_store.submit(f"deepfake-{file_type}", workload, fn, (temp_path, explain),
+                                    key=f"deepfake-{file_type}:{digest}:{explain}", webhook=webhook,
+                                    cleanup=functools.partial(remove_temp_file, temp_path))
+    return job_response(job, created)
+
+
+def submit_voice_job(temp_path: str, digest: str, webhook: Optional[str]) -> FastJSONResponse:
+    """Start voice deepfake detection of a spooled file as a job (the job removes the file)"""
+    job, created = job_store.submit("voice", 'voice', voice_file_response, (temp_path,), key=f"voice:{digest}",
+                                    webhook=webhook, cleanup=functools.partial(remove_temp_file, temp_path))
+    return job_response(job, created)
+
+
+@app.post("/api/jobs/deepfake", status_code=202, openapi_extra=request_body_docs(DeepfakeJobRequest, 'file'))
+async def submit_deepfake_job_request(request: Request):
+    """
+    Deepfake detection as a job: returns a jobId at once (poll GET /api/jobs/{jobId}, or pass a webhook)
+    Resubmitting the same file with the same options returns the existing job
+    Body: as /api/deepfake/detect (JSON, multipart or raw), plus webhook (field or X-Webhook header)
+    """
+    kind = body_kind(request)
+    if kind == 'multipart':
+        async with request.form() as form:
+            options = binary_request(DeepfakeJobRequest, form_options(form, DeepfakeJobRequest))
+            return await submit_deepfake_job_upload(form_file(form, 'file'), options.fileType, options.explain,
+                                                    options.webhook)
+    if kind == 'raw':
+        options = binary_request(DeepfakeJobRequest, header_options(request, DeepfakeJobRequest),
+                                 fileType=raw_file_type(request))
+        check_deepfake_job(options.fileType, options.webhook)
+        job_store.check()
+        digest = hashlib.sha256()
+        temp_path = await spool_body_to_file(request, body_suffix(request, '.mp4' if options.fileType == "video" else '.img'),
+                                             digest=digest)
+        return submit_deepfake_job(temp_path, digest.hexdigest(), options.fileType, options.explain, options.webhook)
+    request = await json_request(request, DeepfakeJobRequest)
+    check_deepfake_job(request.fileType, request.webhook)
+    if not request.file:
+        raise HTTPException(status_code=400, detail="No file provided")
+    if request.format != "base64":
+        raise HTTPException(status_code=400, detail="Unsupported format. Use base64")
+    job_store.check()
+    suffix = '.mp4' if request.fileType == "video" else '.img'
+    temp_path, digest = await asyncio.get_running_loop().run_in_executor(None, decode_to_file, request.file, suffix)
+    return submit_deepfake_job(temp_path, digest, request.fileType, request.explain, request.webhook)
+
+
+@app.post("/api/jobs/deepfake/upload", status_code=202)
+async def submit_deepfake_job_upload(file: UploadFile = File(...), fileType: str = Form("image"),
+                                     explain: bool = Form(False), webhook: Optional[str] = Form(None)):
+    """Multipart variant of /api/jobs/deepfake (fields: file, fileType, explain, webhook)"""
+    try:
+        check_deepfake_job(fileType, webhook)
+        job_store.check()
+        digest = hashlib.sha256()
+        temp_path = await spool_to_file(file, upload_suffix(file, '.mp4' if fileType == "video" else '.img'),
+                                        digest=digest)
+    finally:
+        await file.close()
+    return submit_deepfake_job(temp_path, digest.hexdigest(), fileType, explain, webhook)
+
+
+@app.post("/api/jobs/voice", status_code=202, openapi_extra=request_body_docs(VoiceDeepfakeJobRequest, 'audio'))
+async def submit_voice_job_request(request: Request):
+    """Voice deepfake detection as a job (see /api/jobs/deepfake; body as /api/voice/deepfake/detect plus webhook)"""
+    kind = body_kind(request)
+    if kind == 'multipart':
+        async with request.form() as form:
+            options = binary_request(VoiceDeepfakeJobRequest, form_options(form, VoiceDeepfakeJobRequest), audio="")
+            return await submit_voice_job_upload(form_file(form, 'audio'), options.webhook)
+    if kind == 'raw':
+        options = binary_request(VoiceDeepfakeJobRequest, header_options(request, VoiceDeepfakeJobRequest), audio="")
+        check_voice_job(options.webhook)
+        job_store.check()
+        digest = hashlib.sha256()
+        temp_path = await spool_body_to_file(request, body_suffix(request, '.wav'), digest=digest)
+        return submit_voice_job(temp_path, digest.hexdigest(), options.webhook)
+    request = await json_request(request, VoiceDeepfakeJobRequest)
+    check_voice_job(request.webhook)
+    if not request.audio:
+        raise HTTPException(status_code=400, detail="No audio provided")
+    if request.format != "base64":
+        raise HTTPException(status_code=400, detail="Unsupported format. Use base64")
+    job_store.check()
+    temp_path, digest = await asyncio.get_running_loop().run_in_executor(None, decode_to_file, request.audio, '.wav')
+    return submit_voice_job(temp_path, digest, request.webhook)
+
+
+@app.post("/api/jobs/voice/upload", status_code=202)
+async def submit_voice_job_upload(audio: UploadFile = File(...), webhook: Optional[str] = Form(None)):
+    """Multipart variant of /api/jobs/voice (fields: audio, webhook)"""
+    try:
+        check_voice_job(webhook)
+        job_store.check()
+        digest = hashlib.sha256()
+        temp_path = await spool_to_file(audio, upload_suffix(audio, '.wav'), digest=digest)
+    finally:
+        await audio.close()
+    return submit_voice_job(temp_path, digest.hexdigest(), webhook)
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status (queued, running, succeeded, failed, cancelled), progress, and the result or error of a job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    # Rendered directly: a finished job's result (heatmaps included) skips jsonable_encoder
+    return FastJSONResponse(job.to_dict())
+
 
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job (a running analysis stops at its next checkpoint)"""
+    job = job_store.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    # Rendered directly: a finished job's result (heatmaps included) skips jsonable_encoder
+    return FastJSONResponse(job.to_dict())
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,252 @@
+"""
+Prometheus Metrics
+GET /metrics exposes the service in the Prometheus text format (0.0.4) without a client library:
+per-stage latency histograms fed by timed / stage_timer, HTTP request counts and latency by endpoint,
+verdict counts, and gauges read at scrape time from the stats() of the service singletons.
+With METRICS_ENABLED off, timed returns the function itself and stage_timer a shared no-op,
+so instrumented code pays nothing. Stages run in worker processes (EXEC_VOICE_MODE=process) are not seen.
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from service_config import METRICS_ENABLED
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds: OCR passes and FFTs take milliseconds, video analyses tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List['_Metric'] = []
+_collectors: List[Callable[[], Iterable[tuple]]] = []
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux /proc), None where unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if isinstance(value, (bool, int)) else repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            lines.extend(self._samples(labels, values))
+        return lines
+
+    def _samples(self, labels: Tuple, values: list) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination (name should end in _total)"""
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            values = self._series.setdefault(labels, [0])
+            values[0] += amount
+
+    def _samples(self, labels: Tuple, values: list) -> List[str]:
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(values[0])}']
+
+
+class Histogram(_Metric):
+    """Observations per label combination in cumulative buckets, with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        # One slot per bucket plus +Inf, then the sum
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._series.get(labels)
+            if values is None:
+                values = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[slot] += 1
+            values[-1] += value
+
+    def _samples(self, labels: Tuple, values: list) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(values[-1])}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('ml_stage_seconds', 'Duration of analysis stages', ('stage',))
+REQUESTS = Counter('ml_http_requests_total', 'HTTP requests by endpoint and status', ('method', 'endpoint', 'status'))
+REQUEST_SECONDS = Histogram('ml_http_request_seconds', 'Time to the response headers by endpoint',
+                            ('method', 'endpoint'))
+VERDICTS = Counter('ml_verdicts_total', 'Analysis results by analysis and verdict', ('analysis', 'verdict'))
+
+
+class _StageTimer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.stage)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage_timer(stage: str):
+    """Context manager recording the duration of its block under stage (a shared no-op when disabled)"""
+    return _StageTimer(stage) if METRICS_ENABLED else _NO_TIMER
+
+
+def timed(stage: str):
+    """Decorator recording each call's duration under stage (returns the function unchanged when disabled)"""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+        return wrapper
+    return decorate
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a duration the caller measured itself"""
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+def record_verdict(analysis: str, verdict: Optional[str]):
+    VERDICTS.inc(analysis, verdict or 'unknown')
+
+
+def register_collector(collect: Callable[[], Iterable[tuple]]):
+    """
+    Add a scrape-time source of metric families
+    collect() yields (name, kind, documentation, [(labels dict, value), ...]); kind is gauge or counter
+    """
+    _collectors.append(collect)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests by method, route template (not the raw path) and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_counted(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                REQUEST_SECONDS.observe(time.perf_counter() - started, scope['method'], _endpoint(scope))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            REQUESTS.inc(scope['method'], _endpoint(scope), str(status))
+
+
+def _endpoint(scope: Dict) -> str:
+    # The router stores the matched route in the scope; unmatched paths share one label
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+def _process_families() -> Iterable[tuple]:
+    rss = rss_bytes()
+    if rss is not None:
+        yield 'process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes', [({}, rss)]
+    times = os.times()
+    yield 'process_cpu_seconds_total', 'counter', 'User and system CPU time in seconds', [({}, times.user + times.system)]
+    yield 'process_threads', 'gauge', 'Threads of the service process', [({}, threading.active_count())]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in [_process_families] + _collectors:
+        for name, kind, documentation, samples in collect():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+    return '\n'.join(lines) + '\n'
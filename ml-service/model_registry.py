@@ -0,0 +1,179 @@
+"""
+Deep Learning Model Registry
+Builds (or loads) each model once per process, warms it up with a dummy batch and exposes a
+compiled inference function with a fixed input signature. Load time and memory are reported in /health.
+Builders return either a Keras model (compiled with tf.function here) or a lightweight runner from
+inference_backends (TFLite / ONNX Runtime) that brings its own run().
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from metrics import rss_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """
+    A ready-to-serve model: the loaded model (Keras model or backend runner)
+    plus its compiled, warmed-up inference function
+    """
+
+    def __init__(self, name: str, model, predict_fn: Callable, input_shape: Tuple[int, ...],
+                 load_time: float, warmup_time: float, rss_delta: Optional[int]):
+        self.name = name
+        self.model = model
+        self.predict_fn = predict_fn
+        self.input_shape = tuple(input_shape)
+        self.load_time = load_time
+        self.warmup_time = warmup_time
+        self.rss_delta = rss_delta
+        self.backend = getattr(model, 'backend', 'tensorflow')
+        if self.backend == 'tensorflow':
+            self.parameters = int(model.count_params())
+            # Keras 3 reports dtypes as strings, tf.keras as tf.DType
+            self.weight_bytes = int(sum(
+                np.prod(w.shape) * np.dtype(getattr(w.dtype, 'as_numpy_dtype', w.dtype)).itemsize
+                for w in model.weights
+            ))
+        else:
+            self.parameters = model.parameters
+            self.weight_bytes = model.weight_bytes
+        self.calls = 0
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    @property
+    def keras_model(self):
+        """The Keras model (Grad-CAM needs its layers); None for TFLite / ONNX backends"""
+        return self.model if self.backend == 'tensorflow' else None
+
+    def derive(self, key: str, compute: Callable):
+        """Build a per-model helper (e.g. the Grad-CAM gradient model) once and reuse it"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = compute()
+        return value
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Run the compiled inference function on a float32 batch of shape (n, *input_shape)"""
+        self.calls += 1
+        outputs = self.predict_fn(np.ascontiguousarray(batch, dtype=np.float32))
+        return outputs.numpy() if hasattr(outputs, 'numpy') else np.asarray(outputs)
+
+    def stats(self) -> dict:
+        return {
+            'status': 'ready',
+            'backend': self.backend,
+            'input_shape': list(self.input_shape),
+            'parameters': self.parameters,
+            'weights_mb': round(self.weight_bytes / 2 ** 20, 1),
+            'rss_delta_mb': round(self.rss_delta / 2 ** 20, 1) if self.rss_delta is not None else None,
+            'load_time': round(self.load_time, 3),
+            'warmup_time': round(self.warmup_time, 3),
+            'calls': self.calls,
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide models, each built on first use (or at startup) exactly once
+    Concurrent first requests wait for the one load in progress instead of building their own copy.
+    A failed load is remembered so later requests fall back to rule-based methods immediately.
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Tuple[Callable, Tuple[int, ...]]] = {}
+        self._models: Dict[str, LoadedModel] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable, input_shape: Tuple[int, ...]):
+        """
+        builder() returns a Keras model or backend runner taking (n, *input_shape) float32 batches,
+        or None if unavailable
+        """
+        with self._lock:
+            self._builders[name] = (builder, tuple(input_shape))
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Optional[LoadedModel]:
+        """The loaded model, loading it on first call; None if it could not be built"""
+        loaded = self._models.get(name)
+        if loaded is not None or name in self._errors:
+            return loaded
+        if name not in self._builders:
+            raise KeyError(f"Unknown model: {name}")
+        with self._locks[name]:
+            if name not in self._models and name not in self._errors:
+                self._load(name)
+        return self._models.get(name)
+
+    def _load(self, name: str):
+        builder, input_shape = self._builders[name]
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            model = builder()
+            if model is None:
+                self._errors[name] = 'unavailable'
+                return
+            predict_fn = self._compile(model, input_shape)
+            load_time = time.perf_counter() - start
+
+            # The first call traces the graph; pay for it here rather than in a request
+            start = time.perf_counter()
+            predict_fn(np.zeros((1, *input_shape), dtype=np.float32))
+            warmup_time = time.perf_counter() - start
+
+            rss_after = rss_bytes()
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            loaded = LoadedModel(name, model, predict_fn, input_shape, load_time, warmup_time, rss_delta)
+        except Exception as e:
+            logger.warning(f"Could not load model '{name}': {e}")
+            self._errors[name] = str(e)
+            return
+
+        self._models[name] = loaded
+        logger.info(f"Model '{name}' ready: loaded in {load_time:.2f}s, warmed up in {warmup_time:.2f}s")
+
+    @staticmethod
+    def _compile(model, input_shape: Tuple[int, ...]) -> Callable:
+        """Inference-mode graph function with a fixed signature (any batch size, float32)"""
+        if hasattr(model, 'run'):
+            # TFLite / ONNX runner: already a compiled graph
+            return model.run
+
+        import tensorflow as tf
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, *input_shape), dtype=tf.float32)])
+        def predict_fn(images):
+            return model(images, training=False)
+
+        return predict_fn
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def stats(self) -> dict:
+        stats = {}
+        for name in self._builders:
+            if name in self._models:
+                stats[name] = self._models[name].stats()
+            elif name in self._errors:
+                stats[name] = {'status': 'failed', 'error': self._errors[name]}
+            else:
+                stats[name] = {'status': 'lazy'}
+        return stats
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,590 @@
+"""
+OCR Engine for Transaction Screenshots
+Runs the Tesseract preprocessing variants concurrently under a per-request time budget,
+on a pool of long-lived Tesseract engines when the C-API binding is installed,
+and only over the detected text blocks rather than the whole frame
+"""
+
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from metrics import observe_stage, timed
+from service_config import (
+    OCR_BACKEND,
+    OCR_CASCADE_MIN_CONFIDENCE,
+    OCR_CASCADE_MIN_FIELDS,
+    OCR_ENGINE_PROFILE,
+    OCR_MAX_WORKERS,
+    OCR_MIN_TEXT_HEIGHT,
+    OCR_PARALLEL,
+    OCR_SMALL_TEXT_HEIGHT,
+    OCR_STRATEGY,
+    OCR_TESSDATA_FAST_PATH,
+    OCR_TESSDATA_PATH,
+    OCR_TEXT_REGION_MAX_COVERAGE,
+    OCR_TEXT_REGIONS,
+    OCR_TIME_BUDGET,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+    logger.warning("OpenCV not available - OCR preprocessing variants disabled")
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+OCR_LANG = 'eng'
+OCR_PSM = 6
+
+# Engine profiles: OCR engine mode plus the traineddata directory to load
+ENGINE_PROFILES = {
+    'default': {'oem': 3, 'tessdata': OCR_TESSDATA_PATH},  # Tesseract picks (LSTM when available)
+    'lstm': {'oem': 1, 'tessdata': OCR_TESSDATA_PATH},  # LSTM-only engine
+    'fast': {'oem': 1, 'tessdata': OCR_TESSDATA_FAST_PATH or OCR_TESSDATA_PATH},  # LSTM-only, tessdata_fast models
+}
+
+
+# ===== OCR BACKENDS =====
+
+def _text_from_data(data: dict) -> str:
+    """Rebuild plain text (one line per OCR line, blank line between blocks) from image_to_data output"""
+    lines: List[str] = []
+    current_line = None
+    current_block = None
+    for i, word in enumerate(data['text']):
+        word = str(word).strip()
+        if not word:
+            continue
+        block = data['block_num'][i]
+        line_key = (block, data['par_num'][i], data['line_num'][i])
+        if line_key != current_line:
+            if current_block is not None and block != current_block:
+                lines.append('')
+            lines.append(word)
+            current_line, current_block = line_key, block
+        else:
+            lines[-1] += ' ' + word
+    return '\n'.join(lines)
+
+
+class PytesseractBackend:
+    """
+    Spawns one tesseract process per call (pytesseract)
+    Supports a hard per-call timeout because the process can be killed
+    """
+    name = 'pytesseract'
+
+    def __init__(self, profile: str = 'default'):
+        self.profile = profile
+        settings = ENGINE_PROFILES.get(profile, ENGINE_PROFILES['default'])
+        self._base_config = f"--oem {settings['oem']}"
+        if settings['tessdata']:
+            self._base_config += f' --tessdata-dir "{settings["tessdata"]}"'
+
+    def image_to_string(self, image, psm: int = OCR_PSM, timeout: float = 0) -> str:
+        config = f"{self._base_config} --psm {psm}"
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config=config, timeout=timeout)
+
+    def recognize(self, image, psm: int = OCR_PSM, timeout: float = 0) -> Tuple[str, List[float]]:
+        """OCR text plus word-level confidences (0-100) from a single tesseract run"""
+        config = f"{self._base_config} --psm {psm}"
+        data = pytesseract.image_to_data(image, lang=OCR_LANG, config=config, timeout=timeout,
+                                         output_type=pytesseract.Output.DICT)
+        confidences = [
+            float(conf) for conf, word in zip(data['conf'], data['text'])
+            if str(word).strip() and float(conf) >= 0
+        ]
+        return _text_from_data(data), confidences
+
+    def stats(self) -> dict:
+        return {'backend': self.name, 'profile': self.profile, 'pool_size': 0}
+
+
+class TesserocrEnginePool:
+    """
+    Pool of long-lived Tesseract engines (tesserocr C-API binding)
+    Each engine loads the traineddata once; calls borrow an engine and release the GIL while recognizing
+    """
+    name = 'tesserocr'
+
+    def __init__(self, size: int, profile: str = 'default'):
+        self.profile = profile
+        self.size = size
+        settings = ENGINE_PROFILES.get(profile, ENGINE_PROFILES['default'])
+        self._oem = tesserocr.OEM(settings['oem'])
+        self._path = settings['tessdata']
+        self._engines = queue.Queue()
+        start = time.perf_counter()
+        for _ in range(size):
+            self._engines.put(self._create_engine())
+        self.load_time = time.perf_counter() - start
+        logger.info(f"Tesseract engine pool ready: {size} engine(s), profile={profile}, loaded in {self.load_time:.2f}s")
+
+    def _create_engine(self):
+        kwargs = {'lang': OCR_LANG, 'oem': self._oem, 'psm': tesserocr.PSM(OCR_PSM)}
+        if self._path:
+            kwargs['path'] = self._path
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    @contextmanager
+    def _engine(self):
+        engine = self._engines.get()
+        try:
+            yield engine
+        finally:
+            engine.Clear()
+            self._engines.put(engine)
+
+    def image_to_string(self, image, psm: int = OCR_PSM, timeout: float = 0) -> str:
+        # In-process recognition cannot be interrupted; the caller's budget still bounds how long it waits
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        with self._engine() as engine:
+            engine.SetPageSegMode(tesserocr.PSM(psm))
+            engine.SetImage(image)
+            return engine.GetUTF8Text()
+
+    def recognize(self, image, psm: int = OCR_PSM, timeout: float = 0) -> Tuple[str, List[float]]:
+        """OCR text plus word-level confidences (0-100) from a single recognition pass"""
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        with self._engine() as engine:
+            engine.SetPageSegMode(tesserocr.PSM(psm))
+            engine.SetImage(image)
+            text = engine.GetUTF8Text()
+            return text, [float(conf) for conf in engine.AllWordConfidences()]
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.name,
+            'profile': self.profile,
+            'pool_size': self.size,
+            'idle_engines': self._engines.qsize(),
+            'load_time': round(self.load_time, 3),
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend():
+    """Process-wide OCR backend selected by OCR_BACKEND ('auto', 'tesserocr' or 'pytesseract')"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                profile = OCR_ENGINE_PROFILE if OCR_ENGINE_PROFILE in ENGINE_PROFILES else 'default'
+                if OCR_BACKEND in ('auto', 'tesserocr') and TESSEROCR_AVAILABLE:
+                    try:
+                        _backend = TesserocrEnginePool(OCR_MAX_WORKERS, profile)
+                    except Exception as e:
+                        logger.warning(f"Could not start Tesseract engine pool: {e}. Falling back to pytesseract.")
+                elif OCR_BACKEND == 'tesserocr':
+                    logger.warning("OCR_BACKEND=tesserocr but tesserocr is not installed. Falling back to pytesseract.")
+                if _backend is None:
+                    _backend = PytesseractBackend(profile)
+    return _backend
+
+
+def ocr_image_to_string(image, psm: int = OCR_PSM, timeout: float = 0) -> str:
+    """OCR a PIL image or numpy array with the configured backend"""
+    return get_ocr_backend().image_to_string(image, psm=psm, timeout=timeout)
+
+
+# ===== PREPROCESSING VARIANTS =====
+
+def _otsu(gray: np.ndarray) -> np.ndarray:
+    # Grayscale + OTSU thresholding (original)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+def _adaptive(gray: np.ndarray) -> np.ndarray:
+    # Adaptive thresholding (better for varying lighting)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+
+def _denoised(gray: np.ndarray) -> np.ndarray:
+    # Denoised + thresholded (better for screenshots)
+    denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+    _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+def _grayscale(gray: np.ndarray) -> np.ndarray:
+    # Original grayscale (sometimes works better)
+    return gray
+
+
+def _upscaled(gray: np.ndarray) -> np.ndarray:
+    # Upscaled image (better for small text)
+    scale_factor = 2
+    height, width = gray.shape[:2]
+    upscaled = cv2.resize(gray, (width * scale_factor, height * scale_factor), interpolation=cv2.INTER_CUBIC)
+    _, thresh = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+# Order matches the historical sequential pipeline
+OCR_VARIANTS: List[Tuple[str, Callable[[np.ndarray], np.ndarray]]] = [
+    ('otsu', _otsu),
+    ('adaptive', _adaptive),
+    ('denoised', _denoised),
+    ('grayscale', _grayscale),
+    ('upscaled', _upscaled),
+]
+
+# Relative cost of each variant (preprocessing + recognition); the cascade runs cheapest first
+VARIANT_COST = {
+    'grayscale': 1,  # No preprocessing
+    'otsu': 2,
+    'adaptive': 3,
+    'denoised': 4,  # NL-means denoising is slow on large screenshots
+    'upscaled': 5,  # 4x the pixels to recognize
+}
+
+
+# ===== TEXT REGIONS =====
+
+def locate_text_blocks(gray: np.ndarray) -> List[dict]:
+    """
+    Find text lines with a morphological gradient and merge them into blocks
+    Returns: list of dicts with box (x, y, w, h) and median text line height
+    """
+    height, width = gray.shape[:2]
+
+    # Character strokes light up in the gradient; flat UI backgrounds do not
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, strokes = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # Join neighbouring characters into line-shaped blobs
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 60), 1))
+    joined = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE, line_kernel)
+    contours = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+    lines = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < OCR_MIN_TEXT_HEIGHT or w < OCR_MIN_TEXT_HEIGHT or h > height * 0.25:
+            continue
+        # Text lines are partly filled with strokes; solid bars and empty frames are not
+        density = cv2.countNonZero(strokes[y:y + h, x:x + w]) / float(w * h)
+        if 0.08 <= density <= 0.85:
+            lines.append((x, y, w, h))
+
+    # Merge lines into blocks: stacked lines that overlap horizontally, or lines sharing a row
+    blocks: List[list] = []
+    for x, y, w, h in sorted(lines, key=lambda b: (b[1], b[0])):
+        for block in blocks:
+            bx0, by0, bx1, by1, heights = block
+            line_height = max(h, float(np.median(heights)))
+            vertical_gap = y - by1
+            horizontal_overlap = min(x + w, bx1) - max(x, bx0)
+            same_row = y < by1 and y + h > by0
+            if vertical_gap <= line_height * 1.2 and (horizontal_overlap > 0 or same_row):
+                block[0], block[1] = min(bx0, x), min(by0, y)
+                block[2], block[3] = max(bx1, x + w), max(by1, y + h)
+                heights.append(h)
+                break
+        else:
+            blocks.append([x, y, x + w, y + h, [h]])
+
+    pad = 4
+    return [
+        {
+            'box': (max(0, x0 - pad), max(0, y0 - pad),
+                    min(width, x1 + pad) - max(0, x0 - pad), min(height, y1 + pad) - max(0, y0 - pad)),
+            'text_height': float(np.median(heights)),
+        }
+        for x0, y0, x1, y1, heights in blocks
+    ]
+
+
+def build_text_layout(gray: np.ndarray) -> Optional[dict]:
+    """
+    Stack the detected text blocks into compact canvases for OCR
+    Returns None when no usable blocks were found or text covers most of the frame
+    """
+    blocks = locate_text_blocks(gray)
+    if not blocks:
+        return None
+
+    frame_area = float(gray.shape[0] * gray.shape[1])
+    coverage = sum(b['box'][2] * b['box'][3] for b in blocks) / frame_area
+    if coverage > OCR_TEXT_REGION_MAX_COVERAGE:
+        return None
+
+    # Fill gaps with the frame's border colour so thresholding sees a uniform background
+    border = np.concatenate([gray[0, :], gray[-1, :], gray[:, 0], gray[:, -1]])
+    background = int(np.median(border))
+    separator = 12
+
+    def stack(crops: List[np.ndarray]) -> np.ndarray:
+        canvas_width = max(c.shape[1] for c in crops) + 2 * separator
+        canvas_height = sum(c.shape[0] for c in crops) + separator * (len(crops) + 1)
+        canvas = np.full((canvas_height, canvas_width), background, dtype=np.uint8)
+        y = separator
+        for crop in crops:
+            canvas[y:y + crop.shape[0], separator:separator + crop.shape[1]] = crop
+            y += crop.shape[0] + separator
+        return canvas
+
+    crops, upscaled_crops = [], []
+    upscaled_blocks = 0
+    for block in sorted(blocks, key=lambda b: (b['box'][1], b['box'][0])):
+        x, y, w, h = block['box']
+        crop = gray[y:y + h, x:x + w]
+        crops.append(crop)
+        if block['text_height'] < OCR_SMALL_TEXT_HEIGHT:
+            # Only small text is worth upscaling (instead of the whole frame)
+            upscaled_crops.append(cv2.resize(crop, (w * 2, h * 2), interpolation=cv2.INTER_CUBIC))
+            upscaled_blocks += 1
+        else:
+            upscaled_crops.append(crop)
+
+    canvas = stack(crops)
+    return {
+        'canvas': canvas,
+        'upscaled_canvas': stack(upscaled_crops) if upscaled_blocks else None,
+        'blocks': len(blocks),
+        'upscaled_blocks': upscaled_blocks,
+        'coverage': coverage,
+        'pixels': int(canvas.size),
+    }
+
+
+# ===== WORKER POOL =====
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Process-wide OCR pool, created on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix='ocr')
+    return _executor
+
+
+# ===== CASCADE =====
+
+AMOUNT_PATTERN = re.compile(r'(?:₹|\brs\.?|\binr\b|\bamount\b)\s*:?\s*\d[\d,]*(?:\.\d{1,2})?', re.IGNORECASE)
+UTR_PATTERN = re.compile(r'(?<!\d)\d{12}(?!\d)')
+UPI_HANDLE_PATTERN = re.compile(r'[a-z0-9.\-_]{2,}@[a-z]{2,}', re.IGNORECASE)
+
+
+def detect_upi_fields(text: str) -> List[str]:
+    """Which UPI receipt fields (amount, UTR, @handle) appear in OCR text"""
+    fields = []
+    if AMOUNT_PATTERN.search(text):
+        fields.append('amount')
+    if UTR_PATTERN.search(text):
+        fields.append('utr')
+    if UPI_HANDLE_PATTERN.search(text):
+        fields.append('upi_handle')
+    return fields
+
+
+def _accepts(outcome: dict) -> bool:
+    """Early-exit test: confident recognition that already contains the key UPI fields"""
+    return (outcome['confidence'] >= OCR_CASCADE_MIN_CONFIDENCE
+            and len(outcome['fields']) >= OCR_CASCADE_MIN_FIELDS)
+
+
+def _run_variant(name: str, preprocess: Callable[[np.ndarray], np.ndarray], gray: np.ndarray,
+                 deadline: Optional[float]) -> dict:
+    """Preprocess and OCR a single variant. Returns: dict with text, mean confidence, UPI fields and timing"""
+    start = time.perf_counter()
+    processed = preprocess(gray)
+    timeout = 0
+    if deadline is not None:
+        # pytesseract kills the tesseract process once the remaining budget is spent
+        timeout = max(0.1, deadline - time.perf_counter())
+    text, confidences = get_ocr_backend().recognize(processed, timeout=timeout)
+    elapsed = time.perf_counter() - start
+    observe_stage(f'ocr_{name}', elapsed)
+    return {
+        'name': name,
+        'text': text,
+        'confidence': float(np.mean(confidences)) if confidences else 0.0,
+        'fields': detect_upi_fields(text) if text else [],
+        'elapsed': elapsed,
+    }
+
+
+@timed('ocr')
+def run_ocr_variants(gray: np.ndarray, parallel: Optional[bool] = None,
+                     time_budget: Optional[float] = None, strategy: Optional[str] = None,
+                     use_text_regions: Optional[bool] = None) -> dict:
+    """
+    OCR the preprocessing variants of a grayscale image and keep the best one
+    strategy 'cascade' runs the cheapest variant first and stops once one passes the confidence/UPI-field
+    check; 'all' runs every variant and keeps the longest text
+    With text regions enabled, variants OCR a canvas of the detected text blocks instead of the full frame
+    Returns: dict with text, method, per-variant results, confidences, timings, timed-out and skipped variants
+    """
+    parallel = OCR_PARALLEL if parallel is None else parallel
+    time_budget = OCR_TIME_BUDGET if time_budget is None else time_budget
+    strategy = OCR_STRATEGY if strategy is None else strategy
+    cascade = strategy == 'cascade'
+
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget and time_budget > 0 else None
+
+    outcomes = {}
+    timed_out: List[str] = []
+    failed: List[str] = []
+    skipped: List[str] = []
+    accepted = None
+
+    # Each plan entry: (variant name, preprocessing, source image)
+    if use_text_regions is None:
+        use_text_regions = OCR_TEXT_REGIONS
+    layout = None
+    if use_text_regions:
+        try:
+            layout = build_text_layout(gray)
+        except Exception as e:
+            logger.warning(f"Text region detection failed, using the full frame: {e}")
+    if layout is None:
+        plan = [(name, preprocess, gray) for name, preprocess in OCR_VARIANTS]
+    else:
+        plan = []
+        for name, preprocess in OCR_VARIANTS:
+            if name != 'upscaled':
+                plan.append((name, preprocess, layout['canvas']))
+            elif layout['upscaled_canvas'] is not None:
+                # Small-text blocks are already upscaled in this canvas
+                plan.append((name, _otsu, layout['upscaled_canvas']))
+            else:
+                skipped.append(name)  # Nothing small enough to need upscaling
+
+    if cascade:
+        # Cheapest variant alone first; only if it is not good enough, fan out to the rest
+        ordered = sorted(plan, key=lambda v: VARIANT_COST[v[0]])
+        stages = [ordered[:1], ordered[1:]]
+    else:
+        stages = [plan]
+
+    def record(name: str, get_outcome: Callable[[], dict]):
+        nonlocal accepted
+        try:
+            outcome = get_outcome()
+        except Exception as e:
+            # pytesseract raises RuntimeError when its timeout kills the tesseract process, but
+            # TesseractError and engine errors are RuntimeErrors too: only a spent budget is a timeout
+            if isinstance(e, RuntimeError) and deadline is not None and time.perf_counter() >= deadline:
+                logger.warning(f"OCR variant '{name}' exceeded the time budget: {e}")
+                timed_out.append(name)
+                return
+            logger.warning(f"OCR variant '{name}' failed: {e}")
+            failed.append(name)
+            return
+        outcomes[name] = outcome
+        if cascade and accepted is None and outcome['text'].strip() and _accepts(outcome):
+            accepted = name
+
+    for stage in stages:
+        if accepted is not None:
+            skipped.extend(name for name, _, _ in stage)
+            continue
+        if deadline is not None and time.perf_counter() >= deadline:
+            timed_out.extend(name for name, _, _ in stage)
+            continue
+
+        if parallel and len(stage) > 1:
+            executor = _get_executor()
+            futures = {
+                executor.submit(_run_variant, name, preprocess, source, deadline): name
+                for name, preprocess, source in stage
+            }
+            pending = set(futures)
+            while pending and accepted is None:
+                remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    break  # Budget exhausted
+                for future in done:
+                    record(futures[future], future.result)
+            for future in pending:
+                # Queued passes are dropped; passes already running finish in the background and are ignored
+                future.cancel()
+                (skipped if accepted is not None else timed_out).append(futures[future])
+        else:
+            for name, preprocess, source in stage:
+                if accepted is not None:
+                    skipped.append(name)
+                    continue
+                if deadline is not None and time.perf_counter() >= deadline:
+                    timed_out.append(name)
+                    continue
+                record(name, lambda: _run_variant(name, preprocess, source, deadline))
+
+    # Keep the pipeline order so ties resolve the same way as the sequential version
+    order = {name: index for index, (name, _) in enumerate(OCR_VARIANTS)}
+    ocr_results: List[Tuple[str, str]] = sorted(
+        ((name, o['text']) for name, o in outcomes.items() if o['text'] and len(o['text'].strip()) > 0),
+        key=lambda x: order[x[0]]
+    )
+    for names in (timed_out, skipped, failed):
+        names.sort(key=lambda name: order[name])
+
+    best_method, best_text = None, ""
+    if accepted is not None:
+        best_method, best_text = accepted, outcomes[accepted]['text']
+    elif ocr_results:
+        # Choose the result with most text (usually most accurate)
+        best_method, best_text = max(ocr_results, key=lambda x: len(x[1]))
+
+    return {
+        'text': best_text,
+        'method': best_method,
+        'results': ocr_results,
+        'strategy': 'cascade' if cascade else 'all',
+        'mode': 'parallel' if parallel else 'sequential',
+        'backend': get_ocr_backend().name,
+        'accepted': accepted is not None,
+        'confidence': round(outcomes[best_method]['confidence'], 2) if best_method else 0.0,
+        'fields': outcomes[best_method]['fields'] if best_method else [],
+        'confidences': {name: round(o['confidence'], 2) for name, o in outcomes.items()},
+        'elapsed': round(time.perf_counter() - start, 3),
+        'time_budget': time_budget,
+        'timings': {name: round(o['elapsed'], 3) for name, o in outcomes.items()},
+        'timed_out': timed_out,
+        'skipped': skipped,
+        'failed': failed,
+        'text_regions': {
+            'blocks': layout['blocks'],
+            'upscaled_blocks': layout['upscaled_blocks'],
+            'coverage': round(layout['coverage'], 3),
+            'ocr_pixels': layout['pixels'],
+            'frame_pixels': int(gray.size),
+        } if layout else None,
+    }
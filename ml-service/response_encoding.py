@@ -0,0 +1,170 @@
+"""
+Response Encoding
+JSON bodies are rendered with orjson (several times faster than json.dumps on large results, and it
+serializes numpy values directly); the standard json module is the fallback when orjson is missing.
+CompressionMiddleware compresses complete JSON/text bodies for clients that accept it: brotli when the
+brotli package is installed, else gzip. Streamed responses (NDJSON batches) pass through untouched so
+their lines still arrive as they are produced.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from service_config import (
+    RESPONSE_BROTLI_QUALITY,
+    RESPONSE_COMPRESSION_MIN_BYTES,
+    RESPONSE_GZIP_LEVEL,
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not available; responses use the standard json module")
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+# Bodies larger than this are compressed on a worker thread instead of the event loop
+THREAD_MIN_BYTES = 128 * 1024
+
+_stats_lock = threading.Lock()
+_stats = {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+
+
+def json_dumps(content) -> bytes:
+    """content as UTF-8 JSON (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content) -> bytes:
+        return json_dumps(content)
+
+
+def choose_encoding(accept_encoding: str):
+    """
+    'br', 'gzip' or None for an Accept-Encoding header (highest q wins, brotli on ties; q=0 refuses)
+    '*' only covers the codings the header does not name
+    """
+    explicit, wildcard = {}, 0.0
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name.strip() == '*':
+            wildcard = quality
+        else:
+            explicit[name.strip()] = quality
+    codings = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+    offered = {coding: explicit.get(coding, wildcard) for coding in codings}
+    best = max(offered, key=lambda coding: (offered[coding], coding == 'br'))
+    return best if offered[best] > 0 else None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = RESPONSE_GZIP_LEVEL,
+             brotli_quality: int = RESPONSE_BROTLI_QUALITY) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete bodies of at least minimum_size bytes
+    Skips streamed bodies, non-JSON/text types and responses that already carry a Content-Encoding,
+    and sends the original body when compressing does not make it smaller.
+    """
+
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                # Held until the first body message says whether the body is complete
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            if message['type'] != 'http.response.body':
+                await send(start)
+                await send(message)
+                return
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            content_type = headers.get('content-type', '')
+            if (message.get('more_body', False) or len(body) < self.minimum_size or 'content-encoding' in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                await send(start)
+                await send(message)
+                return
+            started = time.perf_counter()
+            if len(body) >= THREAD_MIN_BYTES:
+                compressed = await asyncio.get_running_loop().run_in_executor(None, compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            headers.add_vary_header('Accept-Encoding')
+            if len(compressed) < len(body):
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(compressed))
+                body = compressed
+                with _stats_lock:
+                    _stats['responses'] += 1
+                    _stats['bytes_in'] += len(message.get('body', b''))
+                    _stats['bytes_out'] += len(compressed)
+                    _stats['seconds'] += time.perf_counter() - started
+            await send(start)
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def response_encoding_stats() -> dict:
+    with _stats_lock:
+        return {
+            'json': 'orjson' if ORJSON_AVAILABLE else 'json',
+            'compression': ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip'],
+            'compressed_responses': _stats['responses'],
+            'bytes_in': _stats['bytes_in'],
+            'bytes_out': _stats['bytes_out'],
+            'seconds': round(_stats['seconds'], 3),
+        }
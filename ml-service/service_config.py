@@ -0,0 +1,220 @@
+"""
+ML Service Runtime Configuration
+Performance settings (worker pools, time budgets) read from the environment
+"""
+
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+CPU_COUNT = os.cpu_count() or 1
+
+# ========== OCR ==========
+
+# Run the OCR preprocessing variants concurrently instead of one after another
+OCR_PARALLEL = _env_bool("OCR_PARALLEL", True)
+
+# Worker threads shared by all OCR requests (each Tesseract pass is its own process)
+OCR_MAX_WORKERS = max(1, _env_int("OCR_MAX_WORKERS", min(5, CPU_COUNT)))
+
+# Wall-clock budget for all OCR variants of one image (seconds, 0 = unlimited)
+OCR_TIME_BUDGET = max(0.0, _env_float("OCR_TIME_BUDGET_SECONDS", 8.0))
+
+# 'cascade' = cheapest variant first, stop once confident with UPI fields found; 'all' = run every variant
+OCR_STRATEGY = os.getenv("OCR_STRATEGY", "cascade").lower()
+
+# Cascade early-exit: mean Tesseract word confidence (0-100) and number of UPI fields
+# (amount, UTR, @handle) a variant must reach
+OCR_CASCADE_MIN_CONFIDENCE = _env_float("OCR_CASCADE_MIN_CONFIDENCE", 75.0)
+OCR_CASCADE_MIN_FIELDS = max(1, _env_int("OCR_CASCADE_MIN_FIELDS", 2))
+
+# OCR only the detected text blocks (stacked into a compact canvas) instead of the full frame
+OCR_TEXT_REGIONS = _env_bool("OCR_TEXT_REGIONS", True)
+
+# Fall back to the full frame when text blocks cover more than this fraction of it
+OCR_TEXT_REGION_MAX_COVERAGE = _env_float("OCR_TEXT_REGION_MAX_COVERAGE", 0.85)
+
+# Text line heights (pixels): ignore blobs below the minimum, upscale blocks below the small-text height
+OCR_MIN_TEXT_HEIGHT = max(1, _env_int("OCR_MIN_TEXT_HEIGHT", 6))
+OCR_SMALL_TEXT_HEIGHT = max(1, _env_int("OCR_SMALL_TEXT_HEIGHT", 20))
+
+# OCR backend: 'auto' (engine pool if tesserocr is installed), 'tesserocr' or 'pytesseract'
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+
+# Engine profile: 'default', 'lstm' (LSTM-only) or 'fast' (LSTM-only with tessdata_fast models)
+OCR_ENGINE_PROFILE = os.getenv("OCR_ENGINE_PROFILE", "default").lower()
+
+# Traineddata directories (empty = Tesseract's built-in location)
+OCR_TESSDATA_PATH = os.getenv("OCR_TESSDATA_PATH", "")
+OCR_TESSDATA_FAST_PATH = os.getenv("OCR_TESSDATA_FAST_PATH", "")
+
+# Start the OCR engines at service startup instead of on the first request
+OCR_PRELOAD = _env_bool("OCR_PRELOAD", True)
+
+# ========== ANALYSIS CACHE ==========
+
+# Reuse OCR and forensics results for byte-identical resubmissions
+ANALYSIS_CACHE_ENABLED = _env_bool("ANALYSIS_CACHE_ENABLED", True)
+
+# In-memory LRU tier size (entries) and time-to-live for both tiers (seconds)
+ANALYSIS_CACHE_MAX_ENTRIES = max(1, _env_int("ANALYSIS_CACHE_MAX_ENTRIES", 512))
+ANALYSIS_CACHE_TTL = max(1.0, _env_float("ANALYSIS_CACHE_TTL_SECONDS", 24 * 3600.0))
+
+# Directory for the on-disk tier that survives restarts (empty = memory only)
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "")
+
+# ========== ANALYSIS PROXY ==========
+
+# Global image statistics (FFT, gradients, noise, variance) run on a downscaled proxy when an image has
+# more pixels than this; ELA, faces, metadata and OCR keep full resolution. 0 = always full resolution.
+# The 5 MP default leaves phone screenshots (up to 1440x3200) untouched.
+ANALYSIS_PROXY_MAX_PIXELS = max(0, _env_int("ANALYSIS_PROXY_MAX_PIXELS", 5_000_000))
+
+# ========== SPECTRAL ANALYSIS ==========
+
+# Pad FFT inputs to a fast transform length. Off by default: zero-padding changes the magnitude spectrum
+# (e.g. grid_score 7 -> 19 on a 1080x2337 plane), so the detector thresholds no longer apply as calibrated
+SPECTRAL_FAST_LEN = _env_bool("SPECTRAL_FAST_LEN", False)
+
+# Threads per FFT (scipy.fft workers)
+SPECTRAL_WORKERS = max(1, _env_int("SPECTRAL_WORKERS", min(4, CPU_COUNT)))
+
+# ========== FORENSICS ==========
+
+# Area the 8x8 compression-block check samples: 'corner' (top-left 64x64, the calibrated default)
+# or 'full' (every block of the image)
+FORENSICS_BLOCK_COVERAGE = os.getenv("FORENSICS_BLOCK_COVERAGE", "corner").lower()
+
+# ========== FACE DETECTION ==========
+
+# Haar face detection runs on a copy downscaled to this longest side, boxes are mapped back (0 = full resolution)
+FACE_DETECT_MAX_SIDE = max(0, _env_int("FACE_DETECT_MAX_SIDE", 800))
+
+# Video face tracking: Haar detection every N frames (and when the track is lost), LK optical flow in between
+FACE_TRACK_KEYFRAME_INTERVAL = max(1, _env_int("FACE_TRACK_KEYFRAME_INTERVAL", 10))
+# Share of tracked points that must pass the forward-backward check, else the frame is re-detected
+FACE_TRACK_MIN_CONFIDENCE = _env_float("FACE_TRACK_MIN_CONFIDENCE", 0.5)
+# Video faces are tracked through this many frames per gap between two analyzed frames (the analyzed frame and
+# evenly spaced ones after it, consecutive in short gaps). The temporal checks read the tracked boxes at the 15
+# analyzed frames, so their thresholds keep their meaning. 1 = no tracking, reuse the analyzed frames' detections
+VIDEO_TRACK_STEPS = max(1, _env_int("VIDEO_TRACK_STEPS", 4))
+
+# ========== VIDEO DECODING ==========
+
+# Sampled video frames are downscaled to this longest side as they are decoded (0 = full resolution)
+VIDEO_DECODE_MAX_SIDE = max(0, _env_int("VIDEO_DECODE_MAX_SIDE", 0))
+# Frames to skip before the sampler first tries a seek (CAP_PROP_POS_FRAMES) instead of decoding through;
+# afterwards it seeks whenever the measured seek cost is below decoding the gap (keyframe distance varies)
+VIDEO_SEEK_MIN_GAP = max(0, _env_int("VIDEO_SEEK_MIN_GAP", 30))
+
+# ========== DEEP LEARNING MODELS ==========
+
+# Saved Keras model (.keras / .h5 / SavedModel dir) for the deepfake CNN; empty = build MobileNetV2 + head
+DEEPFAKE_CNN_MODEL_PATH = os.getenv("DEEPFAKE_CNN_MODEL_PATH", "")
+
+# Load and warm up the models at service startup (in the background) instead of on the first request
+MODEL_PRELOAD = _env_bool("MODEL_PRELOAD", False)
+
+# Grad-CAM heatmaps per video: only the k most suspicious sampled frames (0 = none)
+VIDEO_GRADCAM_TOP_K = max(0, _env_int("VIDEO_GRADCAM_TOP_K", 3))
+
+# Deepfake CNN runtime: 'tensorflow' (Keras model), 'tflite' or 'onnx' (INT8 models exported by
+# tools/export_deepfake_cnn.py - no TensorFlow import, a fraction of the memory per worker)
+DEEPFAKE_CNN_BACKEND = os.getenv("DEEPFAKE_CNN_BACKEND", "tensorflow").lower()
+DEEPFAKE_CNN_TFLITE_PATH = os.getenv("DEEPFAKE_CNN_TFLITE_PATH", "models/deepfake_cnn_int8.tflite")
+DEEPFAKE_CNN_ONNX_PATH = os.getenv("DEEPFAKE_CNN_ONNX_PATH", "models/deepfake_cnn_int8.onnx")
+
+# Inference threads per TFLite interpreter / ONNX Runtime session
+DEEPFAKE_CNN_THREADS = max(1, _env_int("DEEPFAKE_CNN_THREADS", min(4, CPU_COUNT)))
+
+# ========== EXPLAINABILITY ==========
+
+# Intermediates of recent deepfake analyses kept for GET /api/deepfake/{id}/explain
+EXPLAIN_STORE_TTL = max(1.0, _env_float("EXPLAIN_STORE_TTL_SECONDS", 900.0))
+EXPLAIN_STORE_MAX_ENTRIES = max(1, _env_int("EXPLAIN_STORE_MAX_ENTRIES", 256))
+EXPLAIN_STORE_MAX_BYTES = max(1, _env_int("EXPLAIN_STORE_MAX_MB", 256)) * 2 ** 20
+
+# Stored pixels/maps are downscaled to this longest side (heatmaps are rendered at most this large)
+EXPLAIN_STORE_MAX_SIDE = max(64, _env_int("EXPLAIN_STORE_MAX_SIDE", 1280))
+
+# Heatmap overlays: longest side (0 = full size), encoding (png | jpeg | webp) and jpeg/webp quality (1-100)
+HEATMAP_MAX_SIDE = max(0, _env_int("HEATMAP_MAX_SIDE", 1024))
+HEATMAP_FORMAT = os.getenv("HEATMAP_FORMAT", "webp").strip().lower()
+HEATMAP_QUALITY = min(100, max(1, _env_int("HEATMAP_QUALITY", 80)))
+
+# ========== RESPONSES ==========
+
+# Compress JSON responses of at least RESPONSE_COMPRESSION_MIN_BYTES for clients that accept it
+# (brotli when the brotli package is installed, else gzip); streamed responses are never compressed
+RESPONSE_COMPRESSION = _env_bool("RESPONSE_COMPRESSION", True)
+RESPONSE_COMPRESSION_MIN_BYTES = max(0, _env_int("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = min(9, max(1, _env_int("RESPONSE_GZIP_LEVEL", 6)))
+RESPONSE_BROTLI_QUALITY = min(11, max(0, _env_int("RESPONSE_BROTLI_QUALITY", 4)))
+
+# ========== UPLOADS ==========
+
+# Largest media file accepted (multipart upload or decoded base64); larger requests get 413
+UPLOAD_MAX_BYTES = max(1, _env_int("UPLOAD_MAX_MB", 100)) * 2 ** 20
+
+# /api/forensics/analyze/batch: images per request and total size of a batch (each image is also
+# capped by UPLOAD_MAX_MB). Items run BATCH_CONCURRENCY at a time on the image pool (0 = its worker count)
+BATCH_MAX_ITEMS = max(1, _env_int("BATCH_MAX_ITEMS", 1000))
+BATCH_MAX_BYTES = max(1, _env_int("BATCH_MAX_MB", 1024)) * 2 ** 20
+BATCH_CONCURRENCY = max(0, _env_int("BATCH_CONCURRENCY", 0))
+
+# ========== EXECUTION ==========
+
+# Analyses run on one worker pool per workload, off the event loop. A pool admits WORKERS running plus
+# QUEUE waiting requests; further requests are refused at once with EXEC_OVERLOAD_STATUS and Retry-After.
+EXEC_IMAGE_WORKERS = max(1, _env_int("EXEC_IMAGE_WORKERS", CPU_COUNT))
+EXEC_IMAGE_QUEUE = max(0, _env_int("EXEC_IMAGE_QUEUE", 16))
+EXEC_VIDEO_WORKERS = max(1, _env_int("EXEC_VIDEO_WORKERS", max(1, CPU_COUNT // 2)))
+EXEC_VIDEO_QUEUE = max(0, _env_int("EXEC_VIDEO_QUEUE", 4))
+EXEC_VOICE_WORKERS = max(1, _env_int("EXEC_VOICE_WORKERS", max(1, CPU_COUNT // 2)))
+EXEC_VOICE_QUEUE = max(0, _env_int("EXEC_VOICE_QUEUE", 8))
+
+# thread | process. Voice analysis is stateless and mostly pure Python (librosa), so a process pool
+# sidesteps the GIL; image and video analyses share in-process caches, models and explanations (threads only)
+EXEC_VOICE_MODE = os.getenv("EXEC_VOICE_MODE", "thread").strip().lower()
+
+# 503 (service busy, the default) or 429 (too many requests) when a pool is full
+EXEC_OVERLOAD_STATUS = 429 if _env_int("EXEC_OVERLOAD_STATUS", 503) == 429 else 503
+
+# ========== JOBS ==========
+
+# Asynchronous jobs (/api/jobs/...): at most JOB_MAX_ACTIVE queued or running at once, finished
+# jobs and their results are kept JOB_TTL_SECONDS (at most JOB_STORE_MAX_ENTRIES of them)
+JOB_MAX_ACTIVE = max(1, _env_int("JOB_MAX_ACTIVE", 32))
+JOB_STORE_MAX_ENTRIES = max(1, _env_int("JOB_STORE_MAX_ENTRIES", 1000))
+JOB_STORE_TTL = max(1.0, _env_float("JOB_TTL_SECONDS", 3600.0))
+
+# Completion webhooks: POST timeout, retries, and the hosts they may target (comma separated;
+# empty = webhooks are refused)
+JOB_WEBHOOK_TIMEOUT = max(1.0, _env_float("JOB_WEBHOOK_TIMEOUT", 10.0))
+JOB_WEBHOOK_RETRIES = max(0, _env_int("JOB_WEBHOOK_RETRIES", 2))
+JOB_WEBHOOK_HOSTS = [h.strip().lower() for h in os.getenv("JOB_WEBHOOK_HOSTS", "").split(",") if h.strip()]
+
+# ========== METRICS ==========
+
+# GET /metrics in the Prometheus text format; when off, the stage timers are no-ops and /metrics answers 404
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
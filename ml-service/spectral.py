@@ -0,0 +1,115 @@
+"""
+Spectral Feature Engine
+One real-input FFT (scipy.fft.rfft2) per gray plane, run on several threads, and the frequency-domain
+features every detector uses, derived from it in vectorized form: magnitude mean/variance, grid-artifact
+score and radial energy profile. Unpadded, they equal the statistics of |fftshift(np.fft.fft2(gray))|;
+padding to a fast length (SPECTRAL_FAST_LEN) is faster but changes them.
+"""
+
+from typing import Optional
+
+import numpy as np
+from scipy import fft
+
+from metrics import timed
+from service_config import SPECTRAL_FAST_LEN, SPECTRAL_WORKERS
+
+# Radial energy profile resolution (bins from DC to the Nyquist radius)
+RADIAL_BINS = 16
+
+
+def fast_shape(shape: tuple) -> tuple:
+    """Smallest (rows, cols) >= shape with fast FFT lengths (e.g. 2337 -> 2400)"""
+    return fft.next_fast_len(shape[0], real=True), fft.next_fast_len(shape[1], real=True)
+
+
+def _hermitian_weights(cols: int, full_cols: int) -> np.ndarray:
+    """
+    How often each rfft2 column occurs in the full (two-sided) spectrum:
+    DC and, for even widths, Nyquist once; every other column twice (as its conjugate twin)
+    """
+    weights = np.full(cols, 2.0)
+    weights[0] = 1.0
+    if full_cols % 2 == 0:
+        weights[-1] = 1.0
+    return weights
+
+
+def _grid_score(magnitude: np.ndarray, full_shape: tuple, threshold: float, grid: int) -> int:
+    """
+    Count grid samples of the centered full spectrum above threshold
+    Samples rows/cols 0, h//grid, 2*(h//grid), ... of the fftshift-ed spectrum, looked up in the half spectrum
+    """
+    h, w = full_shape
+    rows = np.arange(0, h, max(1, h // grid))
+    cols = np.arange(0, w, max(1, w // grid))
+    # fftshift: centered index k holds frequency (k - n//2) mod n
+    fr = (rows - h // 2) % h
+    fc = (cols - w // 2) % w
+    fr_grid, fc_grid = np.meshgrid(fr, fc, indexing='ij')
+    # Columns beyond the half spectrum are the conjugate of (-row, -col)
+    mirrored = fc_grid > magnitude.shape[1] - 1
+    fr_grid = np.where(mirrored, (-fr_grid) % h, fr_grid)
+    fc_grid = np.where(mirrored, (-fc_grid) % w, fc_grid)
+    return int(np.count_nonzero(magnitude[fr_grid, fc_grid] > threshold))
+
+
+@timed('fft')
+def spectrum_features(gray: np.ndarray, fast_len: Optional[bool] = None, workers: Optional[int] = None,
+                      grid: int = 10) -> dict:
+    """
+    Frequency-domain features of a gray plane
+    Statistics are those of the full centered magnitude spectrum (|fftshift(fft2(gray))|),
+    computed from the half spectrum with Hermitian weights.
+    fast_len: zero-pad to fast transform lengths (None = SPECTRAL_FAST_LEN); the padded spectrum is
+              interpolated, so its statistics differ from the unpadded baseline
+    Returns: dict with shape (transform size), mean, var, variance_ratio, grid_score (samples > 2x mean),
+             radial_profile (energy share per radial band, DC excluded) and high_frequency_ratio
+    """
+    fast_len = SPECTRAL_FAST_LEN if fast_len is None else fast_len
+    workers = SPECTRAL_WORKERS if workers is None else workers
+    data = np.asarray(gray, dtype=np.float64)
+    shape = fast_shape(data.shape) if fast_len else data.shape
+
+    magnitude = np.abs(fft.rfft2(data, s=shape, workers=workers))
+    h, w = shape
+    weights = _hermitian_weights(magnitude.shape[1], w)
+    count = float(h * w)
+
+    mean = float((magnitude.sum(axis=0) * weights).sum() / count)
+    power = magnitude * magnitude
+    mean_square = float((power.sum(axis=0) * weights).sum() / count)
+    var = max(0.0, mean_square - mean * mean)
+
+    # Radial energy profile (cycles/pixel normalised so the Nyquist radius is 1)
+    fy = np.abs(fft.fftfreq(h))[:, None] * 2
+    fx = fft.rfftfreq(w)[None, :] * 2
+    radius = np.sqrt(fy * fy + fx * fx)
+    bands = np.minimum((radius * RADIAL_BINS).astype(np.intp), RADIAL_BINS - 1)
+    energy = power * weights[None, :]
+    energy[0, 0] = 0.0  # DC carries brightness, not structure
+    profile = np.bincount(bands.ravel(), weights=energy.ravel(), minlength=RADIAL_BINS)
+    total = profile.sum()
+    profile = profile / total if total > 0 else profile
+
+    return {
+        'shape': (h, w),
+        'padded': (h, w) != data.shape,
+        'mean': mean,
+        'var': var,
+        'variance_ratio': var / mean if mean > 0 else 0.0,
+        'grid_score': _grid_score(magnitude, (h, w), mean * 2, grid),
+        'radial_profile': profile,
+        'high_frequency_ratio': float(profile[RADIAL_BINS // 2:].sum()),
+    }
+
+
+def summarize(features: dict) -> dict:
+    """JSON-friendly subset of spectrum_features() for responses"""
+    return {
+        'transform_size': list(features['shape']),
+        'variance_ratio': round(features['variance_ratio'], 2),
+        'grid_score': features['grid_score'],
+        'high_frequency_ratio': round(features['high_frequency_ratio'], 4),
+        'radial_profile': [round(float(v), 4) for v in features['radial_profile']],
+    }
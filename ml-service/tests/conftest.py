@@ -0,0 +1,31 @@
+"""
+Test setup: the service modules are flat files in ml-service/, imported as top-level modules
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def png_bytes(seed: int, shape: tuple = (64, 48, 3)) -> bytes:
+    """A small random PNG"""
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='session')
+def client():
+    """One TestClient for the session: leaving it runs the app shutdown, which stops the worker pools"""
+    from fastapi.testclient import TestClient
+
+    import main
+    with TestClient(main.app) as client:
+        yield client
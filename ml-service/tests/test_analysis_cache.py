@@ -0,0 +1,103 @@
+"""
+AnalysisCache: memory and disk tiers, expiry, and invalidation when the configuration changes
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+import main
+from analysis_cache import AnalysisCache, config_fingerprint, content_digest
+from conftest import png_bytes
+
+
+def test_hit_returns_independent_copy():
+    cache = AnalysisCache(max_entries=4, ttl=60)
+    key = content_digest(b'image')
+    cache.put('forgery', key, 'fp', {'score': np.float64(12.5), 'reasons': ['a']})
+
+    first = cache.get('forgery', key, 'fp')
+    first['reasons'].append('b')
+
+    assert cache.get('forgery', key, 'fp') == {'score': 12.5, 'reasons': ['a']}
+    assert cache.stats()['hits'] == 2
+
+
+def test_fingerprint_change_invalidates_namespace():
+    cache = AnalysisCache(max_entries=4, ttl=60)
+    cache.put('ocr', 'k', config_fingerprint('low'), 'text')
+    cache.put('forgery', 'k', 'other', 1)
+
+    assert cache.get('ocr', 'k', config_fingerprint('high')) is None
+    assert cache.get('forgery', 'k', 'other') == 1
+    assert cache.stats()['invalidations'] == 1
+
+
+@pytest.mark.parametrize('setting, value', [('OCR_TESSDATA_PATH', '/models/best'),
+                                            ('OCR_TESSDATA_FAST_PATH', '/models/fast')])
+def test_ocr_fingerprint_covers_models(monkeypatch, setting, value):
+    before = main.ocr_cache_fingerprint()
+    monkeypatch.setattr(main, setting, value)
+    assert main.ocr_cache_fingerprint() != before
+
+
+def test_ocr_fingerprint_covers_backend(monkeypatch):
+    class Backend:
+        name = 'pytesseract'
+
+    backend = Backend()
+    monkeypatch.setattr(main, 'TESSERACT_AVAILABLE', True)
+    monkeypatch.setattr(main, 'get_ocr_backend', lambda: backend)
+    before = main.ocr_cache_fingerprint()
+    backend.name = 'tesserocr'
+    assert main.ocr_cache_fingerprint() != before
+
+
+def test_lru_eviction_and_expiry():
+    cache = AnalysisCache(max_entries=2, ttl=60)
+    for key in ('a', 'b', 'c'):
+        cache.put('ocr', key, 'fp', key)
+    assert cache.get('ocr', 'a', 'fp') is None
+    assert cache.stats()['evictions'] == 1
+
+    cache.ttl = 0.01
+    cache.put('ocr', 'd', 'fp', 'd')
+    time.sleep(0.02)
+    assert cache.get('ocr', 'd', 'fp') is None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    AnalysisCache(ttl=60, disk_dir=str(tmp_path)).put('ocr', 'k' * 64, 'fp', {'text': 'Paid'})
+
+    restarted = AnalysisCache(ttl=60, disk_dir=str(tmp_path))
+
+    assert restarted.get('ocr', 'k' * 64, 'fp') == {'text': 'Paid'}
+    assert restarted.get('ocr', 'k' * 64, 'new') is None
+    assert restarted.stats()['disk_hits'] == 1
+
+
+def _ocr_run(text: str) -> dict:
+    return {'results': {'gray': text} if text else {}, 'text': text, 'strategy': 'cascade', 'mode': 'thread',
+            'backend': 'test', 'method': 'gray', 'accepted': bool(text), 'confidence': 90.0, 'fields': 0,
+            'elapsed': 0.01, 'time_budget': 5.0, 'confidences': {}, 'timings': {}, 'skipped': [],
+            'timed_out': [], 'text_regions': None}
+
+
+def test_simulated_ocr_fallback_is_not_cached(client, monkeypatch):
+    monkeypatch.setattr(main, 'TESSERACT_AVAILABLE', True)
+    monkeypatch.setattr(main, 'ocr_image_to_string', lambda image, psm=6: '')
+    monkeypatch.setattr(main, 'analysis_cache', AnalysisCache(ttl=60))
+
+    def analyze(client, seed):
+        response = client.post('/api/forensics/analyze', files={'image': ('receipt.png', png_bytes(seed), 'image/png')})
+        return response.json()['processingDetails']
+
+    # Tesseract ran but found nothing: the random receipt must not be served again
+    monkeypatch.setattr(main, 'run_ocr_variants', lambda gray, time_budget=None: _ocr_run(''))
+    assert analyze(client, 7)['ocr']['simulatedFallback']
+    assert analyze(client, 7)['cache']['ocr'] == 'miss'
+
+    monkeypatch.setattr(main, 'run_ocr_variants', lambda gray, time_budget=None: _ocr_run('Paid Rs 500'))
+    assert analyze(client, 8)['cache']['ocr'] == 'miss'
+    assert analyze(client, 8)['cache']['ocr'] == 'hit'
@@ -0,0 +1,48 @@
+"""
+Batch endpoints: one NDJSON line per item in completion order, failing items reported on their line,
+then a summary line
+"""
+
+import base64
+import json
+
+import main
+from conftest import png_bytes
+
+
+def _lines(response) -> list:
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_batch_streams_items_and_summary(client):
+    items = [{'id': 'a', 'image': base64.b64encode(png_bytes(1)).decode()},
+             {'image': base64.b64encode(b'not an image').decode()},
+             {'id': 'c', 'image': base64.b64encode(png_bytes(3)).decode()}]
+
+    lines = _lines(client.post('/api/forensics/analyze/batch', json={'items': items}))
+
+    results = {line['index']: line for line in lines[:-1]}
+    assert sorted(results) == [0, 1, 2]
+    assert [results[i]['id'] for i in range(3)] == ['a', '1', 'c']
+    assert results[0]['ok'] and 'forgeryScore' in results[0]['result']
+    assert not results[1]['ok'] and results[1]['error']['status'] == 400
+    assert lines[-1]['summary']['total'] == 3
+    assert (lines[-1]['summary']['succeeded'], lines[-1]['summary']['failed']) == (2, 1)
+
+
+def test_multipart_batch_uses_file_names(client):
+    files = [('files', ('first.png', png_bytes(4), 'image/png')), ('files', ('second.png', png_bytes(5), 'image/png'))]
+
+    lines = _lines(client.post('/api/forensics/analyze/batch/upload', files=files))
+
+    assert sorted(line['id'] for line in lines[:-1]) == ['first.png', 'second.png']
+    assert lines[-1]['summary']['succeeded'] == 2
+
+
+def test_empty_and_oversized_batches_are_refused(client, monkeypatch):
+    assert client.post('/api/forensics/analyze/batch', json={'items': []}).status_code == 400
+    monkeypatch.setattr(main, 'BATCH_MAX_BYTES', 100)
+    files = [('files', ('first.png', png_bytes(6), 'image/png'))]
+    assert client.post('/api/forensics/analyze/batch/upload', files=files).status_code == 413
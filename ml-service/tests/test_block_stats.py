@@ -0,0 +1,39 @@
+"""
+block_stats against the per-tile loops it replaced
+"""
+
+import numpy as np
+import pytest
+
+from block_stats import block_stats, channel_histograms, tile_count
+
+
+@pytest.mark.parametrize('shape, tile', [((64, 64, 3), 8), ((101, 97, 3), 8), ((120, 233), 16), ((480, 640, 3), 160)])
+def test_block_stats_match_tile_loop(shape, tile):
+    array = np.random.default_rng(sum(shape)).integers(0, 256, shape, dtype=np.uint8)
+    height, width = shape[:2]
+    # Baseline forgery loop: tiles starting in the top-left 64x64 corner
+    expected = [np.var(array[i:i + tile, j:j + tile])
+                for i in range(0, min(height - tile, 64), tile)
+                for j in range(0, min(width - tile, 64), tile)]
+
+    stats = block_stats(array, tile, tile_count(height, tile, min(height - tile, 64)),
+                        tile_count(width, tile, min(width - tile, 64)))
+
+    np.testing.assert_allclose(stats['var'].ravel(), expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(stats['std'], np.sqrt(stats['var']))
+
+
+def test_full_grid_means():
+    array = np.random.default_rng(1).integers(0, 256, (50, 70, 3), dtype=np.uint8)
+    stats = block_stats(array, 10)
+    assert stats['grid'] == (5, 7)
+    assert stats['mean'][2, 3] == pytest.approx(np.mean(array[20:30, 30:40]))
+
+
+def test_channel_histograms_match_np_histogram():
+    array = np.random.default_rng(2).integers(0, 256, (40, 30, 3), dtype=np.uint8)
+    histograms = channel_histograms(array)
+    for channel in range(3):
+        expected, _ = np.histogram(array[:, :, channel], bins=256, range=(0, 256))
+        np.testing.assert_array_equal(histograms[channel], expected)
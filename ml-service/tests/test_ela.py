@@ -0,0 +1,37 @@
+"""
+In-memory ELA against the temp-file JPEG round trip it replaced
+"""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import main
+from ela import run_ela
+from image_context import ImageContext
+
+
+@pytest.mark.parametrize('quality', [75, 90])
+def test_ela_matches_file_round_trip(tmp_path, quality):
+    gray = cv2.GaussianBlur(np.random.default_rng(quality).integers(0, 256, (120, 160), dtype=np.uint8), (0, 0), 2)
+    # Baseline error_level_analysis: write the JPEG to disk and read it back
+    path = os.path.join(tmp_path, 'ela.jpg')
+    cv2.imwrite(path, gray, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    expected = np.abs(gray.astype(np.float32) - cv2.imread(path, cv2.IMREAD_GRAYSCALE).astype(np.float32))
+
+    result = run_ela(gray, (quality,))[quality]
+
+    np.testing.assert_array_equal(result['diff'], expected)
+    assert result['mean'] == pytest.approx(float(np.mean(expected)))
+    assert result['std'] == pytest.approx(float(np.std(expected)))
+
+
+def test_deepfake_ela_is_memoized():
+    rgb = np.random.default_rng(1).integers(0, 256, (96, 128, 3), dtype=np.uint8)
+    ctx = ImageContext(Image.fromarray(rgb))
+    main.detect_deepfake_image(ctx.image, explain=False, ctx=ctx)
+    assert ctx.stats()['ela:swapped_gray:90']['computed'] == 1
+    assert main.error_level_analysis(ctx.swapped_gray, ctx=ctx) == main.error_level_analysis(ctx.swapped_gray)
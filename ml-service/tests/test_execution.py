@@ -0,0 +1,82 @@
+"""
+WorkloadPool admission: workers + queue_size calls are admitted, the next one is refused with
+503 (or 429) and Retry-After, and check() refuses before any work is read
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import execution
+from execution import ServiceOverloaded, WorkloadPool
+
+
+async def _fill(pool: WorkloadPool, release: threading.Event, count: int) -> tuple:
+    admitted = []
+    tasks = [asyncio.ensure_future(pool.run(release.wait, on_admitted=lambda i=i: admitted.append(i)))
+             for i in range(count)]
+    await asyncio.sleep(0.05)
+    return tasks, admitted
+
+
+def test_refuses_beyond_capacity():
+    pool = WorkloadPool('test', workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        tasks, admitted = await _fill(pool, release, 2)
+        assert admitted == [0, 1]
+        assert pool.stats()['in_flight'] == 2
+        with pytest.raises(ServiceOverloaded) as refused:
+            await pool.run(release.wait)
+        with pytest.raises(ServiceOverloaded):
+            pool.check()
+        release.set()
+        await asyncio.gather(*tasks)
+        return refused.value
+
+    try:
+        refused = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert refused.status_code == 503
+    assert int(refused.headers['Retry-After']) >= 1
+    stats = pool.stats()
+    assert stats['rejected'] == 2 and stats['completed'] == 2 and stats['in_flight'] == 0
+
+
+def test_overload_status_429(monkeypatch):
+    monkeypatch.setattr(execution, 'EXEC_OVERLOAD_STATUS', 429)
+    pool = WorkloadPool('test', workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        tasks, _ = await _fill(pool, release, 1)
+        try:
+            await pool.run(release.wait)
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+
+    try:
+        with pytest.raises(ServiceOverloaded) as refused:
+            asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert refused.value.status_code == 429
+
+
+def test_errors_free_their_slot():
+    pool = WorkloadPool('test', workers=1, queue_size=0)
+
+    async def scenario():
+        with pytest.raises(ZeroDivisionError):
+            await pool.run(lambda: 1 / 0)
+        return await pool.run(lambda: 'ok')
+
+    try:
+        assert asyncio.run(scenario()) == 'ok'
+    finally:
+        pool.shutdown()
+    assert pool.stats()['errors'] == 1
@@ -0,0 +1,21 @@
+import numpy as np
+
+from explanation_store import ExplanationStore
+
+
+def test_update_recounts_record_bytes():
+    store = ExplanationStore(max_entries=8, max_bytes=10_000, ttl=60)
+    analysis_id = store.put({'kind': 'image', 'image': np.zeros(1000, np.uint8)})
+    assert store.update(analysis_id, 'gradcam', [np.zeros(2000, np.uint8)])
+    assert store._bytes == 3000
+    assert store.get(analysis_id)['gradcam'][0].nbytes == 2000
+
+
+def test_update_evicts_over_budget():
+    store = ExplanationStore(max_entries=8, max_bytes=5000, ttl=60)
+    first = store.put({'image': np.zeros(2000, np.uint8)})
+    second = store.put({'image': np.zeros(2000, np.uint8)})
+    assert store.update(second, 'gradcam', [np.zeros(2000, np.uint8)])
+    assert store.get(first) is None
+    assert store._bytes == 4000
+    assert not store.update(first, 'gradcam', None)
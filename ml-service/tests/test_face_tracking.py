@@ -0,0 +1,104 @@
+"""
+FaceTracker with a stubbed detector: a textured patch moved across synthetic frames is followed by
+optical flow, the detector runs on keyframes and after a lost track, and boxes are mapped back to
+full resolution and clipped to the frame
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+import face_detection
+from face_detection import FaceTracker, _to_full, track_faces
+from video_sampler import gap_offsets, track_targets
+
+PATCH = 48
+
+
+def _patch(seed: int) -> np.ndarray:
+    noise = np.random.default_rng(seed).integers(0, 256, (PATCH, PATCH)).astype(np.float32)
+    return cv2.GaussianBlur(noise, (0, 0), 1.5).clip(0, 255).astype(np.uint8)
+
+
+def _frame(x: int, y: int, patch: np.ndarray, shape=(240, 320)) -> np.ndarray:
+    frame = np.full(shape, 90, dtype=np.uint8)
+    frame[y:y + patch.shape[0], x:x + patch.shape[1]] = patch
+    return frame
+
+
+class StubDetector:
+    """Stands in for _detect_small: returns box (full-resolution) scaled to the working copy"""
+
+    def __init__(self):
+        self.box, self.scale, self.calls = None, 1.0, []
+
+    def __call__(self, small):
+        self.calls.append(self.box)
+        return np.asarray([self.box], dtype=np.float64) * self.scale
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    stub = StubDetector()
+    monkeypatch.setattr(face_detection, '_detect_small', stub)
+    return stub
+
+
+def test_box_follows_patch(detector):
+    patch = _patch(0)
+    tracker = FaceTracker(keyframe_interval=4, max_side=0)
+    for step in range(9):
+        x, y = 40 + 4 * step, 30 + 3 * step
+        detector.box = (x, y, PATCH, PATCH)
+        boxes = tracker.update(_frame(x, y, patch))
+        assert boxes.shape == (1, 4)
+        assert np.abs(boxes[0] - [x, y, PATCH, PATCH]).max() <= 2
+    # Keyframes at frames 0, 5 (after 4 tracked frames) and nowhere else
+    assert [box[0] for box in detector.calls] == [40, 60]
+    assert tracker.stats() == {'frames': 9, 'keyframes': 2, 'tracked': 7, 'redetections': 0}
+
+
+def test_lost_track_is_redetected(detector):
+    tracker = FaceTracker(keyframe_interval=10, max_side=0)
+    detector.box = (50, 50, PATCH, PATCH)
+    tracker.update(_frame(50, 50, _patch(1)))
+    tracker.update(_frame(52, 51, _patch(1)))
+    # A different patch: no corner survives the forward-backward check
+    detector.box = (54, 52, PATCH, PATCH)
+    boxes = tracker.update(_frame(54, 52, _patch(2)))
+    assert tracker.redetections == 1
+    assert len(detector.calls) == 2
+    assert boxes.tolist() == [[54, 52, PATCH, PATCH]]
+
+
+def test_no_face_detects_every_frame(detector, monkeypatch):
+    monkeypatch.setattr(face_detection, '_detect_small', lambda small: np.zeros((0, 4)))
+    faces, stats = track_faces([_frame(0, 0, _patch(3))] * 3, keyframe_interval=10)
+    assert [len(boxes) for boxes in faces] == [0, 0, 0]
+    assert stats['keyframes'] == 3
+
+
+def test_downscaled_boxes_map_to_full_resolution(detector):
+    patch = cv2.resize(_patch(4), (PATCH * 2, PATCH * 2))
+    detector.box, detector.scale = (100, 80, PATCH * 2, PATCH * 2), 0.5
+    tracker = FaceTracker(keyframe_interval=10, max_side=320)
+    boxes = tracker.update(_frame(100, 80, patch, shape=(480, 640)))
+    assert boxes.tolist() == [[100, 80, PATCH * 2, PATCH * 2]]
+    boxes = tracker.update(_frame(108, 84, patch, shape=(480, 640)))
+    assert np.abs(boxes[0] - [108, 84, PATCH * 2, PATCH * 2]).max() <= 3
+
+
+def test_to_full_scales_and_clips():
+    boxes = _to_full(np.array([[10.0, 10.0, 20.0, 20.0], [150.0, 40.0, 30.0, 30.0], [-2.0, 5.0, 8.0, 8.0]]),
+                     0.5, (100, 320))
+    assert boxes.dtype == np.int32
+    assert boxes.tolist() == [[20, 20, 40, 40], [300, 80, 20, 20], [0, 10, 16, 16]]
+    assert _to_full(np.zeros((0, 4)), 0.5, (100, 100)).shape == (0, 4)
+
+
+def test_track_targets_cover_analyzed_frames():
+    analyzed = [0, 20, 40]
+    assert gap_offsets(20, 4) == [0, 5, 10, 15]
+    assert gap_offsets(3, 4) == [0, 1, 2]  # Short gap: consecutive frames
+    assert track_targets(analyzed, 4) == [0, 5, 10, 15, 20, 25, 30, 35, 40]
+    assert track_targets(analyzed, 1) == []
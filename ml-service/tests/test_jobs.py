@@ -0,0 +1,113 @@
+"""
+JobStore: deduplication by key, and cancellation before and after the pool has accepted a job
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import jobs
+from execution import AnalysisExecutor
+from jobs import CANCELLED, SUCCEEDED, JobStore, job_progress
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    # Fresh pools: the app's own are shut down when a TestClient exits
+    executor = AnalysisExecutor()
+    monkeypatch.setattr(jobs, 'analysis_executor', executor)
+    yield executor
+    executor.shutdown()
+
+
+def _analysis(started: threading.Event, release: threading.Event, seen: list):
+    started.set()
+    release.wait(5)
+    seen.append('checkpoint')
+    job_progress(0.5, 'working')
+    seen.append('finished')
+    return {'ok': True}
+
+
+def test_same_key_returns_existing_job(executor):
+    store = JobStore(max_entries=10, ttl=60, max_active=4)
+    cleaned = []
+
+    async def scenario():
+        first, created = store.submit('test', 'video', lambda: {'ok': True}, (), key='video:abc',
+                                      cleanup=lambda: cleaned.append('first'))
+        second, created_again = store.submit('test', 'video', lambda: {'ok': False}, (), key='video:abc',
+                                             cleanup=lambda: cleaned.append('second'))
+        assert (created, created_again) == (True, False)
+        assert second is first
+        await first.task
+        return first
+
+    job = asyncio.run(scenario())
+    assert job.status == SUCCEEDED and job.result == {'ok': True}
+    assert cleaned == ['second', 'first']
+    assert store.stats()['deduplicated'] == 1
+
+
+def test_cancel_running_job_waits_for_its_checkpoint(executor):
+    store = JobStore(max_entries=10, ttl=60, max_active=4)
+    started, release, seen, cleaned = threading.Event(), threading.Event(), [], []
+
+    async def scenario():
+        job, _ = store.submit('test', 'video', _analysis, (started, release, seen),
+                              cleanup=lambda: cleaned.append(time.time()))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        assert job.admitted
+        store.cancel(job.id)
+        # The worker is not abandoned: the job ends (and cleans up) only once the analysis stops
+        await asyncio.sleep(0.05)
+        assert not cleaned and not job.task.done()
+        release.set()
+        await job.task
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == CANCELLED
+    assert seen == ['checkpoint'] and len(cleaned) == 1
+
+
+def test_cancel_before_admission_drops_the_job(executor):
+    store = JobStore(max_entries=10, ttl=60, max_active=4)
+    cleaned = []
+
+    async def scenario():
+        job, _ = store.submit('test', 'video', lambda: {'ok': True}, (), cleanup=lambda: cleaned.append(1))
+        store.cancel(job.id)
+        await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    job = asyncio.run(scenario())
+    assert not job.admitted
+    assert job.status == CANCELLED and cleaned == [1]
+    assert store.stats()['cancelled'] == 1
+
+
+def test_cancel_admitted_queued_job_stops_at_first_checkpoint(executor):
+    store = JobStore(max_entries=10, ttl=60, max_active=4)
+    busy, ran = threading.Event(), []
+
+    async def scenario():
+        # Keep the video workers busy so the job is admitted but still queued on the pool
+        blockers = [asyncio.ensure_future(executor.run('video', busy.wait, 5))
+                    for _ in range(executor.pools['video'].workers)]
+        await asyncio.sleep(0.05)
+        job, _ = store.submit('test', 'video', lambda: ran.append(1), ())
+        await asyncio.sleep(0.05)
+        assert job.admitted and job.status == 'queued'
+        store.cancel(job.id)
+        await asyncio.sleep(0.05)
+        assert not job.task.done()
+        busy.set()
+        await asyncio.gather(job.task, *blockers)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == CANCELLED and not ran
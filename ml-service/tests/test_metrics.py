@@ -0,0 +1,70 @@
+"""
+Prometheus text exposition: cumulative histogram buckets, label escaping, scrape-time collectors,
+and /metrics answering 404 when metrics are disabled
+"""
+
+import pytest
+
+import main
+import metrics
+from metrics import Counter, Histogram, register_collector, render_metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Metrics enabled, with an empty registry so the service's own metrics stay out of the output"""
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(metrics, '_registry', [])
+    monkeypatch.setattr(metrics, '_collectors', [])
+
+
+def _samples(text: str) -> dict:
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram('test_seconds', 'Test durations', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0, 3.0):
+        histogram.observe(value, 'ocr')
+    samples = _samples(render_metrics())
+    assert samples['test_seconds_bucket{stage="ocr",le="0.1"}'] == '2'
+    assert samples['test_seconds_bucket{stage="ocr",le="1.0"}'] == '3'
+    assert samples['test_seconds_bucket{stage="ocr",le="+Inf"}'] == '5'
+    assert samples['test_seconds_count{stage="ocr"}'] == samples['test_seconds_bucket{stage="ocr",le="+Inf"}']
+    assert float(samples['test_seconds_sum{stage="ocr"}']) == pytest.approx(5.65)
+
+
+def test_label_values_are_escaped(registry):
+    Counter('test_total', 'Test counter', ('path',)).inc('a"b\\c\nd', amount=2)
+    assert 'test_total{path="a\\"b\\\\c\\nd"} 2' in render_metrics().splitlines()
+
+
+def test_collector_families(registry):
+    register_collector(lambda: [('test_pool_busy', 'gauge', 'Busy workers', [({'pool': 'image'}, 3),
+                                                                              ({'pool': 'video'}, None)])])
+    lines = render_metrics().splitlines()
+    assert '# HELP test_pool_busy Busy workers' in lines
+    assert '# TYPE test_pool_busy gauge' in lines
+    assert 'test_pool_busy{pool="image"} 3' in lines
+    assert not any(line.startswith('test_pool_busy{pool="video"}') for line in lines)  # None is skipped
+    assert any(line.startswith('process_cpu_seconds_total ') for line in lines)
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', False)
+    monkeypatch.setattr(metrics, '_registry', [])
+    Histogram('test_seconds', 'Test durations').observe(1.0)
+    assert not any(line.startswith('test_seconds_') for line in render_metrics().splitlines())
+
+
+def test_endpoint_404_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(main, 'METRICS_ENABLED', False)
+    assert client.get('/metrics').status_code == 404
+
+
+def test_endpoint_serves_exposition(client, monkeypatch):
+    monkeypatch.setattr(main, 'METRICS_ENABLED', True)
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert '# TYPE ml_stage_seconds histogram' in response.text
@@ -0,0 +1,70 @@
+"""
+run_ocr_variants against a stub backend: parallel and sequential runs agree, and variants still
+running when the time budget is spent are reported as timed out instead of holding up the result
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+import ocr_engine
+from ocr_engine import run_ocr_variants
+
+
+class StubBackend:
+    """Text depends on the preprocessed pixels; the 2x 'upscaled' variant is slow"""
+    name = 'stub'
+
+    def __init__(self, frame_shape, slow=0.0):
+        self.frame_shape = frame_shape
+        self.slow = slow
+
+    def recognize(self, image, psm=None, timeout=0):
+        if image.shape != self.frame_shape:
+            time.sleep(self.slow)
+        words = int(np.count_nonzero(image > 127)) % 7 + 1
+        return ' '.join(['word'] * words), [80.0] * words
+
+
+@pytest.fixture
+def gray():
+    return np.random.default_rng(0).integers(0, 256, (60, 80), dtype=np.uint8)
+
+
+def test_parallel_matches_sequential(gray, monkeypatch):
+    monkeypatch.setattr(ocr_engine, '_backend', StubBackend(gray.shape))
+    runs = [run_ocr_variants(gray, parallel=parallel, time_budget=0, strategy='all', use_text_regions=False)
+            for parallel in (False, True)]
+    for key in ('text', 'method', 'results', 'timed_out', 'failed'):
+        assert runs[0][key] == runs[1][key]
+    assert runs[1]['mode'] == 'parallel'
+    assert runs[1]['timed_out'] == [] and len(runs[1]['results']) == len(ocr_engine.OCR_VARIANTS)
+
+
+def test_time_budget_drops_slow_variant(gray, monkeypatch):
+    monkeypatch.setattr(ocr_engine, '_backend', StubBackend(gray.shape, slow=1.5))
+    result = run_ocr_variants(gray, parallel=True, time_budget=0.5, strategy='all', use_text_regions=False)
+    assert result['timed_out'] == ['upscaled']
+    assert result['failed'] == []
+    assert result['elapsed'] < 1.2
+    assert result['method'] != 'upscaled' and result['text']
+    assert 'upscaled' not in result['timings']
+
+
+class FailingBackend(StubBackend):
+    """Raises a RuntimeError (as TesseractError does) for the 'upscaled' variant, well inside the budget"""
+
+    def recognize(self, image, psm=None, timeout=0):
+        if image.shape != self.frame_shape:
+            raise RuntimeError('tesseract: unreadable image')
+        return super().recognize(image, psm, timeout)
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_engine_errors_are_failures_not_timeouts(gray, monkeypatch, parallel):
+    monkeypatch.setattr(ocr_engine, '_backend', FailingBackend(gray.shape))
+    result = run_ocr_variants(gray, parallel=parallel, time_budget=30, strategy='all', use_text_regions=False)
+    assert result['failed'] == ['upscaled']
+    assert result['timed_out'] == []
+    assert len(result['results']) == len(ocr_engine.OCR_VARIANTS) - 1
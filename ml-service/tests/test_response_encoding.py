@@ -0,0 +1,98 @@
+"""
+Accept-Encoding negotiation and CompressionMiddleware: large JSON bodies are compressed, small,
+streamed, non-JSON and already-encoded bodies pass through untouched
+"""
+
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import response_encoding
+from response_encoding import CompressionMiddleware, FastJSONResponse, choose_encoding
+
+ITEMS = [{'index': i, 'label': 'transaction'} for i in range(200)]
+
+
+@pytest.mark.parametrize('header, brotli, expected', [
+    ('', True, None),
+    ('gzip', True, 'gzip'),
+    ('gzip, deflate, br', True, 'br'),
+    ('gzip, deflate, br', False, 'gzip'),
+    ('br;q=0.5, gzip', True, 'gzip'),
+    ('*', True, 'br'),
+    ('*;q=0', True, None),
+    ('gzip;q=0, *', False, None),  # '*' does not override an explicit refusal
+    ('gzip;q=0, *', True, 'br'),
+    ('br;q=0, gzip;q=0.2, *;q=0.8', True, 'gzip'),
+    ('identity', True, None),
+    ('gzip;q=abc, br;q=0.1', True, 'br'),
+])
+def test_choose_encoding(monkeypatch, header, brotli, expected):
+    monkeypatch.setattr(response_encoding, 'BROTLI_AVAILABLE', brotli)
+    assert choose_encoding(header) == expected
+
+
+@pytest.fixture(scope='module')
+def client():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get('/large')
+    def large():
+        return {'items': ITEMS}
+
+    @app.get('/small')
+    def small():
+        return {'ok': True}
+
+    @app.get('/stream')
+    def stream():
+        return StreamingResponse(((b'{"line": %d}\n' % i) * 50 for i in range(3)), media_type='application/x-ndjson')
+
+    @app.get('/binary')
+    def binary():
+        return Response(b'\0' * 2000, media_type='application/octet-stream')
+
+    @app.get('/encoded')
+    def encoded():
+        return Response(gzip.compress(b'x' * 2000), media_type='text/plain', headers={'Content-Encoding': 'gzip'})
+
+    @app.get('/text')
+    def text():
+        return PlainTextResponse('fraud ' * 500)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_compresses_large_json(client, monkeypatch):
+    monkeypatch.setattr(response_encoding, 'BROTLI_AVAILABLE', False)
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert int(response.headers['content-length']) < len(response.content)
+    assert response.json() == {'items': ITEMS}
+    assert client.get('/text', headers={'Accept-Encoding': 'gzip'}).headers['content-encoding'] == 'gzip'
+
+
+@pytest.mark.parametrize('path, accept', [
+    ('/large', 'gzip;q=0, *'),
+    ('/large', ''),
+    ('/small', 'gzip'),
+    ('/stream', 'gzip'),
+    ('/binary', 'gzip'),
+])
+def test_passes_through(client, monkeypatch, path, accept):
+    monkeypatch.setattr(response_encoding, 'BROTLI_AVAILABLE', False)
+    response = client.get(path, headers={'Accept-Encoding': accept})
+    assert 'content-encoding' not in response.headers
+    assert response.status_code == 200
+
+
+def test_keeps_existing_encoding(client):
+    response = client.get('/encoded', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.text == 'x' * 2000
@@ -0,0 +1,44 @@
+"""
+spectral.spectrum_features against the baseline |fftshift(np.fft.fft2(gray))| statistics
+"""
+
+import numpy as np
+import pytest
+
+from spectral import spectrum_features
+
+
+def baseline_features(gray: np.ndarray) -> dict:
+    """The statistics frequency_domain_analysis computed before the spectral engine"""
+    magnitude = np.abs(np.fft.fftshift(np.fft.fft2(gray)))
+    h, w = magnitude.shape
+    mean = np.mean(magnitude)
+    grid_score = 0
+    for i in range(0, h, h // 10):
+        for j in range(0, w, w // 10):
+            if magnitude[i, j] > mean * 2:
+                grid_score += 1
+    return {'mean': mean, 'var': np.var(magnitude), 'grid_score': grid_score}
+
+
+@pytest.mark.parametrize('shape', [(64, 64), (101, 97), (120, 233), (1080, 2337)])
+def test_matches_baseline_fft2(shape):
+    rng = np.random.default_rng(sum(shape))
+    # Smooth noise plus a periodic pattern, so the grid samples are not all below the threshold
+    gray = rng.normal(128, 20, shape)
+    gray += 40 * np.sin(np.arange(shape[1]) * 2 * np.pi / 8)[None, :]
+    expected = baseline_features(gray)
+
+    features = spectrum_features(gray, fast_len=False)
+
+    assert features['mean'] == pytest.approx(expected['mean'], rel=1e-9)
+    assert features['var'] == pytest.approx(expected['var'], rel=1e-6)
+    assert features['grid_score'] == expected['grid_score']
+    assert not features['padded']
+
+
+def test_default_does_not_pad():
+    gray = np.random.default_rng(0).normal(128, 20, (108, 233))
+    features = spectrum_features(gray)
+    assert features['shape'] == gray.shape
+    assert features['grid_score'] == baseline_features(gray)['grid_score']
@@ -0,0 +1,70 @@
+"""
+sample_video against the sequential loop it replaced: same frame numbers and pixels, with a fraction
+of the frames decoded
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from video_sampler import sample_video
+
+FRAME_COUNT = 300
+
+
+@pytest.fixture(scope='module')
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('video') / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (96, 64))
+    if not writer.isOpened():
+        pytest.skip("OpenCV cannot write MJPG video here")
+    rng = np.random.default_rng(0)
+    for index in range(FRAME_COUNT):
+        frame = rng.integers(0, 256, (64, 96, 3), dtype=np.uint8)
+        cv2.putText(frame, str(index), (4, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def _sequential(path: str, count: int) -> tuple:
+    """Baseline: count every frame by reading it, then keep every (frame_count // count)-th one"""
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    interval = max(1, len(frames) // count)
+    indices = list(range(0, len(frames), interval))[:count]
+    return indices, [frames[index] for index in indices], frames
+
+
+@pytest.mark.parametrize('seek_gap', [0, 10 ** 6])
+def test_matches_sequential_loop(clip, seek_gap):
+    indices, frames, _ = _sequential(clip, 15)
+    sample = sample_video(clip, count=15, max_side=0, seek_gap=seek_gap)
+    assert sample.indices == indices
+    assert all(np.array_equal(a, b) for a, b in zip(sample.frames, frames))
+    assert sample.frame_count == FRAME_COUNT
+    # Decoding stops at the last sampled frame even without seeking
+    assert sample.stats()['decoded_frames'] <= indices[-1] + 1
+
+
+def test_seeking_decodes_a_fraction(clip):
+    sample = sample_video(clip, count=5, max_side=0, seek_gap=0)
+    stats = sample.stats()
+    assert stats['seeks'] > 0
+    assert stats['decoded_frames'] <= FRAME_COUNT // 10
+
+
+def test_tracked_grays_between_analyzed_frames(clip):
+    indices, _, frames = _sequential(clip, 15)
+    sample = sample_video(clip, count=15, track_steps=4, max_side=0)
+    assert set(indices) <= set(sample.gray_indices)
+    assert sample.gray_indices == sorted(sample.gray_indices) and sample.gray_indices[-1] == indices[-1]
+    assert len(sample.gray_indices) == 4 * (len(indices) - 1) + 1
+    for index, gray in zip(sample.gray_indices, sample.grays):
+        assert np.array_equal(gray, cv2.cvtColor(frames[index], cv2.COLOR_BGR2GRAY))
@@ -0,0 +1,138 @@
+"""
+Deepfake CNN Export Tool
+Converts the Keras deepfake classifier for the lightweight CPU backends (DEEPFAKE_CNN_BACKEND):
+  tflite - TFLite with dynamic-range INT8 weights (tf.lite.Optimize.DEFAULT)
+  onnx   - ONNX via tf2onnx, then ONNX Runtime dynamic INT8 quantization
+and checks parity: the Keras model and every exported model score the same sample images
+(files from --images plus synthetic ones); the tool fails if any probability differs by more than --tolerance.
+
+Usage (from ml-service/, needs tensorflow, tf2onnx and onnxruntime):
+    python tools/export_deepfake_cnn.py [--keras-model models/deepfake_cnn.keras] [--out models]
+                                        [--backends tflite,onnx] [--images samples/] [--tolerance 0.05]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.disable(logging.CRITICAL)
+
+import cv2  # noqa: E402
+import main  # noqa: E402
+from inference_backends import load_classifier  # noqa: E402
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_keras_model(path: str, out_dir: str):
+    """
+    The classifier to export: the saved model at path, or a freshly built one saved to out_dir
+    (serve it with DEEPFAKE_CNN_MODEL_PATH so every backend uses the same weights)
+    """
+    if not main._load_tensorflow():
+        sys.exit("TensorFlow is required to export the model")
+    if path and os.path.exists(path):
+        return main.keras.models.load_model(path, compile=False), path
+    model = main.build_deepfake_cnn_model(main.DEEPFAKE_CNN_INPUT_SHAPE)
+    if model is None:
+        sys.exit("Could not build the deepfake CNN")
+    saved = os.path.join(out_dir, 'deepfake_cnn.keras')
+    model.save(saved)
+    return model, saved
+
+
+def export_tflite(model, path: str):
+    tf = main.tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]  # INT8 weights, float32 activations and I/O
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, path: str):
+    import tf2onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tf = main.tf
+    float_path = path.replace('_int8', '_fp32') if '_int8' in path else path + '.fp32.onnx'
+    signature = [tf.TensorSpec((None, *main.DEEPFAKE_CNN_INPUT_SHAPE), tf.float32, name='images')]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=float_path)
+    # ONNX Runtime's CPU ConvInteger kernels take unsigned 8-bit weights
+    quantize_dynamic(float_path, path, weight_type=QuantType.QUInt8)
+
+
+def sample_batch(images_dir: str, synthetic: int) -> tuple:
+    """(names, preprocessed batch) of the images in images_dir plus synthetic photo-like images"""
+    names, images = [], []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(images_dir, name), cv2.IMREAD_COLOR)
+                if image is not None:
+                    names.append(name)
+                    images.append(image)
+    rng = np.random.default_rng(0)
+    for i in range(synthetic):
+        noise = (rng.random((360, 480, 3)) * 255).astype(np.uint8)
+        images.append(cv2.GaussianBlur(noise, (2 * i + 1, 2 * i + 1), 0))
+        names.append(f"synthetic_{i}")
+    return names, main.prepare_cnn_batch(images)
+
+
+def timed(run, batch, repeat: int = 3) -> tuple:
+    outputs = run(batch)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run(batch)
+    return np.asarray(outputs)[:, 0], (time.perf_counter() - start) / repeat
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--keras-model', default=main.DEEPFAKE_CNN_MODEL_PATH)
+    parser.add_argument('--out', default='models')
+    parser.add_argument('--backends', default='tflite,onnx')
+    parser.add_argument('--images', default='')
+    parser.add_argument('--synthetic', type=int, default=8)
+    parser.add_argument('--tolerance', type=float, default=0.05)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    model, keras_path = load_keras_model(args.keras_model, args.out)
+    names, batch = sample_batch(args.images, args.synthetic)
+    reference, reference_time = timed(lambda b: model(b, training=False).numpy(), batch)
+    print(f"keras model: {keras_path}, {len(names)} sample images")
+    print(f"{'backend':>10} {'size':>9} {'batch':>9} {'max diff':>9} {'mean diff':>10} {'verdicts':>9}")
+    print(f"{'tensorflow':>10} {os.path.getsize(keras_path) / 2 ** 20:>7.1f}MB {reference_time * 1000:>7.1f}ms")
+
+    failed = False
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        path = os.path.join(args.out, f"deepfake_cnn_int8.{backend}")
+        if backend == 'tflite':
+            export_tflite(model, path)
+        elif backend == 'onnx':
+            export_onnx(model, path)
+        else:
+            sys.exit(f"Unknown backend: {backend}")
+
+        classifier = load_classifier(backend, path)
+        probabilities, batch_time = timed(classifier.run, batch)
+        diff = np.abs(probabilities - reference)
+        agree = int(np.sum((probabilities >= 0.5) == (reference >= 0.5)))
+        print(f"{backend:>10} {os.path.getsize(path) / 2 ** 20:>7.1f}MB {batch_time * 1000:>7.1f}ms "
+              f"{diff.max():>9.4f} {diff.mean():>10.4f} {agree:>4}/{len(names)}")
+        if diff.max() > args.tolerance:
+            failed = True
+            worst = int(np.argmax(diff))
+            print(f"{'':>10} parity FAILED: {names[worst]} keras={reference[worst]:.4f} {backend}={probabilities[worst]:.4f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,219 @@
+"""
+Upload Spooling
+Multipart media uploads and raw request bodies are copied to a temp file in fixed-size chunks with a
+size cap, so a clip is never held in memory as one bytes object (no base64 string, no decoded copy).
+Starlette already spools each part to disk past 1 MB; requests announcing a body over the cap are
+refused up front. Raw images are read into one bytes object that the decoders use without copying.
+"""
+
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+
+from fastapi import HTTPException, Request, UploadFile
+
+from service_config import BATCH_MAX_BYTES, UPLOAD_MAX_BYTES
+
+UPLOAD_CHUNK_SIZE = 2 ** 20
+
+# A multipart request carries the file plus form fields and boundaries; a base64 JSON body is 4/3 larger
+REQUEST_MAX_BYTES = UPLOAD_MAX_BYTES * 4 // 3 + 2 ** 20
+BATCH_REQUEST_MAX_BYTES = BATCH_MAX_BYTES * 4 // 3 + 2 ** 20
+
+# Endpoints taking many files in one body
+BATCH_PATH_PREFIX = '/api/forensics/analyze/batch'
+
+_SUFFIX_RE = re.compile(r'^\.[A-Za-z0-9]{1,8}$')
+
+# Content types sent as the file itself (anything else that is not JSON or multipart is refused)
+RAW_CONTENT_TYPES = ('application/octet-stream', 'image/', 'video/', 'audio/')
+
+
+def too_large(size: int, limit: int = UPLOAD_MAX_BYTES) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large ({size / 2 ** 20:.1f} MB). Maximum size is {limit / 2 ** 20:.0f} MB"
+    )
+
+
+def request_limit(path: str) -> tuple:
+    """(largest body, largest payload, 'file' or 'batch') accepted on a request path"""
+    if path.startswith(BATCH_PATH_PREFIX):
+        return BATCH_REQUEST_MAX_BYTES, BATCH_MAX_BYTES, 'batch'
+    return REQUEST_MAX_BYTES, UPLOAD_MAX_BYTES, 'file'
+
+
+def request_too_large(size: int, path: str) -> HTTPException:
+    _, max_size, what = request_limit(path)
+    return HTTPException(
+        status_code=413,
+        detail=f"Request too large ({size / 2 ** 20:.1f} MB). Maximum {what} size is {max_size / 2 ** 20:.0f} MB"
+    )
+
+
+async def read_json_body(request: Request) -> bytes:
+    """
+    A JSON request body, counted as it arrives
+    Raises: HTTPException 413 once it exceeds the path's limit, also for bodies sent without a Content-Length
+    """
+    max_request = request_limit(request.url.path)[0]
+    chunks, received = [], 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_request:
+            raise request_too_large(received, request.url.path)
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def upload_suffix(upload: UploadFile, default: str) -> str:
+    """Extension of the uploaded file name (decoders pick the demuxer from it), or default"""
+    suffix = os.path.splitext(upload.filename or '')[1]
+    return suffix.lower() if _SUFFIX_RE.match(suffix) else default
+
+
+def upload_size(upload: UploadFile) -> int:
+    """Bytes in an already received upload (its spooled file is rewound)"""
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(0)
+    return size
+
+
+def check_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> int:
+    """Size of a received upload; raises 400 when it is empty and 413 when it is over max_bytes"""
+    size = upload_size(upload)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    if size > max_bytes:
+        raise too_large(size, max_bytes)
+    return size
+
+
+async def _upload_chunks(upload: UploadFile):
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def spool_to_file(upload: UploadFile, suffix: str, max_bytes: int = UPLOAD_MAX_BYTES, digest=None) -> str:
+    """
+    Copy an upload into a new temp file, one chunk at a time
+    digest: hashlib object updated with the file bytes as they are copied
+    Returns: path of the file (the caller removes it)
+    Raises: HTTPException 413 as soon as more than max_bytes arrived (nothing is left on disk)
+    """
+    return await _spool_chunks(_upload_chunks(upload), suffix, max_bytes, digest)
+
+
+async def spool_body_to_file(request: Request, suffix: str, max_bytes: int = UPLOAD_MAX_BYTES, digest=None) -> str:
+    """Copy a raw request body into a new temp file as it arrives (see spool_to_file)"""
+    return await _spool_chunks(request.stream(), suffix, max_bytes, digest)
+
+
+async def _spool_chunks(chunks, suffix: str, max_bytes: int, digest) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix='upload_')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > max_bytes:
+                    raise too_large(written, max_bytes)
+                out.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if written == 0:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return path
+
+
+def decode_to_file(data: str, suffix: str, max_bytes: int = UPLOAD_MAX_BYTES) -> tuple:
+    """
+    Decode a base64 file into a new temp file (blocking: run it off the event loop)
+    Returns: (path of the file, SHA-256 of the decoded bytes); the caller removes the file
+    Raises: HTTPException 413 when the file is over max_bytes, 400 when it is empty or not base64
+    """
+    if len(data) * 3 // 4 > max_bytes:
+        raise too_large(len(data) * 3 // 4, max_bytes)
+    try:
+        file_data = base64.b64decode(data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid base64 data: {str(e)}")
+    if not file_data:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix='upload_')
+    with os.fdopen(fd, 'wb') as out:
+        out.write(file_data)
+    return path, hashlib.sha256(file_data).hexdigest()
+
+
+def body_kind(request: Request) -> str:
+    """'json', 'multipart' or 'raw' from the Content-Type; HTTPException 415 for anything else"""
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type in ('', 'application/json'):
+        return 'json'
+    if content_type == 'multipart/form-data':
+        return 'multipart'
+    if content_type.startswith(RAW_CONTENT_TYPES):
+        return 'raw'
+    raise HTTPException(status_code=415, detail=(
+        f"Unsupported Content-Type {content_type}. Send JSON (base64), multipart/form-data, "
+        f"or the file itself as application/octet-stream"
+    ))
+
+
+def body_suffix(request: Request, default: str) -> str:
+    """File extension for a raw body from its Content-Type (decoders pick the demuxer from it), or default"""
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    suffix = mimetypes.guess_extension(content_type) if content_type != 'application/octet-stream' else None
+    return suffix if suffix and _SUFFIX_RE.match(suffix) else default
+
+
+async def read_body(request: Request, max_bytes: int = UPLOAD_MAX_BYTES) -> bytes:
+    """
+    A raw request body as one bytes object, refused with 413 as soon as more than max_bytes arrived
+    (also when no Content-Length was announced) and 400 when empty
+    """
+    chunks, received = [], 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise too_large(received, max_bytes)
+        chunks.append(chunk)
+    if received == 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+def parse_json_field(value, name: str):
+    """A JSON object sent as a header or form field (e.g. manualData), or None when absent"""
+    if value is None or value == '':
+        return None
+    try:
+        parsed = json.loads(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON in {name}: {str(e)}")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail=f"{name} must be a JSON object")
+    return parsed
+
+
+def form_file(form, name: str) -> UploadFile:
+    """The file of a multipart form field; HTTPException 400 when it is missing or not a file"""
+    upload = form.get(name)
+    if upload is None or isinstance(upload, str):
+        raise HTTPException(status_code=400, detail=f"Missing file field '{name}'")
+    return upload
@@ -0,0 +1,269 @@
+"""
+Video Frame Sampler
+Decodes only the frames a video analysis samples instead of every frame up to the last one:
+frame count and fps come from the container metadata (no counting pass), and each target is reached
+by seeking (CAP_PROP_POS_FRAMES) or by grabbing through the gap without color conversion, whichever
+the costs measured so far say is cheaper.
+Frames can be downscaled as they are decoded. imageio is the fallback when OpenCV cannot open a file.
+"""
+
+import logging
+import math
+import time
+from typing import List
+
+import numpy as np
+
+from metrics import observe_stage
+from service_config import VIDEO_DECODE_MAX_SIDE, VIDEO_SEEK_MIN_GAP
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+try:
+    import imageio
+    IMAGEIO_AVAILABLE = True
+except ImportError:
+    IMAGEIO_AVAILABLE = False
+
+# Interval used when the frame count is unknown (streams, containers without an index)
+DEFAULT_INTERVAL = 30
+DEFAULT_FPS = 30
+
+
+class VideoSample:
+    """
+    Sampled frames of one video
+    frames: BGR frames for the full analysis, indices: their frame numbers
+    grays: gray frames for face tracking (the analyzed frames and the ones between them), gray_indices: their
+           frame numbers
+    """
+
+    def __init__(self, fps: float, frame_count: int, backend: str):
+        self.fps = fps
+        self.frame_count = frame_count
+        self.backend = backend
+        self.frames: List[np.ndarray] = []
+        self.indices: List[int] = []
+        self.grays: List[np.ndarray] = []
+        self.gray_indices: List[int] = []
+        self.decoded = 0
+        self.seeks = 0
+        self.truncated = False  # Decoding stopped before the last frame the metadata promised
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            'backend': self.backend,
+            'frame_count': self.frame_count,
+            'decoded_frames': self.decoded,
+            'seeks': self.seeks,
+            'seconds': round(self.seconds, 3),
+        }
+
+
+def frame_targets(frame_count: int, count: int) -> List[int]:
+    """count evenly spaced frame numbers from 0 (interval frame_count // count, as analyzed before)"""
+    if count <= 0 or frame_count <= 0:
+        return []
+    interval = max(1, frame_count // count)
+    return list(range(0, frame_count, interval))[:count]
+
+
+def gap_offsets(interval: int, track_steps: int) -> List[int]:
+    """Offsets of the tracked frames in a gap of interval frames (0 = the analyzed frame), consecutive when short"""
+    if interval <= track_steps:
+        return list(range(max(1, interval)))
+    return [step * interval // track_steps for step in range(track_steps)]
+
+
+def track_targets(analyzed: List[int], track_steps: int) -> List[int]:
+    """
+    Frame numbers to track faces through: the analyzed frames and track_steps - 1 evenly spaced frames in each
+    gap between them (none after the last). Empty when track_steps <= 1 (no tracking)
+    """
+    if track_steps <= 1 or len(analyzed) < 2:
+        return []
+    targets = set(analyzed)
+    for start, end in zip(analyzed, analyzed[1:]):
+        targets.update(start + offset for offset in gap_offsets(end - start, track_steps))
+    return sorted(targets)
+
+
+def _resize(frame: np.ndarray, max_side: int) -> np.ndarray:
+    height, width = frame.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return frame
+    scale = max_side / max(height, width)
+    return cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def _to_bgr(frame: np.ndarray) -> np.ndarray:
+    """imageio frame (RGB, RGBA or gray) as BGR"""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
+
+def _keep(sample: VideoSample, index: int, frame: np.ndarray, analyzed: set, temporal: set, max_side: int):
+    frame = _resize(frame, max_side)
+    if index in analyzed:
+        sample.frames.append(frame)
+        sample.indices.append(index)
+    if index in temporal:
+        sample.grays.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        sample.gray_indices.append(index)
+
+
+def _drop_trailing_grays(sample: VideoSample):
+    """Sequential reads: tracked frames after the last analyzed frame have nothing to feed"""
+    if sample.indices:
+        keep = sum(1 for index in sample.gray_indices if index <= sample.indices[-1])
+        del sample.grays[keep:], sample.gray_indices[keep:]
+
+
+def _average(previous: float, value: float) -> float:
+    return value if previous is None else 0.7 * previous + 0.3 * value
+
+
+def _sample_opencv(capture, count: int, track_steps: int, max_side: int, seek_gap: int) -> VideoSample:
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    sample = VideoSample(fps, frame_count or None, 'opencv')
+
+    if frame_count > 0:
+        analyzed = frame_targets(frame_count, count)
+        analyzed, temporal = set(analyzed), set(track_targets(analyzed, track_steps))
+        position = 0  # Number of the next frame the decoder returns
+        decode_cost = seek_cost = None  # Measured seconds per decoded frame / per seek and read
+        for target in sorted(analyzed | temporal):
+            skip = target - position
+            if skip > 0 and decode_cost is not None and seek_cost is not None:
+                # A seek restarts decoding at the previous keyframe: only worth it when faster than decoding through
+                seek = seek_cost < (skip + 1) * decode_cost
+            else:
+                seek = skip > seek_gap
+            started = time.perf_counter()
+            if seek:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+                sample.seeks += 1
+            while position < target and capture.grab():
+                position += 1
+                sample.decoded += 1
+            ok, frame = capture.read()
+            if not ok:
+                sample.truncated = True
+                break
+            elapsed = time.perf_counter() - started
+            if seek:
+                seek_cost = _average(seek_cost, elapsed)
+            else:
+                decode_cost = _average(decode_cost, elapsed / (skip + 1))
+            position += 1
+            sample.decoded += 1
+            _keep(sample, target, frame, analyzed, temporal, max_side)
+        return sample
+
+    # Unknown length: read sequentially, decoding every frame but converting only the sampled ones
+    offsets = set(gap_offsets(DEFAULT_INTERVAL, track_steps)) if track_steps > 1 else set()
+    index = 0
+    while len(sample.frames) < count:
+        analyzed = {index} if index % DEFAULT_INTERVAL == 0 else set()
+        temporal = {index} if index % DEFAULT_INTERVAL in offsets else set()
+        if not capture.grab():
+            break
+        sample.decoded += 1
+        if analyzed or temporal:
+            ok, frame = capture.retrieve()
+            if ok:
+                _keep(sample, index, frame, analyzed, temporal, max_side)
+        index += 1
+    _drop_trailing_grays(sample)
+    return sample
+
+
+def _sample_imageio(path: str, count: int, track_steps: int, max_side: int) -> VideoSample:
+    reader = imageio.get_reader(path)
+    try:
+        fps = reader.get_meta_data().get('fps', DEFAULT_FPS)
+        try:
+            # Metadata estimate; inf when unknown (never counts frames by decoding)
+            length = reader.get_length()
+        except Exception:
+            length = math.inf
+        frame_count = int(length) if length and math.isfinite(length) else 0
+        sample = VideoSample(fps, frame_count or None, 'imageio')
+
+        if frame_count > 0:
+            analyzed = frame_targets(frame_count, count)
+            analyzed, temporal = set(analyzed), set(track_targets(analyzed, track_steps))
+            for target in sorted(analyzed | temporal):
+                try:
+                    frame = reader.get_data(target)
+                except (IndexError, RuntimeError):
+                    break
+                sample.decoded += 1
+                _keep(sample, target, _to_bgr(frame), analyzed, temporal, max_side)
+            return sample
+
+        offsets = set(gap_offsets(DEFAULT_INTERVAL, track_steps)) if track_steps > 1 else set()
+        for index, frame in enumerate(reader):
+            sample.decoded += 1
+            analyzed = {index} if index % DEFAULT_INTERVAL == 0 else set()
+            temporal = {index} if index % DEFAULT_INTERVAL in offsets else set()
+            if analyzed or temporal:
+                _keep(sample, index, _to_bgr(frame), analyzed, temporal, max_side)
+            if len(sample.frames) >= count:
+                break
+        _drop_trailing_grays(sample)
+        return sample
+    finally:
+        reader.close()
+
+
+def sample_video(path: str, count: int = 15, track_steps: int = 1, max_side: int = None,
+                 seek_gap: int = None) -> VideoSample:
+    """
+    Decode count evenly spaced frames (BGR), and with track_steps > 1 gray frames to track faces through
+    (track_targets: the analyzed frames and track_steps - 1 frames in each gap between them)
+    max_side: downscale frames to this longest side as they are decoded (None = VIDEO_DECODE_MAX_SIDE, 0 = off)
+    seek_gap: frames to skip before seeking is first tried; afterwards the measured seek and decode
+              costs decide (None = VIDEO_SEEK_MIN_GAP)
+    """
+    if not CV2_AVAILABLE:
+        raise RuntimeError("OpenCV is required for video analysis")
+    max_side = VIDEO_DECODE_MAX_SIDE if max_side is None else max_side
+    seek_gap = VIDEO_SEEK_MIN_GAP if seek_gap is None else seek_gap
+    start = time.perf_counter()
+    sample = None
+    capture = cv2.VideoCapture(path)
+    try:
+        if capture.isOpened():
+            sample = _sample_opencv(capture, count, track_steps, max_side, seek_gap)
+    finally:
+        capture.release()
+    if (sample is None or sample.truncated or not sample.frames) and IMAGEIO_AVAILABLE:
+        # Some containers (e.g. animated GIF) report more frames than OpenCV's backend can decode
+        logger.info(f"OpenCV could not decode all sampled frames of {path}, trying imageio")
+        try:
+            fallback = _sample_imageio(path, count, track_steps, max_side)
+            if sample is None or len(fallback.frames) > len(sample.frames):
+                sample = fallback
+        except Exception as e:
+            if sample is None:
+                raise
+            logger.warning(f"imageio could not decode {path}: {e}")
+    if sample is None:
+        sample = VideoSample(DEFAULT_FPS, None, 'none')
+    sample.seconds = time.perf_counter() - start
+    observe_stage('video_decode', sample.seconds)
+    return sample